@@ -0,0 +1,155 @@
+# bench_dashboard_types.py
+#
+# Benchmark de los tipos de fecha/hora del dashboard sobre un frame sintético (por
+# defecto 1M de noticias). Compara la carga anterior de dashboard/viz.py (fecha con
+# pd.to_datetime(...).dt.date, hora con apply(safe_to_time) fila por fila, filtros y
+# groupby sobre objetos date) con la actual: la BD entrega fecha y hora juntas como
+# timestamp, store.typed deja datetime64 (en la tabla de Arrow de RollupStore) y los
+# filtros y agregados de RollupStore.compute corren con máscaras sobre esas columnas.
+#
+# Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_dashboard_types
+#   python -m benchmarks.bench_dashboard_types --rows 200000 --rounds 3
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+import pandas as pd
+
+# Los módulos del dashboard se importan como en `streamlit run viz.py` (desde su carpeta).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dashboard'))
+import store  # noqa: E402
+
+FUENTES = ['eldeber', 'lostiempos', 'ahoraelpueblo']
+SECCIONES = ['pais', 'economia', 'mundo', 'deportes', 'opinion', 'seguridad', 'politica',
+             'sociedad', 'cultura', 'tecnologia', 'salud', 'educacion']
+
+
+def make_rows(rows, days=730, seed=7):
+    """Valores tal como los entrega psycopg2: objetos date, time y datetime."""
+    rng = random.Random(seed)
+    first = date(2023, 1, 1)
+    fechas, horas, publicados = [], [], []
+    for _ in range(rows):
+        fecha = first + timedelta(days=rng.randrange(days))
+        hora = dtime(rng.randrange(24), rng.randrange(60), rng.randrange(60))
+        fechas.append(fecha)
+        horas.append(hora)
+        publicados.append(datetime.combine(fecha, hora))
+    fuentes = [rng.choice(FUENTES) for _ in range(rows)]
+    secciones = [rng.choice(SECCIONES) for _ in range(rows)]
+    urls = [f"https://example.com/noticia/{i}" for i in range(rows)]
+    return fechas, horas, publicados, fuentes, secciones, urls
+
+
+# --- Implementación anterior (copiada de dashboard/viz.py como referencia) ---
+
+def legacy_safe_to_time(t):
+    if pd.isna(t): return None
+    if isinstance(t, dtime): return t
+    try: return pd.to_datetime(str(t), format='%H:%M:%S.%f').time()
+    except (ValueError, TypeError):
+        try: return pd.to_datetime(str(t), format='%H:%M:%S').time()
+        except (ValueError, TypeError):
+             logging.warning(f"No se pudo convertir '{t}' a objeto time.")
+             return None
+
+
+def legacy_load(fechas, horas, fuentes, secciones, urls):
+    df = pd.DataFrame({'fecha_noticia': fechas, 'hora_noticia': horas, 'seccion': secciones,
+                       'fuente': fuentes, 'url': urls})
+    df['fecha_noticia'] = pd.to_datetime(df['fecha_noticia'], errors='coerce').dt.date
+    df['hora_noticia'] = df['hora_noticia'].apply(legacy_safe_to_time)
+    df.dropna(subset=['fecha_noticia', 'hora_noticia'], inplace=True)
+    return df
+
+
+def legacy_aggregates(df, fuentes, fecha_inicio, fecha_fin):
+    df_filtrado = df.copy()
+    df_filtrado = df_filtrado[df_filtrado['fuente'].isin(fuentes)]
+    df_filtrado = df_filtrado[
+        (df_filtrado['fecha_noticia'] >= fecha_inicio) &
+        (df_filtrado['fecha_noticia'] <= fecha_fin)
+    ]
+    noticias_por_dia = df_filtrado.groupby('fecha_noticia')['url'].nunique()
+    noticias_por_dia.index = pd.to_datetime(noticias_por_dia.index)
+    return {
+        'total': len(df_filtrado),
+        'por_dia': noticias_por_dia,
+        'por_fuente': df_filtrado['fuente'].value_counts(),
+        'top_secciones': df_filtrado['seccion'].value_counts().nlargest(10),
+    }
+
+
+# --- Implementación actual ---
+
+def current_load(publicados, fuentes, secciones):
+    # Lo que arma pd.read_sql con la columna timestamp de la BD.
+    df = pd.DataFrame({'publicado': publicados, 'seccion': secciones, 'fuente': fuentes})
+    # Misma representación que RollupStore: tabla de Arrow y DataFrame sobre ella.
+    return store.as_frame(store.to_table(pd.DataFrame({
+        'fecha_noticia': df['publicado'].dt.normalize(),
+        'fuente': df['fuente'],
+        'seccion': df['seccion'],
+        'n': 1,
+    })))
+
+
+def current_aggregates(frame, fuentes, fecha_inicio, fecha_fin):
+    return store.RollupStore.compute(frame, tuple(fuentes), fecha_inicio, fecha_fin)
+
+
+def best_of(function, rounds):
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark de los tipos de fecha/hora del dashboard.")
+    arg_parser.add_argument('--rows', type=int, default=1_000_000)
+    arg_parser.add_argument('--rounds', type=int, default=3, help="Rondas por medición (se toma la mejor).")
+    args = arg_parser.parse_args(argv)
+
+    fechas, horas, publicados, fuentes, secciones, urls = make_rows(args.rows)
+    filtro = (['eldeber', 'lostiempos'], date(2023, 6, 1), date(2024, 5, 31))
+
+    legacy_load_s, legacy_df = best_of(lambda: legacy_load(fechas, horas, fuentes, secciones, urls), args.rounds)
+    current_load_s, current_df = best_of(lambda: current_load(publicados, fuentes, secciones), args.rounds)
+    legacy_agg_s, legacy_result = best_of(lambda: legacy_aggregates(legacy_df, *filtro), args.rounds)
+    current_agg_s, current_result = best_of(lambda: current_aggregates(current_df, *filtro), args.rounds)
+
+    print(f"{args.rows} filas, mejor de {args.rounds} rondas")
+    print(f"{'etapa':22} {'anterior s':>11} {'actual s':>9} {'aceleración':>12}")
+    for name, legacy, current in (('tipado', legacy_load_s, current_load_s),
+                                  ('filtros y agregados', legacy_agg_s, current_agg_s)):
+        print(f"{name:22} {legacy:>11.3f} {current:>9.3f} {'x' + format(legacy / current, '.1f'):>12}")
+    print(f"memoria del frame: anterior {legacy_df.memory_usage(deep=True).sum() / 1e6:.0f} MB, "
+          f"actual {current_df.memory_usage(deep=True).sum() / 1e6:.0f} MB")
+    print(f"dtype de fecha_noticia: anterior {legacy_df['fecha_noticia'].dtype}, "
+          f"actual {current_df['fecha_noticia'].dtype}")
+
+    # Corrección: mismos totales y mismos conteos por día, fuente y sección.
+    same = (
+        legacy_result['total'] == current_result['total']
+        and legacy_result['por_dia'].tolist() == current_result['por_dia'].tolist()
+        and legacy_result['por_dia'].index.equals(current_result['por_dia'].index)
+        and dict(legacy_result['por_fuente']) == dict(current_result['por_fuente'])
+        and dict(legacy_result['top_secciones']) == dict(current_result['top_secciones'])
+    )
+    print(f"resultados iguales: {'sí' if same else 'NO'}")
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
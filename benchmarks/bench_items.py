@@ -0,0 +1,117 @@
+# bench_items.py
+#
+# Compara NewspaperItem (scrapy.Item con select_data en cada lectura) con NewspaperRecord
+# (attrs con __slots__): costo de creación, de lectura por campo, de copia a dict y
+# memoria por item en vuelo. Usa los registros de la Landing Zone como valores.
+#
+# Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_items
+#   python -m benchmarks.bench_items --items 20000
+
+import argparse
+import glob
+import sys
+import time
+import tracemalloc
+
+from itemadapter import ItemAdapter
+
+from newspaper_collector.items import NewspaperItem, NewspaperRecord, item_to_dict
+from newspaper_collector.landing import iter_landing_records
+
+DEFAULT_FILES = 'datalake/LANDING_ZONE/**/*.jsonl*'
+FIELDS = ('data_id', 'titulo', 'descripcion', 'fecha', 'seccion', 'url', 'date_saved', 'source')
+
+
+def load_values(pattern, limit):
+    values = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        for record in iter_landing_records(path):
+            values.append({key: record.get(key) for key in FIELDS})
+            if len(values) >= limit:
+                return values
+    return values
+
+
+def per_call(function, values, rounds):
+    function(values[0])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for value in values:
+            function(value)
+    return (time.perf_counter() - start) / (rounds * len(values)) * 1e6
+
+
+def memory_per_item(cls, values):
+    """Bytes asignados por item (los strings son compartidos, así que solo cuenta el contenedor)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [cls(**value) for value in values]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(items)
+
+
+def read_fields(item):
+    for field in FIELDS:
+        item[field]
+
+
+def read_attributes(record):
+    for field in FIELDS:
+        getattr(record, field)
+
+
+def read_adapter(item):
+    adapter = ItemAdapter(item)
+    for field in FIELDS:
+        adapter.get(field)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark de los tipos de item.")
+    arg_parser.add_argument('--files', default=DEFAULT_FILES, help="Glob de archivos de la Landing Zone.")
+    arg_parser.add_argument('--items', type=int, default=5000, help="Cantidad de items.")
+    arg_parser.add_argument('--rounds', type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    values = load_values(args.files, args.items)
+    if not values:
+        print("No hay registros en la Landing Zone.")
+        return 1
+    scrapy_items = [NewspaperItem(**value) for value in values]
+    records = [NewspaperRecord(**value) for value in values]
+    rounds = args.rounds
+    field_count = len(FIELDS)
+
+    rows = [
+        ('crear (µs/item)',
+         per_call(lambda v: NewspaperItem(**v), values, rounds),
+         per_call(lambda v: NewspaperRecord(**v), values, rounds)),
+        ('leer campo (µs)',
+         per_call(read_fields, scrapy_items, rounds) / field_count,
+         per_call(read_attributes, records, rounds) / field_count),
+        ('leer campo, ItemAdapter (µs)',
+         per_call(read_adapter, scrapy_items, rounds) / field_count,
+         per_call(read_adapter, records, rounds) / field_count),
+        ('item_to_dict (µs/item)',
+         per_call(item_to_dict, scrapy_items, rounds),
+         per_call(item_to_dict, records, rounds)),
+        ('ItemAdapter.asdict (µs/item)',
+         per_call(lambda i: ItemAdapter(i).asdict(), scrapy_items, rounds),
+         per_call(lambda i: ItemAdapter(i).asdict(), records, rounds)),
+        ('memoria (bytes/item)',
+         memory_per_item(NewspaperItem, values),
+         memory_per_item(NewspaperRecord, values)),
+    ]
+
+    print(f"{len(values)} items, {rounds} rondas")
+    print(f"{'':30} {'NewspaperItem':>14} {'NewspaperRecord':>16} {'relación':>9}")
+    for name, item_cost, record_cost in rows:
+        ratio = item_cost / record_cost if record_cost else float('inf')
+        print(f"{name:30} {item_cost:>14.3f} {record_cost:>16.3f} {ratio:>8.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
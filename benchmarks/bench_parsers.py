@@ -0,0 +1,253 @@
+# bench_parsers.py
+#
+# Benchmark offline de los parsers de NewspaperSpider: reproduce los listados guardados
+# en benchmarks/fixtures/ (sin red) y mide páginas/s, items/s, memoria asignada, tiempo
+# por expresión XPath (las compiladas en spiders/parsers.py) y qué variante de cada
+# selector ganó. Los mismos fixtures sirven de corpus de corrección: los items
+# generados deben coincidir con los <fixture>.expected.json.
+#
+# Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_parsers                 # medir y comparar con el baseline
+#   python -m benchmarks.bench_parsers --update        # regenerar expected + baseline
+#   python -m benchmarks.bench_parsers --cache httpcache   # páginas de la caché HTTP del último crawl
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from scrapy.http import HtmlResponse, Request
+
+from newspaper_collector.httpcache import iter_cached_pages
+from newspaper_collector.items import item_to_dict
+from newspaper_collector.spiders.newspaperspider import NewspaperSpider
+from newspaper_collector.spiders.parsers import PARSERS, build_registry
+from newspaper_collector.transform import StatsDelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline_parsers.json')
+# Campos que cambian en cada ejecución y no forman parte de la comparación.
+VOLATILE_FIELDS = ('data_id', 'date_saved')
+# Campos que completan los pipelines, no el spider.
+DERIVED_FIELDS = ('fecha_dt',)
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, 'fixtures.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    fixtures = {}
+    for name, spec in manifest.items():
+        with open(os.path.join(FIXTURES_DIR, f'{name}.html'), 'rb') as f:
+            fixtures[name] = (spec, f.read())
+    return fixtures
+
+
+def load_cached_pages(cachedir):
+    """Las páginas de la caché HTTP (HTTPCACHE_DIR) como fixtures, nombradas por fuente y número."""
+    fixtures = {}
+    counts = defaultdict(int)
+    for spec, body in iter_cached_pages(cachedir, NewspaperSpider.name):
+        source = spec['meta'].get('source', 'desconocida')
+        counts[source] += 1
+        fixtures[f"{source}_{counts[source]:04d}"] = (spec, body)
+    return fixtures
+
+
+def make_response(spec, body):
+    request = Request(spec['url'], meta=dict(spec['meta']))
+    return HtmlResponse(spec['url'], body=body, encoding='utf-8', request=request)
+
+
+def run_parse(spider, spec, body):
+    """Parsea una página y devuelve (items sin campos volátiles, urls de requests)."""
+    items = []
+    requests = []
+    for output in spider.parse(make_response(spec, body)):
+        if isinstance(output, Request):
+            requests.append(output.url)
+        else:
+            record = item_to_dict(output)
+            for field in VOLATILE_FIELDS + DERIVED_FIELDS:
+                record.pop(field, None)
+            items.append(record)
+    return items, requests
+
+
+class XPathTimer:
+    """Envuelve las XPath compiladas de spiders/parsers.py para acumular tiempo y llamadas por expresión."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.saved = []
+
+    def timed(self, expression, xpath):
+        def run(node):
+            start = time.perf_counter()
+            try:
+                return xpath(node)
+            finally:
+                self.totals[expression] += time.perf_counter() - start
+                self.calls[expression] += 1
+        return run
+
+    def __enter__(self):
+        for parser_cls in PARSERS.values():
+            for field in (parser_cls.articles, *parser_cls.fields.values(), *parser_cls.page_fields.values()):
+                self.saved.append((field, field.variants))
+                field.variants = [
+                    (name, expression, self.timed(expression, xpath))
+                    for name, expression, xpath in field.variants
+                ]
+        return self
+
+    def __exit__(self, *exc):
+        for field, variants in self.saved:
+            field.variants = variants
+        self.saved = []
+
+
+def check_correctness(spider, fixtures, update):
+    failures = []
+    for name, (spec, body) in fixtures.items():
+        items, requests = run_parse(spider, spec, body)
+        expected_path = os.path.join(FIXTURES_DIR, f'{name}.expected.json')
+        result = {'items': items, 'requests': requests}
+        if update or not os.path.exists(expected_path):
+            with open(expected_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            continue
+        with open(expected_path, encoding='utf-8') as f:
+            expected = json.load(f)
+        if expected != result:
+            failures.append(name)
+    return failures
+
+
+def measure(spider, fixtures, rounds):
+    results = {}
+    for name, (spec, body) in fixtures.items():
+        # Calentamiento (imports perezosos, cachés de lxml)
+        run_parse(spider, spec, body)
+
+        start = time.perf_counter()
+        n_items = 0
+        for _ in range(rounds):
+            items, _ = run_parse(spider, spec, body)
+            n_items += len(items)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        run_parse(spider, spec, body)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            'pages_per_sec': round(rounds / elapsed, 2),
+            'items_per_sec': round(n_items / elapsed, 2),
+            'peak_alloc_kib': round(peak / 1024, 1),
+        }
+    return results
+
+
+def xpath_profile(spider, fixtures, rounds):
+    with XPathTimer() as timer:
+        for _ in range(rounds):
+            for spec, body in fixtures.values():
+                run_parse(spider, spec, body)
+    return sorted(
+        ((query, timer.totals[query], timer.calls[query]) for query in timer.totals),
+        key=lambda row: row[1],
+        reverse=True,
+    )
+
+
+def variant_hits(fixtures):
+    """Aciertos por variante de selector (las mismas stats selectors/* que en un crawl)."""
+    stats = StatsDelta()
+    spider = NewspaperSpider(full_crawl='1')
+    spider.parsers = build_registry(stats)
+    for spec, body in fixtures.values():
+        run_parse(spider, spec, body)
+    return sorted(stats.items())
+
+
+def compare(results, baseline, tolerance):
+    """Regresión: menos items/s o más memoria que el baseline, fuera de la tolerancia."""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if current['items_per_sec'] < reference['items_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: items/s {current['items_per_sec']} < {reference['items_per_sec']}")
+        if current['peak_alloc_kib'] > reference['peak_alloc_kib'] * (1 + tolerance):
+            regressions.append(f"{name}: memoria {current['peak_alloc_kib']} KiB > {reference['peak_alloc_kib']} KiB")
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark offline de los parsers del spider.")
+    arg_parser.add_argument('--rounds', type=int, default=50, help="Repeticiones por fixture.")
+    arg_parser.add_argument('--tolerance', type=float, default=0.3, help="Margen antes de considerar regresión (0.3 = 30%%).")
+    arg_parser.add_argument('--update', action='store_true', help="Reescribir expected.json y el baseline.")
+    arg_parser.add_argument('--top', type=int, default=10, help="Expresiones XPath a mostrar.")
+    arg_parser.add_argument('--cache', metavar='HTTPCACHE_DIR',
+                            help="Usar las páginas de la caché HTTP en vez de los fixtures (sin expected ni baseline).")
+    args = arg_parser.parse_args(argv)
+
+    # full_crawl: el modo incremental no debe cortar la paginación durante el benchmark.
+    spider = NewspaperSpider(full_crawl='1')
+    if args.cache:
+        fixtures = load_cached_pages(args.cache)
+        if not fixtures:
+            print(f"No hay páginas en la caché {args.cache}")
+            return 1
+    else:
+        fixtures = load_fixtures()
+
+    failures = [] if args.cache else check_correctness(spider, fixtures, args.update)
+    results = measure(spider, fixtures, args.rounds)
+
+    print(f"{'fixture':32} {'páginas/s':>10} {'items/s':>10} {'pico KiB':>10}")
+    for name, row in results.items():
+        print(f"{name:32} {row['pages_per_sec']:>10} {row['items_per_sec']:>10} {row['peak_alloc_kib']:>10}")
+
+    print("\nTiempo por XPath:")
+    for query, total, calls in xpath_profile(spider, fixtures, max(1, args.rounds // 10))[:args.top]:
+        print(f"  {total * 1000:9.2f} ms  {calls:6d} llamadas  {query}")
+
+    print("\nVariantes de selectores:")
+    for key, hits in variant_hits(fixtures):
+        print(f"  {hits:6d}  {key}")
+
+    if args.cache:
+        return 0
+
+    if args.update:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline actualizado en {BASELINE_PATH}")
+        return 0
+
+    status = 0
+    if failures:
+        print(f"\nERROR: los items no coinciden con expected.json en: {', '.join(failures)}")
+        status = 1
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nREGRESIÓN respecto al baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# bench_text.py
+#
+# Micro-benchmark de la limpieza de texto de RefinedZonePipeline: compara la versión
+# anterior (cinco re.sub por descripción y dos pasadas sobre el item) con
+# newspaper_collector/text.py sobre los registros de la Landing Zone.
+#
+# Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_text
+#   python -m benchmarks.bench_text --rounds 20 --limit 1000
+
+import argparse
+import glob
+import re
+import sys
+import time
+
+from newspaper_collector import text
+from newspaper_collector.landing import iter_landing_records
+
+DEFAULT_FILES = 'datalake/LANDING_ZONE/**/*.jsonl*'
+
+
+# --- Implementación anterior (copiada de RefinedZonePipeline como referencia) ---
+
+def legacy_clean_text(value):
+    if not value:
+        return value
+    value = re.sub("[\U00010000-\U0010ffff]", "", value, flags=re.UNICODE)
+    value = re.sub(r'[^a-zA-Z0-9\s]', '', value)
+    value = re.sub(r'\s+', ' ', value)
+    return value.strip()
+
+
+def legacy_remove_links(value):
+    if not value:
+        return value
+    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|' \
+                  r'(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+    value = re.sub(url_pattern, '', value)
+    value = re.sub(r'www\.[^\s]+', '', value)
+    return value.strip()
+
+
+def legacy_transform(record):
+    transformed = dict(record)
+    for key, value in transformed.items():
+        if isinstance(value, str):
+            transformed[key] = value.lower().strip()
+    for field in transformed:
+        if transformed[field] == "" or transformed[field] == " " or transformed[field] == "null":
+            transformed[field] = None
+    if transformed.get('descripcion'):
+        transformed['descripcion'] = legacy_remove_links(legacy_clean_text(transformed['descripcion']))
+    return transformed
+
+
+def current_transform(record):
+    transformed = dict(record)
+    for key, value in transformed.items():
+        transformed[key] = text.normalize_value(value)
+    if transformed.get('descripcion'):
+        transformed['descripcion'] = text.clean_text(transformed['descripcion'])
+    return transformed
+
+
+def load_records(pattern, limit):
+    records = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        for record in iter_landing_records(path):
+            records.append(record)
+            if limit and len(records) >= limit:
+                return records
+    return records
+
+
+def time_per_item(transform, records, rounds):
+    transform(records[0])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for record in records:
+            transform(record)
+    return (time.perf_counter() - start) / (rounds * len(records))
+
+
+ACCENTED = re.compile(r'[áéíóúüñ]')
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Micro-benchmark de la limpieza de texto.")
+    arg_parser.add_argument('--files', default=DEFAULT_FILES, help="Glob de archivos de la Landing Zone.")
+    arg_parser.add_argument('--limit', type=int, default=None, help="Máximo de registros.")
+    arg_parser.add_argument('--rounds', type=int, default=5)
+    args = arg_parser.parse_args(argv)
+
+    records = load_records(args.files, args.limit)
+    if not records:
+        print("No hay registros en la Landing Zone.")
+        return 1
+
+    legacy = time_per_item(legacy_transform, records, args.rounds)
+    current = time_per_item(current_transform, records, args.rounds)
+    print(f"{len(records)} registros, {args.rounds} rondas")
+    print(f"{'versión':10} {'µs/item':>9}")
+    print(f"{'anterior':10} {legacy * 1e6:>9.2f}")
+    print(f"{'actual':10} {current * 1e6:>9.2f}")
+    print(f"aceleración: x{legacy / current:.2f}")
+
+    # Corrección: cuántas descripciones conservan letras con tilde o ñ.
+    kept_legacy = sum(1 for r in records if ACCENTED.search(legacy_transform(r).get('descripcion') or ''))
+    kept_current = sum(1 for r in records if ACCENTED.search(current_transform(r).get('descripcion') or ''))
+    print(f"descripciones con tildes/ñ: anterior {kept_legacy}, actual {kept_current}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
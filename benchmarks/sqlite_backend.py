@@ -0,0 +1,180 @@
+# sqlite_backend.py
+#
+# Sustituto SQLite del pool de PostgreSQL para correr los pipelines de BD sin servidor
+# (benchmarks, CI) y envoltorio que cuenta idas y vueltas a la BD con cualquier backend.
+# Solo cubre el SQL que usa newspaper_collector/db.py.
+
+import datetime
+import sqlite3
+
+for _type in (datetime.date, datetime.time, datetime.datetime):
+    sqlite3.register_adapter(_type, lambda value: value.isoformat())
+
+ERRORS = (sqlite3.Error,)
+
+
+class SQLiteCursor:
+
+    def __init__(self, cursor):
+        self._cur = cursor
+        self.itersize = 2000
+
+    def execute(self, sql, params=None):
+        # En SQLite solo INTEGER PRIMARY KEY se autoincrementa; con AUTOINCREMENT no
+        # reutiliza ids de filas borradas, igual que SERIAL.
+        sql = sql.replace('SERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+        self._cur.execute(sql.replace('%s', '?'), tuple(params or ()))
+
+    def executemany(self, sql, seq):
+        self._cur.executemany(sql.replace('%s', '?'), [tuple(params) for params in seq])
+
+    def execute_values(self, sql, rows, page_size=100, fetch=False):
+        """Equivalente a psycopg2.extras.execute_values: expande 'VALUES %s' por páginas."""
+        results = []
+        for start in range(0, len(rows), page_size):
+            page = rows[start:start + page_size]
+            values = ', '.join('(' + ', '.join('?' * len(row)) + ')' for row in page)
+            self._cur.execute(sql.replace('%s', values, 1), [value for row in page for value in row])
+            if fetch:
+                results.extend(self._cur.fetchall())
+        return results if fetch else None
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size):
+        return self._cur.fetchmany(size)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+
+    staging_ready = False
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, name=None):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def closed(self):
+        try:
+            self._conn.execute('SELECT 1')
+            return 0
+        except sqlite3.ProgrammingError:
+            return 1
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLitePool:
+    """Pool de una sola conexión (una BD ':memory:' solo existe dentro de su conexión)."""
+
+    def __init__(self, path=':memory:'):
+        self.conn = SQLiteConnection(path)
+        self.closed = False
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        pass
+
+    def closeall(self):
+        self.conn.close()
+        self.closed = True
+
+
+class CountingCursor:
+
+    def __init__(self, cursor, counter):
+        self._cur = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter.round_trips += 1
+        return self._cur.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter.round_trips += 1
+        return self._cur.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._cur, name)
+        if name == 'execute_values':
+            def counted(sql, rows, page_size=100, fetch=False):
+                self._counter.round_trips += max(1, -(-len(rows) // page_size))
+                return attr(sql, rows, page_size=page_size, fetch=fetch)
+            return counted
+        return attr
+
+    def __iter__(self):
+        return iter(self._cur)
+
+
+class CountingConnection:
+
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+        self.staging_ready = getattr(conn, 'staging_ready', False)
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs), self._counter)
+
+    def commit(self):
+        self._counter.round_trips += 1
+        self._conn.commit()
+
+    def rollback(self):
+        self._counter.round_trips += 1
+        self._conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class CountingPool:
+    """Envuelve un pool y cuenta cada execute/commit/rollback como una ida y vuelta."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.round_trips = 0
+        self._proxies = {}
+
+    @property
+    def closed(self):
+        return self.pool.closed
+
+    def getconn(self):
+        conn = self.pool.getconn()
+        proxy = self._proxies.get(id(conn))
+        if proxy is None or proxy._conn is not conn:
+            proxy = self._proxies[id(conn)] = CountingConnection(conn, self)
+        return proxy
+
+    def putconn(self, conn, close=False):
+        self.pool.putconn(conn._conn, close=close)
+
+    def closeall(self):
+        self.pool.closeall()
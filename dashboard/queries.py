@@ -0,0 +1,83 @@
+# dashboard/queries.py
+#
+# Consultas del dashboard. Los gráficos y los totales salen de consumption_rollup
+# (conteos por fecha, fuente y sección que mantiene ConsumptionZonePipeline), que
+# dashboard/store.py carga una vez por proceso y luego completa con los deltas de
+# consumption_analytics. La tabla de muestra pagina consumption_analytics con el índice
+# de fecha_noticia; es parametrizada y conn.query la guarda en caché por (SQL,
+# parámetros), es decir, por combinación de filtros.
+
+import pandas as pd
+
+CACHE_TTL = 600
+PAGE_SIZE = 20
+TOP_SECCIONES = 10
+
+# Mismas filas que mostraba el dashboard al cargar la tabla completa.
+BASE_WHERE = "fecha_noticia IS NOT NULL AND hora_noticia IS NOT NULL"
+
+
+def filter_clause(fuentes=None, fecha_inicio=None, fecha_fin=None):
+    """WHERE y parámetros para los filtros de la barra lateral (sin fuentes = todas)."""
+    conditions = [BASE_WHERE]
+    params = {}
+    if fuentes:
+        conditions.append("fuente = ANY(:fuentes)")
+        params['fuentes'] = sorted(fuentes)
+    if fecha_inicio and fecha_fin:
+        conditions.append("fecha_noticia BETWEEN :fecha_inicio AND :fecha_fin")
+        params['fecha_inicio'] = fecha_inicio
+        params['fecha_fin'] = fecha_fin
+    return " AND ".join(conditions), params
+
+
+def query(conn, sql, params=None):
+    return conn.query(sql, params=params or {}, ttl=CACHE_TTL)
+
+
+def read_frame(conn, sql, params=None):
+    """Consulta sin la caché de conn.query (la usa RollupStore, que guarda su propio estado)."""
+    from sqlalchemy import text
+
+    with conn.engine.connect() as connection:
+        return pd.read_sql_query(text(sql), connection, params=params or {})
+
+
+# Rollup completo y, en la misma sentencia (misma foto de la BD), la marca de agua:
+# el último fecha_procesado ya contado. fecha_noticia viaja como timestamp para que
+# pandas la reciba como datetime64 y no como objetos date.
+ROLLUP_SQL = """
+    SELECT fecha_noticia::timestamp AS fecha_noticia, fuente, seccion, n,
+           (SELECT max(fecha_procesado) FROM consumption_analytics) AS watermark
+    FROM consumption_rollup;
+"""
+
+# Filas procesadas después de la marca de agua, agrupadas como el rollup. Solo se leen
+# las de hace más de :lag segundos: fecha_procesado es la hora de inicio de la
+# transacción, y una transacción que todavía no confirmó podría aparecer luego con
+# una hora anterior a la marca.
+DELTA_SQL = """
+    SELECT fecha_noticia::timestamp AS fecha_noticia, COALESCE(fuente, '') AS fuente, COALESCE(seccion, '') AS seccion,
+           count(*) FILTER (WHERE hora_noticia IS NOT NULL) AS n,
+           max(fecha_procesado) AS watermark
+    FROM consumption_analytics
+    WHERE fecha_procesado > :watermark
+      AND fecha_procesado <= now() - make_interval(secs => :lag)
+    GROUP BY 1, 2, 3;
+"""
+
+
+def muestra(conn, fuentes=None, fecha_inicio=None, fecha_fin=None, page=1, page_size=PAGE_SIZE):
+    """
+    Una página de la tabla de muestra, de la noticia más reciente a la más antigua. Fecha y
+    hora se juntan en SQL en una sola columna timestamp (datetime64 en pandas).
+    """
+    where, params = filter_clause(fuentes, fecha_inicio, fecha_fin)
+    params['limit'] = page_size
+    params['offset'] = (max(1, page) - 1) * page_size
+    return query(conn, f"""
+        SELECT titulo, fecha_noticia + hora_noticia AS publicado, seccion, fuente, url
+        FROM consumption_analytics WHERE {where}
+        ORDER BY fecha_noticia DESC, hora_noticia DESC, id DESC
+        LIMIT :limit OFFSET :offset;
+    """, params)
@@ -0,0 +1,226 @@
+# dashboard/store.py
+#
+# Estado del dashboard compartido por todas las sesiones del proceso (st.cache_resource):
+# una copia en memoria de consumption_rollup y los agregados ya calculados por
+# combinación de filtros. En vez de recargar todo al vencer una caché, cada
+# REFRESH_SECONDS se piden a la BD solo las filas de consumption_analytics con
+# fecha_procesado posterior a la marca de agua, se suman al rollup en memoria y se
+# descartan solo los agregados cuyos filtros cubren las (fecha, fuente) que cambiaron.
+# Cada FULL_RELOAD_SECONDS se recarga el rollup completo, por si algún delta quedó
+# fuera de la ventana (transacciones más largas que DELTA_LAG_SECONDS) y para las filas
+# reemplazadas por `backfill --upsert`, cuyo conteo viejo el delta no resta.
+#
+# El rollup vive en una tabla de Arrow inmutable; las sesiones leen un DataFrame que la
+# envuelve sin copiarla (texto como string[pyarrow]) y filtran con máscaras, así que una
+# sesión más no suma memoria: lo único propio de cada una es la página de la tabla de
+# muestra. Un delta arma una tabla nueva y la cambia de una vez.
+
+import logging
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+import queries
+
+REFRESH_SECONDS = 30
+FULL_RELOAD_SECONDS = 3600
+DELTA_LAG_SECONDS = 60
+
+KEYS = ['fecha_noticia', 'fuente', 'seccion']
+
+SCHEMA = pa.schema([
+    ('fecha_noticia', pa.timestamp('s')),
+    ('fuente', pa.string()),
+    ('seccion', pa.string()),
+    ('n', pa.int64()),
+])
+
+
+def typed(df):
+    """
+    Columnas del rollup con tipos vectorizados: fecha_noticia como datetime64 (nunca
+    objetos date) y n como entero. Si el driver ya las trae así no cuesta nada.
+    """
+    return pd.DataFrame({
+        'fecha_noticia': pd.to_datetime(df['fecha_noticia']).astype('datetime64[s]'),
+        'fuente': df['fuente'],
+        'seccion': df['seccion'],
+        'n': df['n'].astype('int64'),
+    })
+
+
+def to_table(df):
+    return pa.Table.from_pandas(typed(df), schema=SCHEMA, preserve_index=False)
+
+
+def as_frame(table):
+    """DataFrame sobre la tabla de Arrow: el texto queda en Arrow, fecha y n como NumPy."""
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get, split_blocks=True)
+
+
+def filter_mask(frame, fuentes=None, fecha_inicio=None, fecha_fin=None):
+    """Filas del frame (rollup o delta) que entran en los filtros de la barra lateral."""
+    mask = pd.Series(True, index=frame.index)
+    if fuentes:
+        mask &= frame['fuente'].isin(fuentes)
+    if fecha_inicio and fecha_fin:
+        mask &= frame['fecha_noticia'].between(pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin))
+    return mask
+
+
+def filter_key(fuentes=None, fecha_inicio=None, fecha_fin=None):
+    return tuple(sorted(fuentes or ())), fecha_inicio, fecha_fin
+
+
+class RollupStore:
+    """Rollup en memoria y agregados por filtros, compartidos por las sesiones del proceso."""
+
+    def __init__(self, refresh_every=REFRESH_SECONDS, full_reload_every=FULL_RELOAD_SECONDS,
+                 lag=DELTA_LAG_SECONDS):
+        self.refresh_every = refresh_every
+        self.full_reload_every = full_reload_every
+        self.lag = lag
+        self.table = SCHEMA.empty_table()
+        self.frame = as_frame(self.table)
+        self.watermark = None
+        self.cache = {}
+        # refresh_lock: una sola sesión consulta la BD a la vez. lock: protege el cambio
+        # de tabla/frame, la caché de agregados y los contadores (se toma por poco tiempo).
+        self.refresh_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.loaded_at = None
+        self.counters = {'hits': 0, 'misses': 0, 'loads': 0, 'deltas': 0, 'invalidated': 0}
+
+    def refresh(self, conn):
+        """Trae lo nuevo de la BD si pasó REFRESH_SECONDS; una sola sesión consulta a la vez."""
+        with self.refresh_lock:
+            now = time.monotonic()
+            if self.checked_at is not None and now - self.checked_at < self.refresh_every:
+                return
+            if self.watermark is None or now - self.loaded_at >= self.full_reload_every:
+                self.load(conn)
+                self.loaded_at = now
+            else:
+                self.apply_delta(conn)
+            self.checked_at = now
+
+    def load(self, conn):
+        df = queries.read_frame(conn, queries.ROLLUP_SQL)
+        table = to_table(df)
+        frame = as_frame(table)
+        with self.lock:
+            self.watermark = df['watermark'].max() if not df.empty else None
+            self.publish(table, frame)
+            self.cache = {}
+            self.counters['loads'] += 1
+        logging.info(f"Rollup cargado: {self.table.num_rows} filas, marca de agua {self.watermark}.")
+
+    def apply_delta(self, conn):
+        df = queries.read_frame(conn, queries.DELTA_SQL, {'watermark': self.watermark, 'lag': self.lag})
+        if df.empty:
+            return
+        watermark = max(self.watermark, df['watermark'].max())
+        delta = typed(df[df['fecha_noticia'].notna() & (df['n'] > 0)])
+        if delta.empty:
+            with self.lock:
+                self.watermark = watermark
+            return
+        # Solo este hilo cambia self.table (refresh_lock), así que se puede leer sin lock.
+        merged = pa.concat_tables([self.table, to_table(delta)])
+        merged = merged.group_by(KEYS).aggregate([('n', 'sum')]).rename_columns(KEYS + ['n'])
+        frame = as_frame(merged)
+        with self.lock:
+            self.watermark = watermark
+            self.publish(merged, frame)
+            stale = [key for key in self.cache if filter_mask(delta, *key).any()]
+            for key in stale:
+                del self.cache[key]
+            self.counters['deltas'] += 1
+            self.counters['invalidated'] += len(stale)
+            kept = len(self.cache)
+        logging.info(f"Delta del rollup: {int(delta['n'].sum())} noticias nuevas, "
+                     f"{len(stale)} de {len(stale) + kept} agregados invalidados.")
+
+    def publish(self, table, frame):
+        # Con self.lock tomado. Tabla y frame se reemplazan (nunca se modifican): las
+        # sesiones que están leyendo la versión anterior la siguen viendo entera.
+        self.table = table
+        self.frame = frame
+
+    def fuentes_disponibles(self):
+        return sorted(f for f in self.frame['fuente'].unique() if f)
+
+    def rango_fechas(self):
+        """(mínima, máxima) fecha_noticia, o (None, None) si no hay datos."""
+        frame = self.frame
+        if frame.empty:
+            return None, None
+        return frame['fecha_noticia'].min().date(), frame['fecha_noticia'].max().date()
+
+    def aggregates(self, fuentes=None, fecha_inicio=None, fecha_fin=None):
+        """total, por_dia, por_fuente y top_secciones para una combinación de filtros."""
+        key = filter_key(fuentes, fecha_inicio, fecha_fin)
+        # La caché y los contadores solo se tocan con el lock (apply_delta los recorre
+        # desde otra sesión); el cálculo va afuera para no frenar a las demás.
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.counters['hits'] += 1
+                return result
+            self.counters['misses'] += 1
+            frame = self.frame
+        result = self.compute(frame, *key)
+        with self.lock:
+            # Si entretanto llegó un delta, este resultado ya no se guarda.
+            if self.frame is frame:
+                self.cache[key] = result
+        return result
+
+    def stats(self):
+        """Datos para el panel de instrumentación."""
+        with self.lock:
+            table = self.table
+            results = list(self.cache.values())
+            counters = dict(self.counters)
+            watermark = self.watermark
+        lookups = counters['hits'] + counters['misses']
+        cached_bytes = sum(
+            int(value.memory_usage(deep=True)) for result in results
+            for value in result.values() if isinstance(value, pd.Series)
+        )
+        return {
+            'rollup_rows': table.num_rows,
+            'rollup_bytes': table.nbytes,
+            'cached_aggregates': len(results),
+            'cached_bytes': cached_bytes,
+            'hit_rate': counters['hits'] / lookups if lookups else None,
+            'watermark': watermark,
+            'full_reload_in': self.full_reload_in(),
+            **counters,
+        }
+
+    def full_reload_in(self):
+        """Segundos hasta la próxima recarga completa del rollup (None si aún no se cargó)."""
+        loaded_at = self.loaded_at
+        if loaded_at is None:
+            return None
+        return max(0.0, self.full_reload_every - (time.monotonic() - loaded_at))
+
+    @staticmethod
+    def compute(frame, fuentes, fecha_inicio, fecha_fin):
+        # Sin copiar filas: las que no entran en los filtros cuentan 0 y se descartan al final.
+        n = frame['n'].where(filter_mask(frame, fuentes, fecha_inicio, fecha_fin), 0)
+        por_dia = n.groupby(frame['fecha_noticia']).sum()
+        por_fuente = n.groupby(frame['fuente']).sum().drop('', errors='ignore')
+        por_seccion = n.groupby(frame['seccion']).sum().drop('', errors='ignore')
+        return {
+            'total': int(n.sum()),
+            'por_dia': por_dia[por_dia > 0].rename('noticias'),
+            'por_fuente': por_fuente[por_fuente > 0].sort_values(ascending=False, kind='stable')
+                                                    .rename('noticias'),
+            'top_secciones': por_seccion[por_seccion > 0].sort_values(ascending=False, kind='stable')
+                                                         .head(queries.TOP_SECCIONES).rename('noticias'),
+        }
@@ -1,13 +1,15 @@
 # dashboard/viz.py
 
 import streamlit as st
-import pandas as pd
 import requests
 import os
 from dotenv import load_dotenv
-from datetime import datetime, date, time, timedelta # Asegurar imports
+from datetime import date, timedelta
 import logging
 
+import queries
+from store import RollupStore
+
 # Configurar logging básico
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -42,58 +44,10 @@ def get_connection():
          st.error(f"Error al conectar a la base de datos via st.connection: {e}")
          return None
 
-# --- Carga y Procesamiento de Datos (Manteniendo Columnas Separadas) ---
-@st.cache_data(ttl=600)
-def load_data(_conn):
-    """Carga datos de consumption_analytics, asegurando tipos correctos para fecha y hora."""
-    if _conn is None:
-        return pd.DataFrame()
-    logging.info("Cargando datos (fecha y hora separadas) desde Consumption Zone via st.connection...")
-    try:
-        # ----- Query SQL (sin cambios respecto a la anterior) -----
-        query = """
-            SELECT titulo, fecha_noticia, hora_noticia, seccion, fuente, url
-            FROM consumption_analytics
-            WHERE fecha_noticia IS NOT NULL AND hora_noticia IS NOT NULL
-            ORDER BY fecha_noticia DESC, hora_noticia DESC;
-        """
-        df = _conn.query(query, ttl=600)
-        logging.info(f"Datos crudos cargados: {len(df)} filas.")
-
-        if df.empty:
-             logging.info("No se encontraron datos en la tabla consumption_analytics.")
-             return df
-
-        # ----- MODIFICACIÓN: Asegurar tipos correctos (SIN COMBINAR) -----
-        # Convertir fecha_noticia a objetos date
-        # pd.to_datetime primero, luego .dt.date para asegurar solo la fecha
-        df['fecha_noticia'] = pd.to_datetime(df['fecha_noticia'], errors='coerce').dt.date
-
-        # Convertir hora_noticia a objetos time
-        def safe_to_time(t):
-            if pd.isna(t): return None
-            if isinstance(t, time): return t
-            try: return pd.to_datetime(str(t), format='%H:%M:%S.%f').time()
-            except (ValueError, TypeError):
-                try: return pd.to_datetime(str(t), format='%H:%M:%S').time()
-                except (ValueError, TypeError):
-                     logging.warning(f"No se pudo convertir '{t}' a objeto time.")
-                     return None
-        df['hora_noticia'] = df['hora_noticia'].apply(safe_to_time)
-
-        # Eliminar filas donde la conversión falló o los originales eran nulos
-        original_len = len(df)
-        df.dropna(subset=['fecha_noticia', 'hora_noticia'], inplace=True)
-        if len(df) < original_len:
-             logging.warning(f"Se eliminaron {original_len - len(df)} filas por fecha u hora inválida/nula.")
-        # -------------------------------------------------------------
-
-        logging.info(f"Datos procesados con fecha y hora separadas: {len(df)} filas.")
-        return df
-    except Exception as e:
-        logging.error(f"Error al cargar/procesar datos via st.connection: {e}", exc_info=True)
-        st.error(f"Error al cargar datos de la base de datos: {e}")
-        return pd.DataFrame()
+# --- Rollup compartido por todas las sesiones (se actualiza con deltas) ---
+@st.cache_resource
+def get_store():
+     return RollupStore()
 
 # --- Integración API Externa (Sin cambios) ---
 @st.cache_data(ttl=600)
@@ -128,19 +82,25 @@ def get_weather_data(api_key, city="La Paz,BO"):
 # --- Construcción del Dashboard ---
 st.title("📰 Dashboard de Recolección de Noticias")
 
-# Obtener conexión y cargar datos
+# Obtener conexión y traer lo nuevo del rollup (solo el delta desde la última marca de agua)
 conn = get_connection()
+rollup = get_store()
+fuentes_disponibles = []
+fecha_min = fecha_max = None
 if conn:
-     df_noticias = load_data(conn)
-else:
-     df_noticias = pd.DataFrame()
+     try:
+          rollup.refresh(conn)
+          fuentes_disponibles = rollup.fuentes_disponibles()
+          fecha_min, fecha_max = rollup.rango_fechas()
+     except Exception as e:
+          logging.error(f"Error al consultar la Consumption Zone: {e}", exc_info=True)
+          st.error(f"Error al cargar datos de la base de datos: {e}")
+hay_datos = fecha_min is not None
 
-if df_noticias.empty and conn is not None:
+if not hay_datos and conn is not None:
     st.warning("No se encontraron datos válidos de noticias en la base de datos (Consumption Zone). Verifique el proceso ETL y los datos en la tabla.")
-elif df_noticias.empty and conn is None:
+elif not hay_datos and conn is None:
      st.info("Esperando conexión a la base de datos...")
-else:
-     st.success(f"Datos cargados ({len(df_noticias)} noticias).")
 
 # --- Sección API Externa (Clima) ---
 # ... (código sin cambios) ...
@@ -160,52 +120,38 @@ st.divider()
 # --- Filtros en la Barra Lateral ---
 st.sidebar.header("Filtros")
 
-# Filtro por Fuente (sin cambios)
-if not df_noticias.empty and 'fuente' in df_noticias.columns and df_noticias['fuente'].notna().any():
-    fuentes_disponibles = sorted(df_noticias['fuente'].dropna().unique().tolist())
+# Filtro por Fuente
+if fuentes_disponibles:
     fuentes_seleccionadas = st.sidebar.multiselect(
         "Selecciona Fuente(s):", options=fuentes_disponibles, default=fuentes_disponibles
     )
-elif not df_noticias.empty:
+elif hay_datos:
      st.sidebar.warning("Columna 'fuente' no disponible para filtrar.")
      fuentes_seleccionadas = []
 else:
      fuentes_seleccionadas = []
 
-# Filtro por Rango de Fechas
-# ----- MODIFICACIÓN: Usar 'fecha_noticia' directamente -----
+# Filtro por Rango de Fechas (límites: min/max de fecha_noticia en la BD)
 fecha_inicio = None
 fecha_fin = None
-if not df_noticias.empty and 'fecha_noticia' in df_noticias.columns and df_noticias['fecha_noticia'].notna().any():
-    try:
-        # La columna 'fecha_noticia' ya contiene objetos date (o debería)
-        fecha_min = df_noticias['fecha_noticia'].min()
-        fecha_max = df_noticias['fecha_noticia'].max()
-
-        # Verificar que sean objetos date válidos
-        if isinstance(fecha_min, date) and isinstance(fecha_max, date):
-            if fecha_min <= fecha_max:
-                fecha_inicio = st.sidebar.date_input(
-                    "Fecha Inicio:", value=fecha_min, min_value=fecha_min, max_value=fecha_max
-                )
-                fecha_fin = st.sidebar.date_input(
-                    "Fecha Fin:", value=fecha_max, min_value=fecha_min, max_value=fecha_max
-                )
-                if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
-                    st.sidebar.error("Error: La fecha de inicio debe ser anterior o igual a la fecha de fin.")
-                    fecha_inicio = None
-                    fecha_fin = None
-            else:
-                st.sidebar.warning("Rango de fechas inválido detectado.")
-        else:
-             st.sidebar.warning("Tipos de fecha inválidos encontrados en la columna 'fecha_noticia'.")
-
-    except Exception as e:
-         st.sidebar.error(f"Error al procesar rango de fechas: {e}")
+if hay_datos:
+    if isinstance(fecha_min, date) and isinstance(fecha_max, date) and fecha_min <= fecha_max:
+        fecha_inicio = st.sidebar.date_input(
+            "Fecha Inicio:", value=fecha_min, min_value=fecha_min, max_value=fecha_max
+        )
+        fecha_fin = st.sidebar.date_input(
+            "Fecha Fin:", value=fecha_max, min_value=fecha_min, max_value=fecha_max
+        )
+        if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
+            st.sidebar.error("Error: La fecha de inicio debe ser anterior o igual a la fecha de fin.")
+            fecha_inicio = None
+            fecha_fin = None
+    else:
+        st.sidebar.warning("Rango de fechas inválido detectado.")
 
 # Usar defaults si algo falló
 if fecha_inicio is None or fecha_fin is None:
-     if not df_noticias.empty:
+     if hay_datos:
           st.sidebar.warning("No se pudo determinar el rango de fechas. Usando últimos 30 días.")
      today = date.today()
      fecha_fin_default = today
@@ -217,106 +163,76 @@ if fecha_inicio is None or fecha_fin is None:
          st.sidebar.error("Fecha de inicio inválida.")
          fecha_inicio = None
          fecha_fin = None
-# --------------------------------------------------------------
-
-# --- Aplicar Filtros ---
-df_filtrado = df_noticias.copy()
-
-if not df_filtrado.empty:
-     if fuentes_seleccionadas:
-         df_filtrado = df_filtrado[df_filtrado['fuente'].isin(fuentes_seleccionadas)]
 
-     if fecha_inicio and fecha_fin and 'fecha_noticia' in df_filtrado.columns:
-         try:
-             # Comparar directamente con la columna de fecha
-             df_filtrado = df_filtrado[
-                 (df_filtrado['fecha_noticia'] >= fecha_inicio) &
-                 (df_filtrado['fecha_noticia'] <= fecha_fin)
-             ]
-         except TypeError as e:
-             st.error(f"Error al aplicar filtro de fecha: {e}. Verifique tipos.")
+# Agregados de esta combinación de filtros (calculados una vez por proceso hasta que un
+# delta toque sus fechas o fuentes); la tabla de muestra se pagina en la BD.
+filtros = {'fuentes': fuentes_seleccionadas, 'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin}
+agregados = rollup.aggregates(**filtros)
+total_noticias_filtradas = agregados['total']
 
 
 # --- Métricas Principales ---
-# ... (sin cambios) ...
 st.subheader("Estadísticas Generales (Filtradas)")
-total_noticias_filtradas = len(df_filtrado)
 st.metric("Total Noticias Encontradas", f"{total_noticias_filtradas}")
 
 # --- Visualizaciones ---
 st.subheader("Visualización de Datos (Filtrados)")
 
-if df_filtrado.empty:
+if total_noticias_filtradas == 0:
     st.info("No hay noticias para mostrar con los filtros seleccionados.")
 else:
     # 1. Noticias por Día
     st.write("📈 Noticias por Día")
-    # ----- MODIFICACIÓN: Agrupar por 'fecha_noticia' -----
-    if 'fecha_noticia' in df_filtrado.columns:
-        noticias_por_dia = df_filtrado.groupby('fecha_noticia')['url'].nunique()
-        if not noticias_por_dia.empty:
-            # Asegurarse que el índice sea tipo fecha para el gráfico
-            noticias_por_dia.index = pd.to_datetime(noticias_por_dia.index)
-            st.line_chart(noticias_por_dia)
-        else:
-            st.info("No hay datos para graficar noticias por día con los filtros actuales.")
+    noticias_por_dia = agregados['por_dia']
+    if not noticias_por_dia.empty:
+        st.line_chart(noticias_por_dia)
     else:
-        st.info("Columna 'fecha_noticia' no encontrada para graficar por día.")
-    # ----------------------------------------------------
+        st.info("No hay datos para graficar noticias por día con los filtros actuales.")
 
-    # 2. Noticias por Fuente (sin cambios)
-    # ...
+    # 2. Noticias por Fuente
     st.write("📊 Noticias por Fuente")
-    if 'fuente' in df_filtrado.columns:
-        noticias_por_fuente = df_filtrado['fuente'].value_counts()
-        if not noticias_por_fuente.empty:
-            st.bar_chart(noticias_por_fuente)
-        else:
-             st.info("No hay datos de fuente con los filtros actuales.")
+    noticias_por_fuente = agregados['por_fuente']
+    if not noticias_por_fuente.empty:
+        st.bar_chart(noticias_por_fuente)
     else:
-         st.info("Columna 'fuente' no encontrada.")
+         st.info("No hay datos de fuente con los filtros actuales.")
 
-    # 3. Noticias por Sección (Top 10) (sin cambios)
-    # ...
+    # 3. Noticias por Sección (Top 10)
     st.write("📊 Top 10 Secciones")
-    if 'seccion' in df_filtrado.columns:
-        noticias_por_seccion = df_filtrado['seccion'].value_counts().nlargest(10)
-        if not noticias_por_seccion.empty:
-            st.bar_chart(noticias_por_seccion)
-        else:
-             st.info("No hay datos de sección con los filtros actuales.")
+    noticias_por_seccion = agregados['top_secciones']
+    if not noticias_por_seccion.empty:
+        st.bar_chart(noticias_por_seccion)
     else:
-        st.info("Columna 'seccion' no encontrada.")
+         st.info("No hay datos de sección con los filtros actuales.")
 
-    # 4. Tabla de Datos
+    # 4. Tabla de Datos (paginada en la BD)
     st.subheader("Muestra de Datos Filtrados")
-    # ----- MODIFICACIÓN: Mostrar 'fecha_noticia' y 'hora_noticia' -----
-    columnas_a_mostrar = ['titulo', 'fecha_noticia', 'hora_noticia', 'seccion', 'fuente', 'url']
-    # Verificar que las columnas existan antes de intentar mostrarlas
-    columnas_disponibles = [col for col in columnas_a_mostrar if col in df_filtrado.columns]
-
-    if 'fecha_noticia' in columnas_disponibles and 'hora_noticia' in columnas_disponibles:
-         st.dataframe(
-            df_filtrado[columnas_disponibles].head(20),
-            column_config={
-                "fecha_noticia": st.column_config.DateColumn(
-                    "Fecha Noticia",
-                    format="YYYY-MM-DD", # Formato deseado para fecha
-                ),
-                "hora_noticia": st.column_config.TimeColumn(
-                    "Hora Noticia",
-                    format="HH:mm:ss", # Formato deseado para hora
-                )
-            },
-            use_container_width=True
-         )
-    else:
-         st.warning("Columnas de fecha y/o hora no encontradas. Mostrando tabla parcial.")
-         # Mostrar tabla sin columnas de fecha/hora si faltan
-         fallback_columns = [col for col in columnas_disponibles if col not in ['fecha_noticia', 'hora_noticia']]
-         if fallback_columns:
-              st.dataframe(df_filtrado[fallback_columns].head(20), use_container_width=True)
-         else:
-              st.info("No hay columnas de datos básicos para mostrar.")
+    paginas = max(1, -(-total_noticias_filtradas // queries.PAGE_SIZE))
+    pagina = st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, step=1)
+    st.dataframe(
+        queries.muestra(conn, page=int(pagina), **filtros),
+        column_config={
+            "publicado": st.column_config.DatetimeColumn(
+                "Fecha y Hora Noticia",
+                format="YYYY-MM-DD HH:mm:ss", # Formato deseado para fecha y hora
+            )
+        },
+        use_container_width=True
+    )
 
-    # -----------------------------------------------------------------
\ No newline at end of file
+# --- Instrumentación del caché compartido ---
+with st.sidebar.expander("Instrumentación"):
+    estado = rollup.stats()
+    st.metric("Rollup en memoria", f"{estado['rollup_rows']} filas",
+              f"{estado['rollup_bytes'] / 1024:.1f} KB (Arrow)", delta_color="off")
+    st.metric("Agregados en caché", estado['cached_aggregates'],
+              f"{estado['cached_bytes'] / 1024:.1f} KB", delta_color="off")
+    tasa = estado['hit_rate']
+    st.metric("Tasa de aciertos", f"{tasa:.0%}" if tasa is not None else "N/A",
+              f"{estado['hits']} aciertos / {estado['misses']} fallos", delta_color="off")
+    st.caption(f"Cargas completas: {estado['loads']} · Deltas: {estado['deltas']} · "
+               f"Agregados invalidados: {estado['invalidated']} · Marca de agua: {estado['watermark']}")
+    recarga = estado['full_reload_in']
+    st.caption("Los deltas solo suman: una noticia reemplazada con `backfill --upsert` se cuenta "
+               "dos veces (versión anterior y nueva) hasta la próxima recarga completa del rollup"
+               + (f", en {recarga / 60:.0f} min." if recarga is not None else "."))
@@ -0,0 +1,297 @@
+# backfill.py
+#
+# Repuebla newspaper (Refined Zone) y consumption_analytics (Consumption Zone) desde
+# los archivos de la Landing Zone, sin volver a crawlear. Los registros se leen en
+# streaming, pasan por la misma transformación que RefinedZonePipeline
+# (transform.transform_batch, opcionalmente en varios procesos) y se cargan por lotes
+# con COPY. Cada lote se confirma en una sola transacción y después se guarda el punto
+# de avance (checkpoint), así que una ejecución interrumpida se retoma donde quedó;
+# las cargas no duplican filas (url única), por lo que repetir un lote no hace daño.
+# Por defecto las urls que ya están en la BD se saltan; con --upsert se reemplazan
+# (y el rollup resta sus conteos viejos), así que se puede recargar un subconjunto
+# filtrado sin vaciar las tablas.
+#
+# Uso (desde la raíz del repo):
+#   python -m newspaper_collector.backfill                              # toda la Landing Zone
+#   python -m newspaper_collector.backfill --source eldeber --desde 2025-04-01 --workers 4
+#   python -m newspaper_collector.backfill --source eldeber --upsert   # reemplazar lo ya cargado
+#   python -m newspaper_collector.backfill --rebuild    # vaciar ambas tablas y recargar todo
+
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from newspaper_collector import db
+from newspaper_collector.landing import iter_landing_records
+from newspaper_collector.manifest import LandingManifest, article_date, record_source
+from newspaper_collector.pipelines.consumption_zone_pipeline import consumption_row
+from newspaper_collector.transform import transform_batch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = 'datalake/STATE/backfill_checkpoint.json'
+
+
+class Checkpoint:
+    """
+    Avance por archivo: {'rows': registros ya cargados, 'size': tamaño, 'done': bool}.
+    Si cambian los filtros el checkpoint anterior no sirve y se empieza de cero.
+    """
+
+    def __init__(self, path, filters):
+        self.path = path
+        self.filters = filters
+        self.files = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('filters') == filters:
+                self.files = data.get('files', {})
+            else:
+                logger.warning(f"El checkpoint {path} es de otros filtros ({data.get('filters')}); se empieza de cero.")
+
+    def position(self, relative, size):
+        """Registros a saltar en el archivo, o None si ya se cargó entero (con el mismo tamaño)."""
+        entry = self.files.get(relative)
+        if not entry:
+            return 0
+        if entry.get('done') and entry.get('size') == size:
+            return None
+        return entry.get('rows', 0) if entry.get('size') == size else 0
+
+    def advance(self, relative, size, rows, done=False):
+        self.files[relative] = {'size': size, 'rows': rows, 'done': done}
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'filters': self.filters, 'files': self.files}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.files = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def landing_files(landing_dir, source=None, saved_from=None, saved_to=None, fecha_from=None, fecha_to=None):
+    """
+    Archivos del manifiesto que pueden tener registros en los filtros, más los archivos
+    planos anteriores al particionado que aún no estén indexados.
+    """
+    manifest = LandingManifest(landing_dir)
+    try:
+        paths = set(manifest.files(source, saved_from, saved_to, fecha_from, fecha_to))
+        paths.update(path for path in glob.glob(os.path.join(landing_dir, '*.jsonl*'))
+                     if not manifest.is_indexed(path))
+    finally:
+        manifest.close()
+    return sorted(path for path in paths if not path.endswith('.tmp'))
+
+
+def record_filter(source=None, saved_from=None, saved_to=None, fecha_from=None, fecha_to=None):
+    """Filtro por registro (los archivos planos y los rangos del manifiesto son aproximados)."""
+    source = source.lower() if source else None
+
+    def accept(record):
+        if source and record_source(record) != source:
+            return False
+        saved = str(record.get('date_saved') or '')[:10]
+        if (saved_from and saved < saved_from) or (saved_to and saved > saved_to):
+            return False
+        if fecha_from or fecha_to:
+            fecha = article_date(record.get('fecha'))
+            if fecha is None or (fecha_from and fecha < fecha_from) or (fecha_to and fecha > fecha_to):
+                return False
+        return True
+
+    return accept
+
+
+def iter_events(paths, landing_dir, checkpoint, accept):
+    """
+    Genera ('record', archivo, n, registro) por cada registro aceptado y ('eof', archivo,
+    n, tamaño) al terminar cada archivo; n es la cantidad de registros leídos del archivo.
+    """
+    for path in paths:
+        relative = os.path.relpath(path, landing_dir).replace(os.sep, '/')
+        size = os.path.getsize(path)
+        skip = checkpoint.position(relative, size)
+        if skip is None:
+            continue
+        n = 0
+        for record in iter_landing_records(path):
+            n += 1
+            if n <= skip or not accept(record):
+                continue
+            yield 'record', relative, n, record
+        yield 'eof', relative, n, size
+
+
+def iter_batches(events, batch_size):
+    """
+    Agrupa los eventos en lotes de hasta batch_size registros. Cada lote es (registros,
+    avance) con el avance por archivo que queda confirmado cuando el lote se carga.
+    """
+    records = []
+    progress = {}
+    sizes = {}
+    for kind, relative, n, value in events:
+        if kind == 'record':
+            records.append(value)
+            progress[relative] = (n, False)
+        else:
+            sizes[relative] = value
+            progress[relative] = (n, True)
+        if len(records) >= batch_size:
+            yield records, progress, sizes
+            records, progress, sizes = [], {}, {}
+    if records or progress:
+        yield records, progress, sizes
+
+
+def transform_batches(batches, workers=0):
+    """
+    transform_batch sobre cada lote, en orden. Con workers > 1 se usan procesos aparte,
+    con a lo sumo 2 * workers lotes en vuelo para que la memoria quede acotada.
+    """
+    if workers <= 1:
+        for batch in batches:
+            yield batch, transform_batch(batch[0])
+        return
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        in_flight = deque()
+        batches = iter(batches)
+        for batch in islice(batches, workers * 2):
+            in_flight.append((batch, executor.submit(transform_batch, batch[0])))
+        while in_flight:
+            batch, future = in_flight.popleft()
+            output = future.result()
+            for next_batch in islice(batches, 1):
+                in_flight.append((next_batch, executor.submit(transform_batch, next_batch[0])))
+            yield batch, output
+
+
+def load_batch(records, refined=True, consumption=True, replace=False):
+    """
+    Carga un lote ya transformado en una transacción; devuelve (newspaper, consumption)
+    escritas (con replace=True también cuentan las filas reemplazadas).
+    """
+    with db.connection() as conn:
+        inserted_refined = db.copy_newspaper_rows(conn, records, replace) if refined and records else 0
+        inserted_consumption = 0
+        if consumption and records:
+            rows = [consumption_row(record, record.get('fecha_dt')) for record in records]
+            inserted_consumption = db.copy_consumption_rows(conn, rows, replace)
+        conn.commit()
+    return inserted_refined, inserted_consumption
+
+
+def truncate_zones(refined=True, consumption=True):
+    """Vacía las tablas enteras: solo para recargas sin filtros (main lo valida)."""
+    tables = [t for t, wanted in (('newspaper', refined), ('consumption_analytics', consumption),
+                                  ('consumption_rollup', consumption)) if wanted]
+    with db.connection() as conn:
+        cur = conn.cursor()
+        # Sin RESTART IDENTITY: export_parquet exporta newspaper por id (id > último
+        # exportado), así que las filas recargadas tienen que seguir con ids nuevos.
+        cur.execute(f"TRUNCATE {', '.join(tables)}")
+        cur.close()
+        conn.commit()
+    logger.info(f"Tablas vaciadas: {', '.join(tables)}")
+
+
+def backfill(landing_dir, checkpoint, accept, paths, batch_size=5000, workers=0, refined=True, consumption=True,
+             replace=False):
+    totals = {'read': 0, 'failed': 0, 'newspaper': 0, 'consumption': 0}
+    date_stats = {}
+    batches = iter_batches(iter_events(paths, landing_dir, checkpoint, accept), batch_size)
+    for (records, progress, sizes), (results, stats) in transform_batches(batches, workers):
+        transformed = [record for record, error in results if error is None]
+        totals['read'] += len(records)
+        totals['failed'] += len(records) - len(transformed)
+        for key, count in stats.items():
+            date_stats[key] = date_stats.get(key, 0) + count
+        inserted = load_batch(transformed, refined, consumption, replace)
+        totals['newspaper'] += inserted[0]
+        totals['consumption'] += inserted[1]
+        for relative, (n, done) in progress.items():
+            size = sizes.get(relative)
+            if size is None:
+                size = os.path.getsize(os.path.join(landing_dir, relative))
+            checkpoint.advance(relative, size, n, done)
+        checkpoint.save()
+        logger.info(f"Backfill: {totals['read']} registros leídos, {totals['failed']} descartados, "
+                    f"{totals['newspaper']} escritos en newspaper, {totals['consumption']} en consumption_analytics.")
+    totals.update(date_stats)
+    return totals
+
+
+def checkpoint_filters(args):
+    """Opciones que definen qué se carga: un checkpoint solo sirve con las mismas."""
+    return {'source': args.source, 'desde': args.desde, 'hasta': args.hasta,
+            'fecha_desde': args.fecha_desde, 'fecha_hasta': args.fecha_hasta, 'solo': args.solo,
+            'upsert': args.upsert}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Repuebla la Refined y Consumption Zone desde la Landing Zone.")
+    arg_parser.add_argument('--landing-dir', default='datalake/LANDING_ZONE')
+    arg_parser.add_argument('--source')
+    arg_parser.add_argument('--desde', help="date_saved desde (YYYY-MM-DD)")
+    arg_parser.add_argument('--hasta', help="date_saved hasta (YYYY-MM-DD)")
+    arg_parser.add_argument('--fecha-desde', help="fecha de la noticia desde (YYYY-MM-DD)")
+    arg_parser.add_argument('--fecha-hasta', help="fecha de la noticia hasta (YYYY-MM-DD)")
+    arg_parser.add_argument('--solo', choices=('refined', 'consumption'), help="Cargar solo una de las tablas.")
+    arg_parser.add_argument('--batch-size', type=int, default=5000, help="Registros por lote (y por transacción).")
+    arg_parser.add_argument('--workers', type=int, default=0, help="Procesos para la transformación (<= 1: en este proceso).")
+    arg_parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    arg_parser.add_argument('--reset', action='store_true', help="Ignorar el checkpoint y empezar de cero.")
+    arg_parser.add_argument('--rebuild', action='store_true',
+                            help="Vaciar las tablas (TRUNCATE) antes de cargar; implica --reset. No admite filtros.")
+    arg_parser.add_argument('--upsert', action='store_true',
+                            help="Reemplazar las filas cuya url ya está cargada en vez de saltarlas "
+                                 "(en newspaper con id nuevo, para que export_parquet las vuelva a exportar).")
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    filters = checkpoint_filters(args)
+    ranges = (args.source, args.desde, args.hasta, args.fecha_desde, args.fecha_hasta)
+    if args.rebuild and any(ranges):
+        # TRUNCATE borraría también las filas fuera de los filtros, que no se vuelven a cargar.
+        arg_parser.error("--rebuild vacía las tablas enteras y no se puede combinar con "
+                         "--source/--desde/--hasta/--fecha-desde/--fecha-hasta; usar --upsert.")
+    refined = args.solo != 'consumption'
+    consumption = args.solo != 'refined'
+
+    checkpoint = Checkpoint(args.checkpoint, filters)
+    if args.reset or args.rebuild:
+        checkpoint.reset()
+    paths = landing_files(args.landing_dir, *ranges)
+    logger.info(f"Backfill de {len(paths)} archivos de la Landing Zone.")
+
+    db.acquire_pool(1, 1)
+    try:
+        if args.rebuild:
+            truncate_zones(refined, consumption)
+        totals = backfill(args.landing_dir, checkpoint, record_filter(*ranges), paths,
+                          args.batch_size, args.workers, refined, consumption, args.upsert)
+    finally:
+        db.release_pool()
+    for key, value in totals.items():
+        print(f"{key:24} {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# crawl_state.py
+#
+# Marcas de agua (high-water marks) por fuente/sección para el crawl incremental:
+# la noticia más reciente vista en la primera página de cada listado.
+
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlState:
+
+    def __init__(self, path=None):
+        self.path = path
+        self.marks = {}
+        # Marcas nuevas de esta ejecución; se guardan solo si el crawl termina bien.
+        self.pending = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.marks = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"No se pudo leer el estado del crawl {path}: {e}")
+
+    @staticmethod
+    def key(source, section=None):
+        return f"{source}/{section}" if section else source
+
+    def newest_url(self, key):
+        mark = self.marks.get(key)
+        return mark.get('newest_url') if mark else None
+
+    def update(self, key, url, fecha=None):
+        self.pending[key] = {
+            'newest_url': url,
+            'newest_fecha': fecha,
+            'updated_at': datetime.now().isoformat(),
+        }
+
+    def save(self):
+        if not self.path or not self.pending:
+            return
+        # Otros shards pueden haber guardado sus marcas mientras corría este crawl:
+        # se relee el archivo y solo se pisan las claves de esta ejecución.
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.marks.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"No se pudo releer el estado del crawl {self.path}: {e}")
+        self.marks.update(self.pending)
+        self.pending = {}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.marks, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class PageProgress:
+    """Cuenta cuántas noticias de una página de listado no se habían visto antes."""
+
+    def __init__(self, state, key, page, is_seen):
+        self.state = state
+        self.key = key
+        self.page = page
+        self.is_seen = is_seen
+        newest = state.newest_url(key) if state is not None else None
+        self.mark = newest.strip().lower() if newest else None
+        self.unseen = 0
+        self.mark_reached = False
+        self.first = True
+
+    def saw(self, url, fecha=None):
+        # La primera noticia de la página 1 es la nueva marca de agua del listado.
+        if self.first and self.page == 1 and self.state is not None:
+            self.state.update(self.key, url, fecha)
+        self.first = False
+        if self.mark and url.strip().lower() == self.mark:
+            self.mark_reached = True
+        elif not self.mark_reached and not self.is_seen(url):
+            self.unseen += 1
+
+    @property
+    def exhausted(self):
+        """True si la página ya no trajo nada nuevo: las siguientes solo tendrán noticias más viejas."""
+        return self.mark_reached or self.unseen == 0
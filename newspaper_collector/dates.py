@@ -0,0 +1,79 @@
+# dates.py
+#
+# Normalización de las fechas que entregan los spiders. Los formatos son pocos y conocidos,
+# así que se prueban primero parsers específicos por fuente; dateutil queda como último
+# recurso. Los resultados se memorizan por texto crudo (el mismo listado se ve muchas veces).
+#
+#   El Deber / Los Tiempos:  "09/04/2025 - 18:45"           (día/mes/año)
+#   Ahora El Pueblo:         "2025-04-08T14:49:03-04:00"    (atributo datetime, ISO 8601)
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+from dateutil import parser
+
+DMY_HM = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})(?:\s*-\s*(\d{1,2}):(\d{2}))?$')
+
+
+def parse_dmy_hm(value):
+    match = DMY_HM.match(value)
+    if not match:
+        return None
+    day, month, year, hour, minute = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+    except ValueError:
+        return None
+
+
+def parse_iso(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+# Parsers rápidos por fuente, en orden de preferencia. Las fuentes desconocidas (o los
+# registros viejos sin 'source') prueban todos.
+SOURCE_PARSERS = {
+    'eldeber': (parse_dmy_hm, parse_iso),
+    'lostiempos': (parse_dmy_hm, parse_iso),
+    'ahoraelpueblo': (parse_iso, parse_dmy_hm),
+}
+DEFAULT_PARSERS = (parse_dmy_hm, parse_iso)
+
+
+@lru_cache(maxsize=8192)
+def _parse(value, source):
+    """Devuelve (datetime o None, método): 'fast', 'fallback' o 'failed'."""
+    for parse in SOURCE_PARSERS.get(source, DEFAULT_PARSERS):
+        parsed = parse(value)
+        if parsed is not None:
+            return parsed, 'fast'
+    try:
+        # Las fechas numéricas de estos diarios siempre vienen con el día primero.
+        return parser.parse(value, dayfirst=True), 'fallback'
+    except (ValueError, TypeError, OverflowError):
+        return None, 'failed'
+
+
+def parse_fecha(value, source=None, stats=None):
+    """
+    Convierte el texto crudo de 'fecha' en datetime (None si no se reconoce). Si se pasa
+    stats (las stats de Scrapy) cuenta dates/cache_hit, dates/fast, dates/fallback y
+    dates/failed.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    if stats is None:
+        return _parse(value, source)[0]
+    hits = _parse.cache_info().hits
+    parsed, method = _parse(value, source)
+    if _parse.cache_info().hits > hits:
+        stats.inc_value('dates/cache_hit')
+    else:
+        stats.inc_value('dates/cache_miss')
+        stats.inc_value(f'dates/{method}')
+    return parsed
@@ -0,0 +1,446 @@
+# db.py
+#
+# Capa de base de datos compartida por RefinedZonePipeline y ConsumptionZonePipeline:
+# un pool de conexiones por proceso, el esquema (creado una sola vez por versión)
+# y las sentencias de escritura por lotes.
+
+import io
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Subir este número al cambiar SCHEMA_STATEMENTS; los procesos con la versión
+# ya aplicada no vuelven a ejecutar el DDL.
+SCHEMA_VERSION = 3
+SCHEMA_LOCK_ID = 7420250409
+
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS newspaper (
+        id SERIAL PRIMARY KEY,
+        data_id TEXT,
+        titulo TEXT,
+        descripcion TEXT,
+        fecha TEXT,
+        seccion TEXT,
+        url TEXT,
+        date_saved_iso TEXT
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_newspaper_url ON newspaper(url);",
+    """
+    CREATE TABLE IF NOT EXISTS consumption_analytics (
+        id SERIAL PRIMARY KEY,
+        titulo TEXT,
+        fecha_noticia DATE,       -- Columna para la fecha
+        hora_noticia TIME,        -- Columna para la hora
+        seccion TEXT,
+        fuente TEXT,
+        url TEXT UNIQUE,
+        fecha_procesado TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_consumption_url ON consumption_analytics(url);",
+    "CREATE INDEX IF NOT EXISTS idx_consumption_fecha ON consumption_analytics(fecha_noticia);",
+    "CREATE INDEX IF NOT EXISTS idx_consumption_fuente ON consumption_analytics(fuente);",
+    # v2: conteos por (fecha, fuente, sección) para los gráficos del dashboard. Solo
+    # cuenta las noticias con fecha y hora (las que muestra el dashboard); fuente o
+    # sección desconocidas quedan como ''. Se mantiene con update_rollup.
+    """
+    CREATE TABLE IF NOT EXISTS consumption_rollup (
+        fecha_noticia DATE NOT NULL,
+        fuente TEXT NOT NULL DEFAULT '',
+        seccion TEXT NOT NULL DEFAULT '',
+        n INTEGER NOT NULL,
+        PRIMARY KEY (fecha_noticia, fuente, seccion)
+    );
+    """,
+    # Carga inicial desde los datos existentes (solo si el rollup está vacío).
+    """
+    INSERT INTO consumption_rollup (fecha_noticia, fuente, seccion, n)
+    SELECT fecha_noticia, COALESCE(fuente, ''), COALESCE(seccion, ''), count(*)
+    FROM consumption_analytics
+    WHERE fecha_noticia IS NOT NULL AND hora_noticia IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM consumption_rollup)
+    GROUP BY 1, 2, 3;
+    """,
+    # v3: el dashboard pide los deltas por fecha_procesado.
+    "CREATE INDEX IF NOT EXISTS idx_consumption_procesado ON consumption_analytics(fecha_procesado);",
+]
+
+# Tabla temporal (por sesión) donde se carga cada lote de la Refined Zone.
+STAGING_STATEMENT = """
+    CREATE TEMP TABLE IF NOT EXISTS newspaper_staging (
+        ord INTEGER,
+        data_id TEXT,
+        titulo TEXT,
+        descripcion TEXT,
+        fecha TEXT,
+        seccion TEXT,
+        url TEXT,
+        date_saved_iso TEXT
+    );
+"""
+
+# Staging de consumption_analytics para las cargas con COPY (backfill).
+CONSUMPTION_STAGING_STATEMENT = """
+    CREATE TEMP TABLE IF NOT EXISTS consumption_staging (
+        ord INTEGER,
+        titulo TEXT,
+        fecha_noticia DATE,
+        hora_noticia TIME,
+        seccion TEXT,
+        fuente TEXT,
+        url TEXT
+    );
+"""
+
+NEWSPAPER_COLUMNS = ('data_id', 'titulo', 'descripcion', 'fecha', 'seccion', 'url', 'date_saved_iso')
+CONSUMPTION_COLUMNS = ('titulo', 'fecha_noticia', 'hora_noticia', 'seccion', 'fuente', 'url')
+# Columnas que devuelven los INSERT de consumption_analytics para actualizar el rollup.
+ROLLUP_RETURNING = 'fecha_noticia, hora_noticia, fuente, seccion'
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Conexión que recuerda si ya tiene creadas sus tablas temporales de staging."""
+    staging_ready = False
+    consumption_staging_ready = False
+
+
+_pool = None
+_pool_users = 0
+_pool_lock = threading.Lock()
+keep_alive = False
+# Errores de BD que se tratan como fallo de lote (se amplía al instalar otro backend).
+DB_ERRORS = (psycopg2.Error,)
+
+
+def connection_params():
+    load_dotenv()
+    return {
+        'host': os.getenv('DB_HOST'),
+        'port': os.getenv('DB_PORT'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'dbname': os.getenv('DB_DATABASE'),
+    }
+
+
+def acquire_pool(minconn=1, maxconn=10):
+    """Devuelve el pool del proceso, creándolo (y asegurando el esquema) la primera vez."""
+    global _pool, _pool_users
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = pool.ThreadedConnectionPool(
+                minconn, maxconn, connection_factory=PooledConnection, **connection_params()
+            )
+            try:
+                ensure_schema(_pool)
+            except Exception:
+                _pool.closeall()
+                _pool = None
+                raise
+            logger.info(f"Pool de conexiones a BD creado ({minconn}-{maxconn} conexiones).")
+        _pool_users += 1
+        return _pool
+
+
+def install_pool(db_pool, errors=()):
+    """
+    Instala un pool ya creado como pool del proceso (p. ej. el sustituto SQLite de los
+    benchmarks o un pool instrumentado). Debe ofrecer getconn/putconn/closeall/closed.
+    """
+    global _pool, DB_ERRORS
+    with _pool_lock:
+        ensure_schema(db_pool)
+        _pool = db_pool
+        DB_ERRORS = (psycopg2.Error,) + tuple(errors)
+    return db_pool
+
+
+def release_pool():
+    """Cierra el pool cuando ya no lo usa ningún pipeline (salvo que keep_alive esté activo)."""
+    global _pool, _pool_users
+    with _pool_lock:
+        _pool_users = max(0, _pool_users - 1)
+        if _pool_users == 0 and _pool is not None and not keep_alive:
+            _pool.closeall()
+            _pool = None
+            logger.info("Pool de conexiones a BD cerrado.")
+
+
+@contextmanager
+def connection(db_pool=None):
+    """Presta una conexión del pool y la devuelve al terminar (con rollback si quedó a medias)."""
+    db_pool = db_pool or _pool
+    if db_pool is None:
+        raise RuntimeError("El pool de BD no está inicializado; llamar a acquire_pool() primero.")
+    conn = db_pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db_pool.putconn(conn, close=bool(conn.closed))
+
+
+def ensure_schema(db_pool):
+    with connection(db_pool) as conn:
+        cur = conn.cursor()
+        # Evita que dos procesos (p. ej. crawls en paralelo) ejecuten el DDL a la vez.
+        if isinstance(conn, psycopg2.extensions.connection):
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+        cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL);")
+        cur.execute("SELECT MAX(version) FROM schema_version;")
+        current = cur.fetchone()[0] or 0
+        if current < SCHEMA_VERSION:
+            for statement in SCHEMA_STATEMENTS:
+                cur.execute(statement)
+            cur.execute("INSERT INTO schema_version (version) VALUES (%s);", (SCHEMA_VERSION,))
+            logger.info(f"Esquema de BD actualizado de la versión {current} a la {SCHEMA_VERSION}.")
+        conn.commit()
+        cur.close()
+
+
+def write_batch(write, rows, on_row_error=None):
+    """
+    Ejecuta write(conn, rows) en una sola transacción. Si el lote falla se reintenta
+    fila por fila, para que una fila inválida no descarte el lote entero.
+    Devuelve (insertadas, fallidas).
+    """
+    with connection() as conn:
+        try:
+            inserted = write(conn, rows)
+            conn.commit()
+            return inserted, 0
+        except DB_ERRORS as e:
+            conn.rollback()
+            logger.warning(f"Falló un lote de {len(rows)} filas ({e}); reintentando fila por fila.")
+
+        inserted = 0
+        failed = 0
+        for row in rows:
+            try:
+                inserted += write(conn, [row])
+                conn.commit()
+            except DB_ERRORS as e:
+                conn.rollback()
+                failed += 1
+                if on_row_error is not None:
+                    on_row_error(row, e)
+        return inserted, failed
+
+
+def insert_newspaper_rows(conn, rows):
+    """
+    Inserta en newspaper las filas (dicts de la Refined Zone) cuya url no exista todavía.
+    Se carga el lote en staging y se inserta con un único INSERT ... SELECT; devuelve
+    cuántas filas se insertaron. No hace commit.
+    """
+    cur = conn.cursor()
+    _ensure_staging(conn, cur, 'staging_ready', STAGING_STATEMENT)
+    _execute_values(
+        cur,
+        f"INSERT INTO newspaper_staging (ord, {', '.join(NEWSPAPER_COLUMNS)}) VALUES %s",
+        _newspaper_staging_rows(rows),
+        page_size=len(rows),
+    )
+    inserted = _insert_newspaper_from_staging(cur)
+    cur.close()
+    return inserted
+
+
+def copy_newspaper_rows(conn, rows, replace=False):
+    """
+    Como insert_newspaper_rows, pero carga el staging con COPY (lotes grandes del backfill).
+    Con replace=True las urls que ya están en la tabla se borran y se vuelven a insertar
+    con la última aparición del lote: toman un id nuevo, así que export_parquet (que
+    exporta por id) las vuelve a exportar. Devuelve cuántas filas se insertaron.
+    """
+    cur = conn.cursor()
+    _ensure_staging(conn, cur, 'staging_ready', STAGING_STATEMENT)
+    copy_rows(cur, 'newspaper_staging', ('ord',) + NEWSPAPER_COLUMNS, _newspaper_staging_rows(rows))
+    if replace:
+        cur.execute("DELETE FROM newspaper WHERE url IN (SELECT url FROM newspaper_staging)")
+    inserted = _insert_newspaper_from_staging(cur, 'MAX' if replace else 'MIN')
+    cur.close()
+    return inserted
+
+
+def copy_consumption_rows(conn, rows, replace=False):
+    """
+    Carga tuplas (CONSUMPTION_COLUMNS) con COPY a staging y las pasa a
+    consumption_analytics con un solo INSERT ... ON CONFLICT, actualizando el rollup.
+    Devuelve cuántas se insertaron. Con replace=True las urls existentes se
+    reemplazan por la última aparición del lote (ON CONFLICT DO UPDATE): sus conteos
+    anteriores se restan del rollup antes de sumar los nuevos, y se cuentan como
+    escritas. No hace commit.
+    """
+    cur = conn.cursor()
+    _ensure_staging(conn, cur, 'consumption_staging_ready', CONSUMPTION_STAGING_STATEMENT)
+    copy_rows(cur, 'consumption_staging', ('ord',) + CONSUMPTION_COLUMNS,
+              [(ord_,) + tuple(row) for ord_, row in enumerate(rows)])
+    if replace:
+        cur.execute(f"""
+            SELECT {ROLLUP_RETURNING} FROM consumption_analytics
+            WHERE url IN (SELECT url FROM consumption_staging)
+        """)
+        update_rollup(cur, cur.fetchall(), sign=-1)
+        # DO UPDATE no admite dos filas del mismo INSERT con la misma url: va solo la última.
+        where = "url IS NULL OR ord = (SELECT MAX(s2.ord) FROM consumption_staging s2 WHERE s2.url = s.url)"
+        conflict = "DO UPDATE SET " + ', '.join(
+            f"{col} = EXCLUDED.{col}" for col in CONSUMPTION_COLUMNS if col != 'url'
+        ) + ", fecha_procesado = CURRENT_TIMESTAMP"
+    else:
+        # WHERE true: SQLite (benchmarks) lo necesita para aceptar ON CONFLICT tras un SELECT.
+        where, conflict = "true", "DO NOTHING"
+    cur.execute(f"""
+        INSERT INTO consumption_analytics ({', '.join(CONSUMPTION_COLUMNS)})
+        SELECT {', '.join(CONSUMPTION_COLUMNS)} FROM consumption_staging s WHERE {where}
+        ORDER BY ord
+        ON CONFLICT (url) {conflict}
+        RETURNING {ROLLUP_RETURNING}
+    """)
+    returned = cur.fetchall()
+    update_rollup(cur, returned)
+    cur.execute("DELETE FROM consumption_staging")
+    cur.close()
+    return len(returned)
+
+
+def copy_rows(cur, table, columns, rows):
+    """
+    COPY ... FROM STDIN en formato texto. Los cursores sin copy_expert (otros backends)
+    caen a un INSERT por páginas.
+    """
+    if not hasattr(cur, 'copy_expert'):
+        _execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=1000)
+        return
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _ensure_staging(conn, cur, flag, statement):
+    if not getattr(conn, flag, False):
+        # Se confirma aparte para que un rollback del lote no se lleve la tabla temporal.
+        cur.execute(statement)
+        conn.commit()
+        setattr(conn, flag, True)
+
+
+def _newspaper_staging_rows(rows):
+    return [
+        (
+            ord_,
+            row.get('data_id'),
+            row.get('titulo'),
+            row.get('descripcion'),
+            row.get('fecha'),
+            row.get('seccion'),
+            row.get('url'),
+            row.get('date_saved'),
+        )
+        for ord_, row in enumerate(rows)
+    ]
+
+
+def _insert_newspaper_from_staging(cur, pick='MIN'):
+    # Solo una aparición de cada url en el lote (la primera, o la última con pick='MAX'),
+    # y solo si no está ya en la tabla. Las filas sin url se insertan siempre, igual que antes.
+    cur.execute(f"""
+        INSERT INTO newspaper ({', '.join(NEWSPAPER_COLUMNS)})
+        SELECT {', '.join('s.' + col for col in NEWSPAPER_COLUMNS)}
+        FROM newspaper_staging s
+        WHERE s.url IS NULL
+           OR (s.ord = (SELECT {pick}(s2.ord) FROM newspaper_staging s2 WHERE s2.url = s.url)
+               AND NOT EXISTS (SELECT 1 FROM newspaper n WHERE n.url = s.url))
+        ORDER BY s.ord
+    """)
+    inserted = cur.rowcount
+    cur.execute("DELETE FROM newspaper_staging")
+    return inserted
+
+
+def upsert_consumption_rows(conn, rows):
+    """
+    Inserta tuplas (CONSUMPTION_COLUMNS) en consumption_analytics con un único
+    INSERT ... ON CONFLICT. Devuelve cuántas se insertaron (las duplicadas no
+    aparecen en RETURNING) y suma esas mismas filas al rollup. No hace commit.
+    """
+    cur = conn.cursor()
+    returned = _execute_values(
+        cur,
+        f"""
+            INSERT INTO consumption_analytics
+            ({', '.join(CONSUMPTION_COLUMNS)})
+            VALUES %s
+            ON CONFLICT (url) DO NOTHING
+            RETURNING {ROLLUP_RETURNING};
+        """,
+        rows,
+        page_size=len(rows),
+        fetch=True,
+    )
+    update_rollup(cur, returned)
+    cur.close()
+    return len(returned)
+
+
+def update_rollup(cur, inserted, sign=1):
+    """
+    Suma a consumption_rollup las filas recién insertadas en consumption_analytics
+    (tuplas ROLLUP_RETURNING), en la misma transacción que el INSERT. Con sign=-1 las
+    resta (filas que se van a reemplazar) y borra las claves que quedan en cero.
+    """
+    counts = Counter(
+        (fecha, fuente or '', seccion or '')
+        for fecha, hora, fuente, seccion in inserted
+        if fecha is not None and hora is not None
+    )
+    if not counts:
+        return
+    # Orden fijo de claves: dos shards que escriben a la vez no se bloquean en cruz.
+    _execute_values(
+        cur,
+        """
+            INSERT INTO consumption_rollup (fecha_noticia, fuente, seccion, n)
+            VALUES %s
+            ON CONFLICT (fecha_noticia, fuente, seccion)
+            DO UPDATE SET n = consumption_rollup.n + EXCLUDED.n;
+        """,
+        [key + (sign * n,) for key, n in sorted(counts.items())],
+        page_size=len(counts),
+    )
+    if sign < 0:
+        cur.execute("DELETE FROM consumption_rollup WHERE n <= 0")
+
+
+def _execute_values(cur, sql, rows, page_size=100, fetch=False):
+    # Los cursores de otros backends pueden implementar su propio execute_values.
+    if hasattr(cur, 'execute_values'):
+        return cur.execute_values(sql, rows, page_size=page_size, fetch=fetch)
+    return execute_values(cur, sql, rows, page_size=page_size, fetch=fetch)
@@ -0,0 +1,261 @@
+# dedup.py
+#
+# Índice en memoria de URLs ya guardadas en la Refined y en la Consumption Zone. Se
+# calienta una vez al abrir el spider (desde disco y/o desde la BD) y permite descartar
+# duplicados antes de que lleguen a los pipelines o a cualquier consulta SQL.
+
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+# NCDEDUP2: desde que el índice solo tiene urls presentes en ambas tablas. Los archivos
+# NCDEDUP1 (solo consumption_analytics) no se cargan y el índice se reconstruye.
+FILE_MAGIC = b'NCDEDUP2'
+
+# Zonas en las que una url tiene que estar guardada para entrar al índice.
+ZONES = frozenset(('refined', 'consumption'))
+
+# Urls de consumption_analytics que también están en newspaper (idx_newspaper_url).
+WARMUP_QUERY = """
+    SELECT c.url, c.fecha_procesado FROM consumption_analytics c
+    WHERE EXISTS (SELECT 1 FROM newspaper n WHERE n.url = c.url)
+"""
+
+
+def normalize_url(url):
+    """Misma normalización que aplica RefinedZonePipeline antes de guardar la url."""
+    if not url:
+        return None
+    return url.strip().lower()
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un bytearray, con doble hashing a partir de un blake2b de 128 bits."""
+
+    def __init__(self, capacity, error_rate, num_bits=None, num_hashes=None, bits=None):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        if num_bits is None:
+            num_bits = math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / self.capacity * math.log(2)))
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def size_bytes(self):
+        return len(self.bits)
+
+
+class UrlDedupIndex:
+    """
+    Filtro de Bloom con un set exacto opcional detrás. Con exact=True no hay falsos
+    positivos (el set confirma cada acierto del filtro); con exact=False solo se guarda
+    el filtro y la tasa de falsos positivos es ~error_rate mientras no se supere capacity.
+    """
+
+    def __init__(self, capacity=200000, error_rate=0.001, exact=True):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.exact = set() if exact else None
+        self.count = 0
+        # Mayor fecha_procesado ya cargada desde la BD (ISO 8601), para recargas incrementales.
+        self.watermark = None
+        # url -> zonas que ya la guardaron en este proceso (ver confirm).
+        self.partial = {}
+        # Spiders abiertos que comparten el índice (shards en el mismo proceso).
+        self.spiders = 0
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        key = normalize_url(url)
+        if key is None:
+            return
+        with self.lock:
+            if key in self:
+                return
+            self.bloom.add(key)
+            if self.exact is not None:
+                self.exact.add(key)
+            self.count += 1
+
+    def confirm(self, url, zone):
+        """
+        Un pipeline avisa que guardó la url en su zona; entra al índice cuando la
+        guardaron todas las ZONES (un fallo en newspaper no la deja marcada como vista).
+        """
+        key = normalize_url(url)
+        if key is None:
+            return
+        with self.lock:
+            zones = self.partial.setdefault(key, set())
+            zones.add(zone)
+            if zones < ZONES:
+                return
+            del self.partial[key]
+        self.add(key)
+
+    def opened(self):
+        with self.lock:
+            self.spiders += 1
+
+    def closed(self):
+        """
+        Un spider que usa el índice cerró (sus pipelines ya vaciaron los lotes). Al cerrar
+        el último se olvidan las urls que solo confirmó una zona (la otra falló o la
+        descartó), que ya no se van a completar; sin esto, en run_schedule.py --in-process
+        partial crecería sin límite. Devuelve cuántas se olvidaron.
+        """
+        with self.lock:
+            self.spiders = max(0, self.spiders - 1)
+            if self.spiders:
+                return 0
+            discarded = len(self.partial)
+            self.partial = {}
+        return discarded
+
+    def __contains__(self, url):
+        key = normalize_url(url)
+        if key is None or key not in self.bloom:
+            return False
+        return self.exact is None or key in self.exact
+
+    def __len__(self):
+        return self.count
+
+    def load_from_db(self, conn, batch_size=10000):
+        """
+        Carga las urls posteriores al watermark (todas si no hay) que están guardadas en
+        las dos zonas: consumption_analytics y newspaper. RefinedZonePipeline descarta
+        todo lo que está en el índice, así que una url que falte en newspaper no debe
+        entrar; de lo contrario un crawl nunca podría volver a guardarla. El watermark
+        sigue siendo fecha_procesado de consumption_analytics.
+        """
+        # Cursor con nombre: el servidor entrega las filas por bloques, sin materializar la tabla.
+        cur = conn.cursor(name='dedup_warmup')
+        cur.itersize = batch_size
+        if self.watermark:
+            cur.execute(WARMUP_QUERY + " AND c.fecha_procesado > %s", (self.watermark,))
+        else:
+            cur.execute(WARMUP_QUERY)
+        loaded = 0
+        watermark = self.watermark
+        for url, fecha_procesado in cur:
+            self.add(url)
+            loaded += 1
+            if fecha_procesado is not None:
+                # Texto si el driver no convierte timestamps (el sustituto SQLite de los benchmarks).
+                procesado = fecha_procesado if isinstance(fecha_procesado, str) else fecha_procesado.isoformat()
+                if watermark is None or procesado > watermark:
+                    watermark = procesado
+        cur.close()
+        conn.commit()
+        self.watermark = watermark
+        return loaded
+
+    def save(self, path):
+        """Guarda el índice comprimido para cargarlo 'en caliente' en la próxima ejecución."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        header = json.dumps({
+            'capacity': self.bloom.capacity,
+            'error_rate': self.bloom.error_rate,
+            'num_bits': self.bloom.num_bits,
+            'num_hashes': self.bloom.num_hashes,
+            'count': self.count,
+            'exact': self.exact is not None,
+            'watermark': self.watermark,
+        }).encode('utf-8')
+        # Un tmp por proceso: los shards de run_schedule.py guardan el índice a la vez.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self.lock, gzip.open(tmp_path, 'wb', compresslevel=1) as f:
+            f.write(FILE_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            f.write(bytes(self.bloom.bits))
+            if self.exact is not None:
+                f.write('\n'.join(self.exact).encode('utf-8'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rb') as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"{path} no es un índice de deduplicación válido")
+            (header_len,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len))
+            bits = bytearray(f.read((header['num_bits'] + 7) // 8))
+            rest = f.read()
+        index = cls.__new__(cls)
+        index.bloom = BloomFilter(
+            header['capacity'], header['error_rate'],
+            num_bits=header['num_bits'], num_hashes=header['num_hashes'], bits=bits,
+        )
+        index.exact = set(rest.decode('utf-8').split('\n')) if header['exact'] and rest else (set() if header['exact'] else None)
+        index.count = header['count']
+        index.watermark = header['watermark']
+        index.partial = {}
+        index.spiders = 0
+        index.lock = threading.Lock()
+        return index
+
+    def memory_bytes(self):
+        size = self.bloom.size_bytes
+        if self.exact is not None:
+            size += sum(len(key) + 49 for key in self.exact) + self.exact.__sizeof__()
+        return size
+
+
+# Índice compartido por el middleware y los pipelines del proceso (se mantiene entre crawls).
+_index = None
+
+
+def current_index():
+    return _index
+
+
+def get_index(capacity=200000, error_rate=0.001, exact=True, path=None):
+    """
+    Devuelve el índice del proceso. La primera vez lo carga de `path` si existe y es
+    compatible con la configuración; si no, crea uno vacío.
+    """
+    global _index
+    if _index is not None:
+        return _index
+    if path and os.path.exists(path):
+        try:
+            index = UrlDedupIndex.load(path)
+            if (index.exact is not None) == exact and index.bloom.capacity >= capacity and index.count < index.bloom.capacity:
+                _index = index
+                logger.info(f"Índice de deduplicación cargado desde {path}: {len(index)} urls.")
+                return _index
+            logger.info(f"Índice de deduplicación en {path} no coincide con la configuración; se reconstruye.")
+        except (OSError, ValueError, KeyError, EOFError) as e:
+            logger.warning(f"No se pudo cargar el índice de deduplicación {path}: {e}")
+    _index = UrlDedupIndex(capacity=capacity, error_rate=error_rate, exact=exact)
+    return _index
+
+
+def reset_index():
+    global _index
+    _index = None
@@ -0,0 +1,261 @@
+# export_parquet.py
+#
+# Exporta la Landing Zone (JSONL) y la tabla newspaper (Refined Zone) a Parquet,
+# particionado por fuente y fecha de la noticia:
+#   <salida>/landing/source=<fuente>/fecha_noticia=<YYYY-MM-DD>/landing_<ejecución>_<n>.parquet
+#   <salida>/refined/source=<fuente>/fecha_noticia=<YYYY-MM-DD>/refined_<id>_<id>.parquet
+# Es incremental: de cada archivo de la Landing Zone se exportan solo los registros
+# posteriores a los ya exportados (un JSONL al que se le agregaron líneas exporta solo
+# la cola), y las filas de newspaper con id <= al último exportado se saltan (estado en
+# <salida>/_export_state.json). Las filas que `backfill --upsert` reemplaza (o que
+# `backfill --rebuild` recarga) se insertan con id nuevo y se exportan otra vez; la
+# versión anterior queda en su Parquet, así que para una url vale la fila de mayor id.
+#
+# Uso (desde la raíz del repo):
+#   python -m newspaper_collector.export_parquet                 # landing + refined
+#   python -m newspaper_collector.export_parquet --solo landing
+#
+# Lectura: read_dataset('datalake/PARQUET/landing') devuelve un pyarrow.dataset con
+# source y fecha_noticia recuperados de las carpetas (source como columna diccionario).
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from newspaper_collector import db
+from newspaper_collector.items import NewspaperItem, select_data
+from newspaper_collector.landing import iter_landing_records
+from newspaper_collector.manifest import LandingManifest, article_date, record_source
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = '_export_state.json'
+# Valor de partición para noticias sin fecha reconocible (convención de Hive).
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Tipos de los campos de NewspaperItem; los que no figuran son texto.
+FIELD_TYPES = {
+    'seccion': pa.dictionary(pa.int32(), pa.string()),
+    'date_saved': pa.timestamp('us'),
+}
+# source va en la ruta de cada archivo (partición), no dentro del Parquet; fecha_dt es
+# un campo derivado que no está en la Landing Zone.
+EXCLUDED_FIELDS = ('source', 'fecha_dt')
+
+
+def item_schema(extra=()):
+    fields = list(extra)
+    for name in NewspaperItem.fields:
+        if name not in EXCLUDED_FIELDS:
+            fields.append(pa.field(name, FIELD_TYPES.get(name, pa.string())))
+    return pa.schema(fields)
+
+
+LANDING_SCHEMA = item_schema()
+REFINED_SCHEMA = item_schema(extra=[pa.field('id', pa.int64())])
+
+
+def to_text(value):
+    value = select_data(value)
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return ' '.join(str(v) for v in value)
+    return str(value)
+
+
+def to_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def to_columns(records, schema):
+    """Registros (dicts) -> columnas con los tipos de schema."""
+    columns = {name: [] for name in schema.names}
+    for record in records:
+        for name in schema.names:
+            value = record.get(name)
+            if pa.types.is_timestamp(schema.field(name).type):
+                columns[name].append(to_timestamp(value))
+            elif name == 'id':
+                columns[name].append(value)
+            else:
+                columns[name].append(to_text(value))
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def partition_key(record):
+    fecha = article_date(to_text(record.get('fecha')))
+    return record_source(record), fecha or NULL_PARTITION
+
+
+def write_partitions(out_dir, records, schema, filename):
+    """Agrupa por (fuente, fecha) y escribe un Parquet por partición. Devuelve las rutas."""
+    groups = defaultdict(list)
+    for record in records:
+        groups[partition_key(record)].append(record)
+    written = []
+    for (source, fecha), group in sorted(groups.items()):
+        directory = os.path.join(out_dir, f"source={source}", f"fecha_noticia={fecha}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+        tmp_path = path + '.tmp'
+        pq.write_table(to_columns(group, schema), tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def read_dataset(path):
+    return ds.dataset(path, format='parquet', partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+
+
+class ExportState:
+
+    def __init__(self, out_dir):
+        self.path = os.path.join(out_dir, STATE_FILENAME)
+        self.landing = {}
+        self.refined_last_id = 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.landing = data.get('landing', {})
+            self.refined_last_id = data.get('refined_last_id', 0)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'landing': self.landing, 'refined_last_id': self.refined_last_id}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def landing_inputs(landing_dir):
+    """
+    Archivos cerrados de la Landing Zone: los registrados en el manifiesto más los
+    archivos planos anteriores al particionado. Los archivos de particiones que aún no
+    están en el manifiesto se están escribiendo y se dejan para la próxima exportación.
+    """
+    manifest = LandingManifest(landing_dir)
+    paths = set(manifest.files())
+    manifest.close()
+    paths.update(glob.glob(os.path.join(landing_dir, '*.jsonl*')))
+    return sorted(path for path in paths if not path.endswith('.tmp'))
+
+
+def export_landing(landing_dir, out_dir, state, batch_rows=200000):
+    """
+    Exporta los archivos pendientes juntando varios por archivo Parquet (hasta batch_rows
+    filas), para no llenar cada partición de archivos chicos.
+    """
+    # Con microsegundos: dos exportaciones en el mismo segundo no se pisan los archivos.
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    pending = []
+    records = []
+    exported = 0
+    chunk = 0
+
+    def flush():
+        nonlocal chunk, exported
+        chunk += 1
+        outputs = write_partitions(os.path.join(out_dir, 'landing'), records, LANDING_SCHEMA,
+                                   f"landing_{run_id}_{chunk:04d}.parquet")
+        # Los archivos de entrada se marcan recién cuando su Parquet quedó escrito.
+        for relative, size, rows in pending:
+            state.landing[relative] = {'size': size, 'rows': rows}
+        state.save()
+        logger.info(f"Exportados {len(pending)} archivos de la Landing Zone: {len(records)} filas en {len(outputs)} particiones.")
+        exported += len(pending)
+        pending.clear()
+        records.clear()
+
+    for path in landing_inputs(landing_dir):
+        relative = os.path.relpath(path, landing_dir).replace(os.sep, '/')
+        size = os.path.getsize(path)
+        done = state.landing.get(relative)
+        if done and done['size'] == size:
+            continue
+        # Si el archivo creció solo se exportan los registros nuevos: los primeros
+        # done['rows'] ya están en Parquet.
+        skip = done['rows'] if done else 0
+        before = len(records)
+        records.extend(islice(iter_landing_records(path), skip, None))
+        if done and size < done['size']:
+            logger.warning(f"{relative} es más chico que en la exportación anterior; "
+                           f"se exportan solo los registros después del {skip}.")
+        pending.append((relative, size, skip + len(records) - before))
+        if len(records) >= batch_rows:
+            flush()
+    if pending:
+        flush()
+    return exported
+
+
+def export_refined(out_dir, state, batch_size=50000, db_pool=None):
+    """Exporta las filas de newspaper con id mayor al último exportado, por bloques."""
+    exported = 0
+    with db.connection(db_pool) as conn:
+        cur = conn.cursor(name='export_refined')
+        cur.itersize = batch_size
+        cur.execute(
+            "SELECT id, data_id, titulo, descripcion, fecha, seccion, url, date_saved_iso "
+            "FROM newspaper WHERE id > %s ORDER BY id",
+            (state.refined_last_id,),
+        )
+        columns = ('id', 'data_id', 'titulo', 'descripcion', 'fecha', 'seccion', 'url', 'date_saved')
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            records = [dict(zip(columns, row)) for row in rows]
+            first_id, last_id = records[0]['id'], records[-1]['id']
+            write_partitions(os.path.join(out_dir, 'refined'), records, REFINED_SCHEMA,
+                             f"refined_{first_id:010d}_{last_id:010d}.parquet")
+            state.refined_last_id = last_id
+            state.save()
+            exported += len(records)
+        cur.close()
+        conn.commit()
+    if exported:
+        logger.info(f"Exportadas {exported} filas de newspaper (hasta id {state.refined_last_id}).")
+    return exported
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Exporta la Landing y Refined Zone a Parquet.")
+    arg_parser.add_argument('--landing-dir', default='datalake/LANDING_ZONE')
+    arg_parser.add_argument('--out', default='datalake/PARQUET')
+    arg_parser.add_argument('--solo', choices=('landing', 'refined'), help="Exportar solo una zona.")
+    arg_parser.add_argument('--batch-size', type=int, default=50000, help="Filas de newspaper por archivo.")
+    arg_parser.add_argument('--landing-batch-rows', type=int, default=200000, help="Filas de la Landing Zone por archivo.")
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    state = ExportState(args.out)
+    if args.solo != 'refined':
+        print(f"Archivos de la Landing Zone exportados: {export_landing(args.landing_dir, args.out, state, args.landing_batch_rows)}")
+    if args.solo != 'landing':
+        db.acquire_pool(1, 1)
+        try:
+            print(f"Filas de newspaper exportadas: {export_refined(args.out, state, args.batch_size)}")
+        finally:
+            db.release_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
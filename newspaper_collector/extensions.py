@@ -0,0 +1,46 @@
+# extensions.py
+#
+# Extensiones de Scrapy del proyecto.
+
+import json
+import logging
+import os
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class StatsFileExtension:
+    """
+    Al cerrar el spider guarda las stats del crawl (y el motivo de cierre) como JSON en
+    STATS_FILE, para que run_schedule.py junte el resultado de cada shard.
+    """
+
+    def __init__(self, path, stats):
+        self.path = path
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('STATS_FILE')
+        if not path:
+            raise NotConfigured
+        ext = cls(path, crawler.stats)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_closed(self, spider, reason):
+        data = dict(self.stats.get_stats())
+        data['finish_reason'] = reason
+        data['shard'] = getattr(spider, 'shard_name', None)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # default=str: las stats incluyen datetimes (start_time, finish_time).
+                json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"No se pudieron guardar las stats en {self.path}: {e}")
@@ -0,0 +1,178 @@
+# httpcache.py
+#
+# Caché HTTP en disco para los listados de los diarios. Cada ejecución revalida las
+# páginas guardadas con If-None-Match / If-Modified-Since (ETag y Last-Modified de la
+# última respuesta): un 304 devuelve la copia guardada marcada con meta['not_modified']
+# y el spider no la vuelve a parsear en modo incremental. Los cuerpos se guardan con
+# gzip y, pasado HTTPCACHE_MAX_BYTES, se borran las entradas usadas hace más tiempo.
+#
+# Con HTTPCACHE_OFFLINE = True todo se sirve desde la caché sin tocar la red (las
+# páginas que no estén se ignoran), para reproducir un crawl completo:
+#   scrapy crawl newspaper_spider -s HTTPCACHE_OFFLINE=1
+
+import gzip
+import json
+import logging
+import os
+import pickle
+import shutil
+
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.extensions.httpcache import FilesystemCacheStorage, RFC2616Policy
+from scrapy.utils.project import data_path
+
+logger = logging.getLogger(__name__)
+
+# Claves de request.meta que se guardan con cada respuesta para poder volver a
+# parsearla fuera de un crawl (benchmarks/bench_parsers.py --cache).
+REPLAY_META = ('page', 'source', 'section', 'url_pattern', 'start_value')
+
+
+class ListingCachePolicy(RFC2616Policy):
+    """
+    Guarda toda respuesta 200 (los listados rara vez mandan Cache-Control) y revalida
+    siempre contra el servidor: un listado de noticias nunca se da por fresco.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.offline = settings.getbool('HTTPCACHE_OFFLINE')
+
+    def should_cache_request(self, request):
+        return request.method == 'GET' and super().should_cache_request(request)
+
+    def should_cache_response(self, response, request):
+        if response.status != 200:
+            return False
+        return b'no-store' not in self._parse_cachecontrol(response)
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if self.offline:
+            return True
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        if response.status == 304:
+            # request.meta es el meta de la respuesta que recibe el spider.
+            request.meta['not_modified'] = True
+            return True
+        return super().is_cached_response_valid(cachedresponse, response, request)
+
+
+class ListingCacheMiddleware(HttpCacheMiddleware):
+    """HttpCacheMiddleware que en modo offline no deja salir a la red las páginas que falten."""
+
+    def __init__(self, settings, stats):
+        super().__init__(settings, stats)
+        self.ignore_missing = self.ignore_missing or settings.getbool('HTTPCACHE_OFFLINE')
+
+
+class CompressedCacheStorage(FilesystemCacheStorage):
+    """
+    FilesystemCacheStorage con gzip siempre activo y un tope de tamaño en disco: al
+    pasar HTTPCACHE_MAX_BYTES se borran las entradas menos usadas hasta quedar en el
+    90 % del tope. Cada lectura actualiza la fecha de la entrada.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.use_gzip = True
+        self._open = gzip.open
+        self.max_bytes = settings.getint('HTTPCACHE_MAX_BYTES', 0)
+        self.entries = {}
+        self.total_bytes = 0
+        self.stats = None
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.stats = spider.crawler.stats
+        self.entries = {path: entry_size(path) for path in iter_entries(self.cachedir, spider.name)}
+        self.total_bytes = sum(self.entries.values())
+        logger.info(f"Caché HTTP: {len(self.entries)} páginas, {self.total_bytes / 1e6:.1f} MB en {self.cachedir}")
+        self.evict()
+
+    def close_spider(self, spider):
+        if self.stats is None:
+            return
+        self.stats.set_value('httpcache/entries', len(self.entries))
+        self.stats.set_value('httpcache/bytes', self.total_bytes)
+
+    def retrieve_response(self, spider, request):
+        response = super().retrieve_response(spider, request)
+        if response is not None:
+            os.utime(self._get_request_path(spider, request))
+        return response
+
+    def store_response(self, spider, request, response):
+        super().store_response(spider, request, response)
+        path = self._get_request_path(spider, request)
+        meta = {key: request.meta[key] for key in REPLAY_META if key in request.meta}
+        with open(os.path.join(path, 'replay_meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.utime(path)
+        size = entry_size(path)
+        self.total_bytes += size - self.entries.get(path, 0)
+        self.entries[path] = size
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        by_age = sorted(self.entries, key=entry_mtime)
+        evicted = 0
+        for path in by_age:
+            if self.total_bytes <= target:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            self.total_bytes -= self.entries.pop(path)
+            evicted += 1
+        if self.stats is not None:
+            self.stats.inc_value('httpcache/evicted', evicted)
+        logger.info(f"Caché HTTP: {evicted} páginas borradas, quedan {self.total_bytes / 1e6:.1f} MB")
+
+
+def iter_entries(cachedir, spider_name):
+    """Carpetas de las entradas guardadas de un spider (<cachedir>/<spider>/<xx>/<fingerprint>)."""
+    root = os.path.join(cachedir, spider_name)
+    if not os.path.isdir(root):
+        return
+    for prefix in os.scandir(root):
+        if prefix.is_dir():
+            for entry in os.scandir(prefix.path):
+                if entry.is_dir():
+                    yield entry.path
+
+
+def entry_size(path):
+    return sum(f.stat().st_size for f in os.scandir(path) if f.is_file())
+
+
+def entry_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def iter_cached_pages(cachedir, spider_name):
+    """
+    (spec, body) de cada página guardada, con la forma de los fixtures de
+    bench_parsers: spec = {'url': ..., 'meta': {...}}. Las entradas sin
+    replay_meta.json (guardadas por otro storage) se saltan.
+    """
+    cachedir = data_path(cachedir)
+    for path in sorted(iter_entries(cachedir, spider_name)):
+        meta_path = os.path.join(path, 'replay_meta.json')
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        with gzip.open(os.path.join(path, 'pickled_meta'), 'rb') as f:
+            url = pickle.load(f)['response_url']
+        with gzip.open(os.path.join(path, 'response_body'), 'rb') as f:
+            body = f.read()
+        yield {'url': url, 'meta': meta}, body
@@ -3,6 +3,7 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+import attrs
 import scrapy
 
 
@@ -27,6 +28,8 @@ class NewspaperItem(scrapy.Item):
     url = scrapy.Field(serializer=select_data)
     date_saved = scrapy.Field(serializer=select_data)
     source = scrapy.Field()
+    # datetime de 'fecha', lo completa RefinedZonePipeline (no viene del spider)
+    fecha_dt = scrapy.Field()
 
     def __getitem__(self, key):
         value = super(NewspaperItem, self).__getitem__(key)
@@ -34,4 +37,51 @@ class NewspaperItem(scrapy.Item):
         if 'serializer' in field:
             return field['serializer'](value)
         return value 
-    
\ No newline at end of file
+    
+
+@attrs.define
+class NewspaperRecord:
+    """
+    Mismos campos que NewspaperItem en una clase attrs con __slots__ (Scrapy la acepta
+    como item vía itemadapter). select_data se aplica una sola vez, al asignar cada campo,
+    y los pipelines leen atributos sin pasar por __getitem__. get/[] existen para que
+    los pipelines traten igual a los dos tipos de item sin envolverlos en ItemAdapter.
+    """
+
+    data_id = attrs.field(default=None, converter=select_data)
+    titulo = attrs.field(default=None, converter=select_data)
+    descripcion = attrs.field(default=None, converter=select_data)
+    fecha = attrs.field(default=None, converter=select_data)
+    seccion = attrs.field(default=None, converter=select_data)
+    url = attrs.field(default=None, converter=select_data)
+    date_saved = attrs.field(default=None, converter=select_data)
+    source = attrs.field(default=None)
+    # datetime de 'fecha', lo completa RefinedZonePipeline (no viene del spider)
+    fecha_dt = attrs.field(default=None)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in NEWSPAPER_RECORD_FIELDS:
+            raise KeyError(f"NewspaperRecord no tiene el campo {key}")
+        setattr(self, key, value)
+
+
+NEWSPAPER_RECORD_FIELDS = frozenset(field.name for field in attrs.fields(NewspaperRecord))
+
+
+def item_to_dict(item):
+    """
+    Copia plana de un item. Para los dos tipos de item es varias veces más rápida que
+    ItemAdapter(item).asdict().
+    """
+    if isinstance(item, NewspaperRecord):
+        return attrs.asdict(item, recurse=False)
+    return dict(item)
@@ -0,0 +1,251 @@
+# landing.py
+#
+# Escritura y lectura de archivos de la Landing Zone: JSONL opcionalmente comprimido
+# (gzip o zstd), particionado por fuente y día, con rotación por tamaño/cantidad de items
+# y serialización en un hilo aparte para no bloquear el reactor de Twisted.
+
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # dependencia opcional
+    zstandard = None
+
+from newspaper_collector.manifest import UNKNOWN_SOURCE, FileStats, record_source
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def resolve_compression(compression):
+    compression = (compression or 'none').lower()
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Compresión no soportada para la Landing Zone: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        logger.warning("El paquete 'zstandard' no está instalado; la Landing Zone usará gzip.")
+        return 'gzip'
+    return compression
+
+
+def open_landing_file(path):
+    """Abre un archivo de la Landing Zone en modo texto, según su extensión."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Se necesita el paquete 'zstandard' para leer {path}")
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_landing_records(path):
+    """Recorre los registros de un archivo de la Landing Zone sin cargarlo entero en memoria."""
+    with open_landing_file(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RotatingFileSink:
+    """
+    Escribe líneas JSONL en archivos <prefijo>_partNNNNN.jsonl[.gz|.zst], abriendo uno nuevo
+    al superar max_bytes (en disco) o max_items. Solo hace fsync al rotar y al cerrar.
+    on_close(path, stats) se llama con cada archivo cerrado (p. ej. para el manifiesto).
+    """
+
+    def __init__(self, directory, prefix, compression='gzip', max_bytes=64 * 1024 * 1024,
+                 max_items=100000, source=None, partition_date=None, on_close=None):
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = resolve_compression(compression)
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.source = source
+        self.partition_date = partition_date
+        self.on_close = on_close
+        self.part = 0
+        self.raw = None
+        self.stream = None
+        self.path = None
+        self.items = 0
+        self.stats = None
+        self.closed_files = []
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        self.part += 1
+        filename = f"{self.prefix}_part{self.part:05d}.jsonl{COMPRESSION_SUFFIXES[self.compression]}"
+        self.path = os.path.join(self.directory, filename)
+        self.raw = open(self.path, 'wb')
+        if self.compression == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='wb', compresslevel=6)
+        elif self.compression == 'zstd':
+            self.stream = zstandard.ZstdCompressor(level=3).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+        self.items = 0
+        self.stats = FileStats(self.source, self.partition_date)
+        logger.info(f"Abriendo archivo de Landing Zone: {self.path}")
+
+    @property
+    def is_open(self):
+        return self.stream is not None
+
+    def write_records(self, records):
+        while records:
+            if self.stream is None:
+                self._open()
+            # Se corta el lote para que la rotación por cantidad de items sea exacta.
+            room = max(1, self.max_items - self.items)
+            chunk, records = records[:room], records[room:]
+            data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in chunk)
+            self.stream.write(data.encode('utf-8'))
+            self.items += len(chunk)
+            for record in chunk:
+                self.stats.add(record)
+            # raw.tell() es el tamaño comprimido ya escrito (aproximado: el compresor guarda un búfer).
+            if self.items >= self.max_items or self.raw.tell() >= self.max_bytes:
+                self.rotate()
+
+    def rotate(self):
+        if self.stream is None:
+            return
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        self.raw.close()
+        self.closed_files.append((self.path, self.items))
+        self.stream = None
+        self.raw = None
+        if self.on_close:
+            try:
+                self.on_close(self.path, self.stats)
+            except Exception as e:
+                logger.error(f"Error al registrar {self.path} en el manifiesto: {e}")
+
+    def close(self):
+        self.rotate()
+
+
+def partition_path_value(value):
+    return re.sub(r'[^a-z0-9_-]+', '_', str(value).lower()) or UNKNOWN_SOURCE
+
+
+class PartitionedSink:
+    """
+    Reparte los registros en <raíz>/source=<fuente>/date=<YYYY-MM-DD>/, donde la fecha es la
+    del día de date_saved (día de la captura). Cada partición tiene su RotatingFileSink y
+    cada archivo cerrado se registra en el manifiesto. Como mucho max_open archivos
+    quedan abiertos a la vez: el menos usado se cierra y la próxima escritura abre otra parte.
+    """
+
+    def __init__(self, root, prefix, compression='gzip', max_bytes=64 * 1024 * 1024,
+                 max_items=100000, manifest=None, max_open=16):
+        self.root = root
+        self.prefix = prefix
+        self.compression = resolve_compression(compression)
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.manifest = manifest
+        self.max_open = max_open
+        self.sinks = OrderedDict()
+
+    def partition(self, record):
+        saved = record.get('date_saved')
+        day = str(saved)[:10] if saved else datetime.now().date().isoformat()
+        return partition_path_value(record_source(record)), day
+
+    def _sink(self, key):
+        sink = self.sinks.get(key)
+        if sink is None:
+            source, day = key
+            sink = self.sinks[key] = RotatingFileSink(
+                os.path.join(self.root, f"source={source}", f"date={day}"),
+                self.prefix,
+                compression=self.compression,
+                max_bytes=self.max_bytes,
+                max_items=self.max_items,
+                source=source,
+                partition_date=day,
+                on_close=self.manifest.register if self.manifest else None,
+            )
+        self.sinks.move_to_end(key)
+        return sink
+
+    def write_records(self, records):
+        groups = OrderedDict()
+        for record in records:
+            groups.setdefault(self.partition(record), []).append(record)
+        for key, group in groups.items():
+            self._sink(key).write_records(group)
+        open_sinks = [sink for sink in self.sinks.values() if sink.is_open]
+        for sink in open_sinks[:max(0, len(open_sinks) - self.max_open)]:
+            sink.rotate()
+
+    @property
+    def closed_files(self):
+        return [entry for sink in self.sinks.values() for entry in sink.closed_files]
+
+    def close(self):
+        for sink in self.sinks.values():
+            sink.close()
+
+
+_STOP = object()
+
+
+class BackgroundLandingWriter:
+    """
+    Serializa y escribe registros en un hilo propio. La cola es acotada: si el disco no
+    da abasto, write() bloquea y frena al productor en vez de acumular memoria.
+    """
+
+    def __init__(self, sink, queue_size=1000, batch_size=200):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name='landing-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                stop = True
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        try:
+            self.sink.write_records(batch)
+        except Exception as e:
+            self.errors += len(batch)
+            logger.error(f"Error al escribir {len(batch)} registros en Landing Zone: {e}")
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.sink.close()
@@ -0,0 +1,219 @@
+# manifest.py
+#
+# Índice de archivos de la Landing Zone (SQLite): por archivo guarda fuente, partición,
+# cantidad de filas y rangos de date_saved y de fecha de la noticia, para que los
+# lectores (replay, backfill, exportaciones) descarten archivos sin abrirlos.
+#
+# Uso (desde la raíz del repo):
+#   python -m newspaper_collector.manifest index     # indexar archivos que no estén en el manifiesto
+#   python -m newspaper_collector.manifest list --source eldeber --desde 2025-04-09
+
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+from newspaper_collector.dates import parse_fecha
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = '_manifest.sqlite'
+UNKNOWN_SOURCE = 'desconocida'
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS landing_files (
+    path TEXT PRIMARY KEY,
+    source TEXT,
+    partition_date TEXT,
+    rows INTEGER NOT NULL,
+    min_date_saved TEXT,
+    max_date_saved TEXT,
+    min_fecha TEXT,
+    max_fecha TEXT,
+    bytes INTEGER,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_landing_files_source_date ON landing_files (source, partition_date);
+"""
+
+
+def record_source(record):
+    """Fuente del registro; los registros viejos sin 'source' se deducen del dominio de la url."""
+    source = record.get('source')
+    if source:
+        return str(source).strip().lower()
+    host = urlparse(record.get('url') or '').netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host.split('.')[0] if host else UNKNOWN_SOURCE
+
+
+def article_date(value):
+    """Fecha (YYYY-MM-DD) de la noticia a partir del texto crudo del spider, o None."""
+    parsed = parse_fecha(value)
+    return parsed.date().isoformat() if parsed else None
+
+
+class FileStats:
+    """Acumula los datos del manifiesto mientras se escribe (o se lee) un archivo."""
+
+    def __init__(self, source=None, partition_date=None):
+        self.source = source
+        # Los archivos planos anteriores al particionado mezclan fuentes.
+        self.sources = {source} if source else set()
+        self.partition_date = partition_date
+        self.rows = 0
+        self.min_date_saved = self.max_date_saved = None
+        self.min_fecha = self.max_fecha = None
+
+    def add(self, record):
+        self.rows += 1
+        if self.partition_date is None:
+            self.sources.add(record_source(record))
+        saved = record.get('date_saved')
+        if saved:
+            saved = str(saved)
+            self.min_date_saved = min(self.min_date_saved or saved, saved)
+            self.max_date_saved = max(self.max_date_saved or saved, saved)
+        fecha = article_date(record.get('fecha'))
+        if fecha:
+            self.min_fecha = min(self.min_fecha or fecha, fecha)
+            self.max_fecha = max(self.max_fecha or fecha, fecha)
+
+    def as_row(self, path, size):
+        # source NULL = el archivo tiene varias fuentes (o ninguna fila).
+        source = self.source or (next(iter(self.sources)) if len(self.sources) == 1 else None)
+        return (path, source, self.partition_date, self.rows, self.min_date_saved,
+                self.max_date_saved, self.min_fecha, self.max_fecha, size,
+                datetime.now().isoformat())
+
+
+class LandingManifest:
+    """
+    Manifiesto en <landing_zone>/_manifest.sqlite. Las rutas se guardan relativas a la
+    Landing Zone. Puede usarse desde el hilo que escribe la Landing Zone.
+    """
+
+    def __init__(self, root, filename=MANIFEST_FILENAME):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, filename)
+        self._lock = threading.Lock()
+        # timeout: varios crawls (shards) pueden registrar archivos a la vez.
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.executescript(MANIFEST_SCHEMA)
+
+    def relative(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def register(self, path, stats):
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO landing_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                stats.as_row(self.relative(path), size),
+            )
+
+    def is_indexed(self, path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM landing_files WHERE path = ?", (self.relative(path),)
+            ).fetchone()
+        return row is not None
+
+    def index_file(self, path):
+        """Lee un archivo entero y lo registra (archivos planos anteriores al particionado)."""
+        from newspaper_collector.landing import iter_landing_records
+
+        stats = FileStats()
+        for record in iter_landing_records(path):
+            stats.add(record)
+        self.register(path, stats)
+        return stats
+
+    def index_missing(self, pattern='**/*.jsonl*'):
+        indexed = 0
+        for path in sorted(glob.glob(os.path.join(self.root, pattern), recursive=True)):
+            if os.path.basename(path).startswith('_') or path.endswith('.tmp') or self.is_indexed(path):
+                continue
+            try:
+                self.index_file(path)
+                indexed += 1
+            except (OSError, ValueError) as e:
+                logger.error(f"No se pudo indexar {path}: {e}")
+        return indexed
+
+    def files(self, source=None, saved_from=None, saved_to=None, fecha_from=None, fecha_to=None):
+        """
+        Rutas (absolutas) de los archivos que pueden tener registros en los rangos pedidos.
+        Las fechas son 'YYYY-MM-DD' y los rangos son inclusivos.
+        """
+        clauses, params = [], []
+        if source:
+            clauses.append("(source = ? OR source IS NULL)")
+            params.append(source.lower())
+        if saved_from:
+            clauses.append("max_date_saved >= ?")
+            params.append(saved_from)
+        if saved_to:
+            # date_saved es un timestamp ISO: todo el día 'saved_to' queda incluido.
+            clauses.append("min_date_saved < ?")
+            params.append(saved_to + 'T99')
+        if fecha_from:
+            clauses.append("(max_fecha IS NULL OR max_fecha >= ?)")
+            params.append(fecha_from)
+        if fecha_to:
+            clauses.append("(min_fecha IS NULL OR min_fecha <= ?)")
+            params.append(fecha_to)
+        sql = "SELECT path FROM landing_files"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY min_date_saved, path"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [os.path.join(self.root, path) for (path,) in rows]
+
+    def summary(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT source, COUNT(*), SUM(rows), MIN(min_date_saved), MAX(max_date_saved) "
+                "FROM landing_files GROUP BY source ORDER BY source"
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Manifiesto de archivos de la Landing Zone.")
+    arg_parser.add_argument('command', choices=('index', 'list', 'summary'))
+    arg_parser.add_argument('--root', default='datalake/LANDING_ZONE')
+    arg_parser.add_argument('--source')
+    arg_parser.add_argument('--desde', help="date_saved desde (YYYY-MM-DD)")
+    arg_parser.add_argument('--hasta', help="date_saved hasta (YYYY-MM-DD)")
+    arg_parser.add_argument('--fecha-desde', help="fecha de la noticia desde (YYYY-MM-DD)")
+    arg_parser.add_argument('--fecha-hasta', help="fecha de la noticia hasta (YYYY-MM-DD)")
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    manifest = LandingManifest(args.root)
+    if args.command == 'index':
+        print(f"Archivos indexados: {manifest.index_missing()}")
+    elif args.command == 'list':
+        for path in manifest.files(args.source, args.desde, args.hasta, args.fecha_desde, args.fecha_hasta):
+            print(path)
+    else:
+        for source, n_files, n_rows, first, last in manifest.summary():
+            print(f"{source or '(varias)':16} {n_files:6} archivos {n_rows or 0:9} filas  {first} .. {last}")
+    manifest.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,16 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
+from email.utils import parsedate_to_datetime
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+import psycopg2
+
+from newspaper_collector import db, dedup
+from newspaper_collector.items import NewspaperRecord
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -101,3 +110,255 @@ class NewspaperCollectorDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class DomainThrottle:
+    """Estado de un dominio: concurrencia y delay actuales, latencia y tasa de errores (EWMA)."""
+
+    def __init__(self, concurrency, delay):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.latency = None
+        self.error_rate = 0.0
+        # Respuestas buenas desde el último cambio de concurrencia.
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.throttled = 0
+
+    def observe(self, alpha, latency, error):
+        if latency is not None:
+            self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+        self.error_rate = alpha * (1.0 if error else 0.0) + (1 - alpha) * self.error_rate
+
+
+class AdaptiveThrottleMiddleware:
+    """
+    Ajusta la concurrencia y el delay de cada slot del downloader (uno por dominio) según
+    la latencia y la tasa de errores observadas, al estilo AIMD: cada vez que un dominio
+    responde bien `concurrency` veces seguidas por debajo de la latencia objetivo se suma
+    una petición en paralelo y se acorta el delay; ante un 429/503 (o una racha de errores)
+    la concurrencia se divide a la mitad y el delay se duplica, respetando Retry-After.
+    El estado de cada dominio queda en las stats como throttle/<dominio>/*.
+    """
+
+    # Respuestas que indican que el servidor pide bajar el ritmo.
+    THROTTLE_CODES = (429, 503)
+    # Delay mínimo tras un 429/503 cuando el delay actual es 0.
+    BACKOFF_DELAY = 1.0
+
+    def __init__(self, settings, stats, crawler=None):
+        self.crawler = crawler
+        self.stats = stats
+        self.start_concurrency = settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 8)
+        self.min_concurrency = max(1, settings.getint('ADAPTIVE_THROTTLE_MIN_CONCURRENCY', 1))
+        self.max_concurrency = max(self.min_concurrency, settings.getint('ADAPTIVE_THROTTLE_MAX_CONCURRENCY', 8))
+        self.min_delay = settings.getfloat('DOWNLOAD_DELAY', 0.0)
+        self.max_delay = settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 30.0)
+        self.target_latency = settings.getfloat('ADAPTIVE_THROTTLE_TARGET_LATENCY', 2.0)
+        self.max_error_rate = settings.getfloat('ADAPTIVE_THROTTLE_MAX_ERROR_RATE', 0.05)
+        self.alpha = settings.getfloat('ADAPTIVE_THROTTLE_EWMA_ALPHA', 0.2)
+        self.domains = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('ADAPTIVE_THROTTLE_ENABLED', False):
+            raise NotConfigured
+        if crawler.settings.getbool('AUTOTHROTTLE_ENABLED'):
+            # Los dos ajustarían el delay de los mismos slots.
+            raise NotConfigured("ADAPTIVE_THROTTLE_ENABLED no se puede usar junto con AUTOTHROTTLE_ENABLED.")
+        return cls(crawler.settings, crawler.stats, crawler)
+
+    def slot_key(self, request):
+        return request.meta.get('download_slot') or urlparse_cached(request).hostname or ''
+
+    def domain(self, key):
+        state = self.domains.get(key)
+        if state is None:
+            concurrency = min(max(self.start_concurrency, self.min_concurrency), self.max_concurrency)
+            state = self.domains[key] = DomainThrottle(concurrency, self.min_delay)
+        return state
+
+    def process_request(self, request, spider):
+        # Los slots se crean después de este middleware y Scrapy borra los inactivos:
+        # si el slot ya existe se le aplica el estado conocido del dominio.
+        key = self.slot_key(request)
+        if key in self.domains:
+            self.apply(key, self.domains[key])
+        return None
+
+    def process_response(self, request, response, spider):
+        key = self.slot_key(request)
+        state = self.domain(key)
+        throttled = response.status in self.THROTTLE_CODES
+        error = throttled or response.status >= 500
+        state.observe(self.alpha, request.meta.get('download_latency'), error)
+        if throttled:
+            state.throttled += 1
+            self.decrease(key, state, self.retry_after(response), spider)
+        elif error:
+            if state.error_rate > self.max_error_rate:
+                self.decrease(key, state, None, spider)
+        elif state.latency is not None and state.latency > self.target_latency:
+            # El servidor se está poniendo lento: una petición en paralelo menos.
+            if state.concurrency > self.min_concurrency:
+                state.concurrency -= 1
+            state.successes = 0
+        else:
+            state.successes += 1
+            if state.successes >= state.concurrency and state.error_rate <= self.max_error_rate:
+                state.successes = 0
+                state.concurrency = min(self.max_concurrency, state.concurrency + 1)
+                state.delay = max(self.min_delay, state.delay * 0.75)
+        self.apply(key, state)
+        self.publish(key, state)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        # Timeouts, conexiones rechazadas, etc.: cuentan como error del dominio. Las
+        # requests descartadas por otro middleware (p. ej. la caché offline) no.
+        if isinstance(exception, IgnoreRequest):
+            return None
+        key = self.slot_key(request)
+        state = self.domain(key)
+        state.observe(self.alpha, None, True)
+        if state.error_rate > self.max_error_rate:
+            self.decrease(key, state, None, spider)
+        self.apply(key, state)
+        self.publish(key, state)
+        return None
+
+    def decrease(self, key, state, retry_after, spider):
+        now = time.monotonic()
+        # Las respuestas de una misma ráfaga llegan juntas: se baja una vez por "ronda".
+        window = max(state.latency or 0.0, state.delay)
+        if now - state.last_decrease < window:
+            return
+        state.last_decrease = now
+        state.successes = 0
+        state.concurrency = max(self.min_concurrency, state.concurrency // 2)
+        delay = max(state.delay * 2, self.BACKOFF_DELAY, retry_after or 0.0)
+        state.delay = min(self.max_delay, max(self.min_delay, delay))
+        spider.logger.info(
+            f"Throttle {key}: concurrencia {state.concurrency}, delay {state.delay:.2f}s "
+            f"(error_rate {state.error_rate:.2f})"
+        )
+
+    @staticmethod
+    def retry_after(response):
+        """Segundos de Retry-After (número o fecha HTTP), o None."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.decode('latin-1').strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def apply(self, key, state):
+        if self.crawler is None:
+            return
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = state.concurrency
+            slot.delay = state.delay
+
+    def publish(self, key, state):
+        prefix = f'throttle/{key}'
+        self.stats.set_value(f'{prefix}/concurrency', state.concurrency)
+        self.stats.set_value(f'{prefix}/delay_ms', round(state.delay * 1000))
+        if state.latency is not None:
+            self.stats.set_value(f'{prefix}/latency_ms', round(state.latency * 1000))
+        self.stats.set_value(f'{prefix}/error_rate', round(state.error_rate, 4))
+        self.stats.set_value(f'{prefix}/throttled', state.throttled)
+
+
+class UrlDedupMiddleware:
+    """
+    Descarta items cuya url ya está guardada en la Refined y en la Consumption Zone (o
+    que ya salieron en este mismo crawl) antes de que lleguen a los pipelines. El índice se calienta al abrir
+    el spider desde DEDUP_PERSIST_PATH y/o la BD, y se guarda al cerrarlo.
+    """
+
+    def __init__(self, settings, stats):
+        self.capacity = settings.getint('DEDUP_CAPACITY', 200000)
+        self.error_rate = settings.getfloat('DEDUP_ERROR_RATE', 0.001)
+        self.exact = settings.getbool('DEDUP_EXACT_SET', True)
+        self.path = settings.get('DEDUP_PERSIST_PATH')
+        self.warm_from_db = settings.getbool('DEDUP_WARM_FROM_DB', True)
+        self.pool_size = (settings.getint('DB_POOL_MINCONN', 1), settings.getint('DB_POOL_MAXCONN', 10))
+        self.stats = stats
+        self.index = None
+        self.seen_this_run = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('DEDUP_ENABLED', True):
+            raise NotConfigured
+        s = cls(crawler.settings, crawler.stats)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_spider_output(self, response, result, spider):
+        for i in result:
+            if self.keep(i):
+                yield i
+
+    async def process_spider_output_async(self, response, result, spider):
+        # Versión para la salida asíncrona de los spiders (Scrapy >= 2.7).
+        async for i in result:
+            if self.keep(i):
+                yield i
+
+    def keep(self, i):
+        if isinstance(i, NewspaperRecord) or is_item(i):
+            # NewspaperRecord se lee directo; ItemAdapter cuesta varios µs por item.
+            url = dedup.normalize_url(i.url if isinstance(i, NewspaperRecord) else ItemAdapter(i).get('url'))
+            if url and (url in self.seen_this_run or (self.index is not None and url in self.index)):
+                self.stats.inc_value('dedup/dropped')
+                return False
+            if url:
+                self.seen_this_run.add(url)
+        return True
+
+    def spider_opened(self, spider):
+        self.seen_this_run = set()
+        self.index = dedup.get_index(self.capacity, self.error_rate, self.exact, self.path)
+        if self.warm_from_db:
+            try:
+                self.warm(spider)
+            except psycopg2.Error as e:
+                spider.logger.error(f"Deduplicación: no se pudo cargar urls desde la BD: {e}")
+        self.index.opened()
+        self.stats.set_value('dedup/known_urls', len(self.index))
+        self.stats.set_value('dedup/memory_bytes', self.index.memory_bytes())
+
+    def warm(self, spider):
+        db.acquire_pool(*self.pool_size)
+        try:
+            with db.connection() as conn:
+                if self.index.watermark is None and not len(self.index):
+                    # Primera carga: dimensionar el filtro según el tamaño real de la tabla.
+                    cur = conn.cursor()
+                    cur.execute("SELECT COUNT(*) FROM consumption_analytics")
+                    total = cur.fetchone()[0]
+                    cur.close()
+                    if total * 2 > self.capacity:
+                        dedup.reset_index()
+                        self.index = dedup.get_index(total * 2, self.error_rate, self.exact)
+                loaded = self.index.load_from_db(conn)
+        finally:
+            db.release_pool()
+        spider.logger.info(f"Deduplicación: {loaded} urls nuevas cargadas desde la BD ({len(self.index)} en total).")
+
+    def spider_closed(self, spider):
+        if self.index is not None:
+            self.stats.set_value('dedup/unconfirmed', self.index.closed())
+        if self.index is not None and self.path:
+            try:
+                self.index.save(self.path)
+            except OSError as e:
+                spider.logger.error(f"Deduplicación: no se pudo guardar el índice en {self.path}: {e}")
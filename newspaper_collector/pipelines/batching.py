@@ -0,0 +1,148 @@
+# batching.py
+
+import time
+import psycopg2
+from twisted.internet import defer, task, threads
+
+from newspaper_collector import db
+
+class BufferedDbPipeline:
+    """
+    Base de los pipelines que escriben en PostgreSQL: acumula filas y las escribe
+    por lotes (por tamaño, por tiempo y al cerrar el spider) usando el pool compartido.
+    Con DB_WRITES_IN_THREAD las escrituras salen del hilo del reactor vía deferToThread.
+    """
+
+    # Prefijo de los settings (<prefijo>_BATCH_SIZE, <prefijo>_FLUSH_INTERVAL)
+    settings_prefix = None
+    # Prefijo de las estadísticas (<prefijo>/inserted, /skipped, /failed)
+    stats_prefix = None
+    log_name = None
+    # Si es False, un fallo al conectar solo se registra y los items se dejan pasar sin guardar.
+    require_db = True
+
+    def __init__(self, batch_size=200, flush_interval=5.0, in_thread=False, pool_size=(1, 10), stats=None):
+        # batch_size = 1 equivale a escribir item por item.
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.in_thread = in_thread
+        self.pool_size = pool_size
+        self.stats = stats
+        self.pool = None
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.flush_task = None
+        self.pending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            batch_size=settings.getint(f'{cls.settings_prefix}_BATCH_SIZE', 200),
+            flush_interval=settings.getfloat(f'{cls.settings_prefix}_FLUSH_INTERVAL', 5.0),
+            in_thread=settings.getbool('DB_WRITES_IN_THREAD', False),
+            pool_size=(settings.getint('DB_POOL_MINCONN', 1), settings.getint('DB_POOL_MAXCONN', 10)),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        try:
+            self.pool = db.acquire_pool(*self.pool_size)
+        except psycopg2.Error as e:
+            if self.require_db:
+                raise
+            spider.logger.error(f"{self.log_name}: Error al conectar o crear tablas: {e}")
+            return
+        # Flush por tiempo aunque no lleguen items nuevos (p. ej. al final de una sección lenta).
+        if self.batch_size > 1 and self.flush_interval and self.flush_interval > 0:
+            self.flush_task = task.LoopingCall(self.flush_if_due, spider)
+            self.flush_task.start(self.flush_interval, now=False)
+
+    def close_spider(self, spider):
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        if self.pool is None:
+            return None
+        self.flush(spider)
+        if self.pending:
+            d = defer.DeferredList(list(self.pending))
+            d.addBoth(lambda _: self.release(spider))
+            return d
+        self.release(spider)
+        return None
+
+    def release(self, spider):
+        self.pool = None
+        db.release_pool()
+        spider.logger.info(f"{self.log_name}: Conexión a BD liberada.")
+
+    def enqueue(self, item, row, spider):
+        """Añade la fila al buffer; devuelve un Deferred con el item si el flush corre en un hilo."""
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            d = self.flush(spider)
+        else:
+            d = self.flush_if_due(spider)
+        if d is not None:
+            # Contrapresión: el item que dispara el flush espera a que termine el lote.
+            return d.addCallback(lambda _: item)
+        return item
+
+    def flush_if_due(self, spider):
+        if self.buffer and self.flush_interval and time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush(spider)
+        return None
+
+    def flush(self, spider):
+        self.last_flush = time.monotonic()
+        if not self.buffer or self.pool is None:
+            return None
+        batch, self.buffer = self.buffer, []
+
+        if not self.in_thread:
+            self.record(self.write(batch, spider), batch, spider)
+            return None
+
+        d = threads.deferToThread(self.write, batch, spider)
+        self.pending.add(d)
+        d.addCallback(self.record, batch, spider)
+        d.addErrback(self.write_failed, batch, spider)
+        d.addBoth(self.forget, d)
+        return d
+
+    def write(self, batch, spider):
+        def on_row_error(row, error):
+            spider.logger.error(f"{self.log_name}: Error al insertar {self.row_url(row)}: {error}")
+        return db.write_batch(self.write_rows, batch, on_row_error=on_row_error)
+
+    def write_failed(self, failure, batch, spider):
+        spider.logger.error(f"{self.log_name}: Error inesperado escribiendo un lote de {len(batch)} items: {failure.value}")
+        self.inc_stat('failed', len(batch))
+
+    def forget(self, result, d):
+        self.pending.discard(d)
+        return result
+
+    def record(self, counts, batch, spider):
+        inserted, failed = counts
+        skipped = len(batch) - inserted - failed
+        self.inc_stat('inserted', inserted)
+        self.inc_stat('skipped', skipped)
+        self.inc_stat('failed', failed)
+        if not failed:
+            self.written(batch)
+        spider.logger.debug(f"{self.log_name}: Lote de {len(batch)} items: {inserted} insertados, {skipped} ya existían.")
+
+    def inc_stat(self, key, count):
+        if self.stats is not None and count:
+            self.stats.inc_value(f'{self.stats_prefix}/{key}', count)
+
+    def written(self, batch):
+        """Se llama (en el hilo del reactor) cuando todo el lote quedó guardado."""
+
+    def write_rows(self, conn, rows):
+        """Escribe el lote con la conexión dada y devuelve cuántas filas se insertaron."""
+        raise NotImplementedError
+
+    def row_url(self, row):
+        raise NotImplementedError
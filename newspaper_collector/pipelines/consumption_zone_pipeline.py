@@ -1,149 +1,87 @@
 # consumption_zone_pipeline.py
 
-from itemadapter import ItemAdapter
 from urllib.parse import urlparse
-import os
-import psycopg2
-from dotenv import load_dotenv
-import logging
-from dateutil import parser 
-from datetime import date, time
-
-class ConsumptionZonePipeline:
-
-    def __init__(self):
-        load_dotenv()
-        hostname = os.getenv('DB_HOST')
-        username = os.getenv('DB_USER')
-        password = os.getenv('DB_PASSWORD')
-        database = os.getenv('DB_DATABASE')
-        port = os.getenv('DB_PORT')
-
-        self.connection = None
-        self.cur = None
-        try:
-            self.connection = psycopg2.connect(
-                host=hostname,
-                port=port,
-                user=username,
-                password=password,
-                dbname=database
-            )
-            self.cur = self.connection.cursor()
-
-            # ----- MODIFICACIÓN 1: Estructura de la tabla -----
-            # Cambiamos 'fecha_noticia DATE' por 'fecha_noticia DATE' y 'hora_noticia TIME'
-            self.cur.execute("""
-                CREATE TABLE IF NOT EXISTS consumption_analytics (
-                    id SERIAL PRIMARY KEY,
-                    titulo TEXT,
-                    fecha_noticia DATE,       -- Columna para la fecha
-                    hora_noticia TIME,        -- Columna para la hora
-                    seccion TEXT,
-                    fuente TEXT,
-                    url TEXT UNIQUE,
-                    fecha_procesado TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            # Asegurar índices (el de fecha ya existe, podríamos añadir hora)
-            self.cur.execute("CREATE INDEX IF NOT EXISTS idx_consumption_url ON consumption_analytics(url);")
-            self.cur.execute("CREATE INDEX IF NOT EXISTS idx_consumption_fecha ON consumption_analytics(fecha_noticia);")
-            # self.cur.execute("CREATE INDEX IF NOT EXISTS idx_consumption_hora ON consumption_analytics(hora_noticia);") # Opcional
-            self.cur.execute("CREATE INDEX IF NOT EXISTS idx_consumption_fuente ON consumption_analytics(fuente);")
-            self.connection.commit()
-            logging.info("Pipeline de Consumo: Conexión a BD establecida y tabla asegurada (con fecha/hora).")
-            # ----- FIN MODIFICACIÓN 1 -----
-
-        except psycopg2.Error as e:
-            logging.error(f"Pipeline de Consumo: Error al conectar o crear tabla: {e}")
-            self.connection = None
-            self.cur = None
-
-    def open_spider(self, spider):
-        if not self.connection:
-             spider.logger.error("Pipeline de Consumo: No se pudo establecer conexión con la BD en __init__.")
-
-    def close_spider(self, spider):
-        if self.cur:
-            self.cur.close()
-        if self.connection:
-            self.connection.close()
-            logging.info("Pipeline de Consumo: Conexión a BD cerrada.")
+
+from newspaper_collector import dates, db, dedup
+from newspaper_collector.pipelines.batching import BufferedDbPipeline
+
+def extract_fuente(url):
+    if not url: return None
+    try:
+        domain = urlparse(url).netloc
+        if 'eldeber.com.bo' in domain: return 'eldeber'
+        elif 'lostiempos.com' in domain: return 'lostiempos'
+        elif 'ahoraelpueblo.bo' in domain: return 'ahoraelpueblo'
+        else:
+            parts = domain.split('.')
+            if len(parts) >= 2: return parts[-2] if parts[-2] != 'com' else parts[0]
+            return domain
+    except Exception: return None
+
+
+def consumption_row(item, parsed_datetime):
+    """Fila de consumption_analytics (CONSUMPTION_COLUMNS) para un item ya transformado."""
+    url_item = item.get('url')
+    fecha_noticia_obj = None
+    hora_noticia_obj = None
+    if parsed_datetime is not None:
+        fecha_noticia_obj = parsed_datetime.date()
+        hora_noticia_obj = parsed_datetime.time()
+
+    return (
+        item.get('titulo'),
+        fecha_noticia_obj,
+        hora_noticia_obj,
+        item.get('seccion'),
+        extract_fuente(url_item),
+        url_item
+    )
+
+
+class ConsumptionZonePipeline(BufferedDbPipeline):
+
+    settings_prefix = 'CONSUMPTION_ZONE'
+    stats_prefix = 'consumption_zone'
+    log_name = 'Pipeline de Consumo'
+    require_db = False
 
     def process_item(self, item, spider):
-        if not self.cur or not self.connection:
+        if self.pool is None:
             spider.logger.error(f"Pipeline de Consumo: Omitiendo item por falta de conexión a BD: {item.get('url')}")
             return item
 
-        adapter = ItemAdapter(item)
-        url_item = adapter.get('url')
-
-        try:
-            self.cur.execute("SELECT id FROM consumption_analytics WHERE url = %s", (url_item,))
-            result = self.cur.fetchone()
-            if result:
-                spider.logger.debug(f"Pipeline de Consumo: Item ya existe en Consumption Zone: {url_item}")
-                return item
-        except psycopg2.Error as e:
-            spider.logger.error(f"Pipeline de Consumo: Error al verificar duplicado para {url_item}: {e}")
-            return item
+        url_item = item.get('url')
 
         try:
-            fuente = self.extract_fuente(url_item)
-
-            fecha_str = adapter.get('fecha') 
-            fecha_noticia_obj = None
-            hora_noticia_obj = None
-
-            if fecha_str:
-                try:
-                    parsed_datetime = parser.parse(fecha_str)
-                    fecha_noticia_obj = parsed_datetime.date() 
-                    hora_noticia_obj = parsed_datetime.time()  
-                except (ValueError, TypeError, OverflowError, parser.ParserError) as e:
-                    spider.logger.warning(f"Pipeline de Consumo: No se pudo parsear fecha/hora desde '{fecha_str}' para {url_item}: {e}. Se guardará como NULL.")
-                    fecha_noticia_obj = None
-                    hora_noticia_obj = None
-
-            self.cur.execute("""
-                INSERT INTO consumption_analytics
-                (titulo, fecha_noticia, hora_noticia, seccion, fuente, url)
-                VALUES (%s, %s, %s, %s, %s, %s) -- refined_id puesto a NULL
-                ON CONFLICT (url) DO NOTHING;
-            """, (
-                adapter.get('titulo'),
-                fecha_noticia_obj, 
-                hora_noticia_obj, 
-                adapter.get('seccion'),
-                fuente,
-                url_item
-            ))
-            self.connection.commit()
-            if self.cur.rowcount > 0:
-                 spider.logger.info(f"Pipeline de Consumo: Item insertado en Consumption Zone: {url_item}")
-
-        except psycopg2.Error as e:
-            spider.logger.error(f"Pipeline de Consumo: Error al insertar item {url_item}: {e}")
-            self.connection.rollback()
+            row = self.build_row(item, spider)
         except Exception as e:
             spider.logger.error(f"Pipeline de Consumo: Error inesperado procesando {url_item}: {e}", exc_info=True)
-            try:
-                self.connection.rollback()
-            except psycopg2.Error as rb_err:
-                 spider.logger.error(f"Pipeline de Consumo: Error durante rollback: {rb_err}")
+            return item
 
-        return item
+        return self.enqueue(item, row, spider)
 
-    # --- Funciones auxiliares ---
-    def extract_fuente(self, url):
-        if not url: return None
-        try:
-            domain = urlparse(url).netloc
-            if 'eldeber.com.bo' in domain: return 'eldeber'
-            elif 'lostiempos.com' in domain: return 'lostiempos'
-            elif 'ahoraelpueblo.bo' in domain: return 'ahoraelpueblo'
-            else:
-                parts = domain.split('.')
-                if len(parts) >= 2: return parts[-2] if parts[-2] != 'com' else parts[0]
-                return domain
-        except Exception: return None
+    def build_row(self, item, spider):
+        url_item = item.get('url')
+        fecha_str = item.get('fecha')
+
+        # RefinedZonePipeline ya deja la fecha parseada en el item.
+        parsed_datetime = item.get('fecha_dt')
+        if parsed_datetime is None and fecha_str:
+            parsed_datetime = dates.parse_fecha(fecha_str, item.get('source'), self.stats)
+            if parsed_datetime is None:
+                spider.logger.warning(f"Pipeline de Consumo: No se pudo parsear fecha/hora desde '{fecha_str}' para {url_item}. Se guardará como NULL.")
+
+        return consumption_row(item, parsed_datetime)
+
+    def write_rows(self, conn, rows):
+        return db.upsert_consumption_rows(conn, rows)
+
+    def row_url(self, row):
+        return row[-1]
+
+    def written(self, batch):
+        # Insertadas o ya existentes: en ambos casos la url está guardada en esta zona.
+        index = dedup.current_index()
+        if index is not None:
+            for row in batch:
+                index.confirm(row[-1], 'consumption')
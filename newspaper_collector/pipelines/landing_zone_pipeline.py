@@ -1,36 +1,72 @@
 # pipelines.py
 
-from itemadapter import ItemAdapter
 from datetime import datetime
-import os
-import json
+
+from newspaper_collector.items import item_to_dict
+from newspaper_collector.landing import BackgroundLandingWriter, PartitionedSink
+from newspaper_collector.manifest import LandingManifest
 
 class LandingZonePipeline:
-    def __init__(self):
-        self.landing_zone_dir = 'datalake/LANDING_ZONE'
-        os.makedirs(self.landing_zone_dir, exist_ok=True)
-        self.file = None
+    def __init__(self, landing_zone_dir='datalake/LANDING_ZONE', compression='gzip',
+                 max_file_bytes=64 * 1024 * 1024, max_file_items=100000, queue_size=1000, manifest=True):
+        self.landing_zone_dir = landing_zone_dir
+        self.compression = compression
+        self.max_file_bytes = max_file_bytes
+        self.max_file_items = max_file_items
+        self.queue_size = queue_size
+        self.use_manifest = manifest
+        self.manifest = None
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            landing_zone_dir=settings.get('LANDING_ZONE_DIR', 'datalake/LANDING_ZONE'),
+            compression=settings.get('LANDING_ZONE_COMPRESSION', 'gzip'),
+            max_file_bytes=settings.getint('LANDING_ZONE_MAX_FILE_BYTES', 64 * 1024 * 1024),
+            max_file_items=settings.getint('LANDING_ZONE_MAX_FILE_ITEMS', 100000),
+            queue_size=settings.getint('LANDING_ZONE_QUEUE_SIZE', 1000),
+            manifest=settings.getbool('LANDING_ZONE_MANIFEST', True),
+        )
 
     def open_spider(self, spider):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"landing_data_{spider.name}_{timestamp}.jsonl" 
-        filepath = os.path.join(self.landing_zone_dir, filename)
-        self.file = open(filepath, 'a', encoding='utf-8')
-        spider.logger.info(f"Abriendo archivo de Landing Zone: {filepath}")
+        # Los shards de run_schedule.py corren a la vez: cada uno con sus propios archivos.
+        shard = getattr(spider, 'shard_name', None)
+        name = f"{spider.name}_{shard}" if shard else spider.name
+        if self.use_manifest:
+            self.manifest = LandingManifest(self.landing_zone_dir)
+        sink = PartitionedSink(
+            self.landing_zone_dir,
+            f"landing_data_{name}_{timestamp}",
+            compression=self.compression,
+            max_bytes=self.max_file_bytes,
+            max_items=self.max_file_items,
+            manifest=self.manifest,
+        )
+        # La serialización y la escritura a disco corren en un hilo aparte.
+        self.writer = BackgroundLandingWriter(sink, queue_size=self.queue_size)
+        spider.logger.info(f"Landing Zone en {self.landing_zone_dir} (compresión: {sink.compression}).")
 
     def close_spider(self, spider):
-        if self.file:
-            self.file.close()
-            spider.logger.info("Archivo de Landing Zone cerrado.")
+        if self.writer:
+            self.writer.close()
+            files = self.writer.sink.closed_files
+            spider.logger.info(f"Archivos de Landing Zone cerrados: {len(files)} ({sum(n for _, n in files)} registros).")
+            if self.writer.errors:
+                spider.logger.error(f"Landing Zone: {self.writer.errors} registros no se pudieron escribir.")
+        if self.manifest:
+            self.manifest.close()
 
     def process_item(self, item, spider):
      
         try:
-            adapter = ItemAdapter(item)
-            line = json.dumps(adapter.asdict(), ensure_ascii=False) + "\n"
-            self.file.write(line)
+            # Copia del item: los pipelines siguientes lo modifican en el lugar.
+            record = item_to_dict(item)
+            # fecha_dt es derivado (lo completa RefinedZonePipeline), no es dato crudo.
+            record.pop('fecha_dt', None)
+            self.writer.write(record)
         except Exception as e:
             spider.logger.error(f"Error al escribir en Landing Zone: {e}")
         return item
-    
-
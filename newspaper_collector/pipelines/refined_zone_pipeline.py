@@ -1,48 +1,36 @@
 # pipelines.py
 
-from itemadapter import ItemAdapter
-from datetime import datetime
-from dateutil import parser
-import emoji
-import re
 from urllib.parse import urlparse
-import os
-import psycopg2
-from dotenv import load_dotenv
-
-class RefinedZonePipeline:
-
-    def __init__(self):
-        load_dotenv()  
-        hostname = os.getenv('DB_HOST')
-        username = os.getenv('DB_USER')
-        password = os.getenv('DB_PASSWORD')
-        database = os.getenv('DB_DATABASE')
-        port = os.getenv('DB_PORT')
-        
-
-        self.connection = psycopg2.connect(
-            host=hostname,
-            port=port,
-            user=username,
-            password=password,
-            dbname=database
-        )
-        self.cur = self.connection.cursor()
-
-        self.cur.execute("""
-            CREATE TABLE IF NOT EXISTS newspaper (
-                id SERIAL PRIMARY KEY,
-                data_id TEXT,
-                titulo TEXT,
-                descripcion TEXT,
-                fecha TEXT,
-                seccion TEXT,
-                url TEXT,
-                date_saved_iso TEXT
-            );
-        """)
-        self.connection.commit()
+
+from scrapy.exceptions import DropItem
+
+from newspaper_collector import db, dedup
+from newspaper_collector.items import item_to_dict
+from newspaper_collector.transform import TransformError, TransformPool, transform_record
+from newspaper_collector.pipelines.batching import BufferedDbPipeline
+
+class RefinedZonePipeline(BufferedDbPipeline):
+
+    settings_prefix = 'REFINED_ZONE'
+    stats_prefix = 'refined_zone'
+    log_name = 'RefinedZonePipeline'
+    transformer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = super().from_crawler(crawler)
+        pipeline.transformer = TransformPool.from_settings(crawler.settings, crawler.stats)
+        return pipeline
+
+    def close_spider(self, spider):
+        d = self.transformer.close() if self.transformer is not None else None
+        if d is None:
+            return super().close_spider(spider)
+        # Los lotes que devuelve el pool llegan al buffer antes de que d se dispare.
+        d.addErrback(lambda failure: spider.logger.error(
+            f"{self.log_name}: Error al cerrar el pool de transformación: {failure.getErrorMessage()}"))
+        d.addCallback(lambda _: super(RefinedZonePipeline, self).close_spider(spider))
+        return d
 
     def process_item(self, item, spider):
         """
@@ -54,128 +42,53 @@ class RefinedZonePipeline:
           - seccion
           - url
           - date_saved
-        Aplica transformaciones y lo guarda en la BD.
+        Aplica transformaciones y lo encola para guardarlo en la BD por lotes.
         """
-        # Convertir item a diccionario
-        transformed = dict(item)
+        index = dedup.current_index()
+        if index is not None and item.get('url') in index:
+            raise DropItem(f"NOTICIA YA EXISTE EN BD: {item.get('url')}")
 
-        for key, value in transformed.items():
-            if isinstance(value, str):
-                transformed[key] = value.lower().strip()
-
-        for field in transformed:
-            if transformed[field] == "" or transformed[field] == " " or transformed[field] == "null":
-                transformed[field] = None
-
-        if 'descripcion' in transformed and transformed['descripcion']:
-            if isinstance(transformed['descripcion'], list):
-                desc = ' '.join(transformed['descripcion'])
-            else:
-                desc = transformed['descripcion']
-
-            desc = self.clean_text(desc)
-            desc = self.remove_links(desc)
-            transformed['descripcion'] = desc
-
-        if 'fecha' in transformed and transformed['fecha']:
-            try:
-                parsed_date = parser.parse(transformed['fecha'])
-                transformed['fecha'] = parsed_date.isoformat()
-            except (ValueError, TypeError):
-                transformed['fecha'] = transformed['fecha']  
-
-        if 'date_saved' in transformed and transformed['date_saved']:
-            try:
-                dt = datetime.fromisoformat(transformed['date_saved'])
-                transformed['date_saved'] = dt.isoformat()
-            except:
-                transformed['date_saved'] = None
-        else:
-            transformed['date_saved'] = None
-
-        # 6) Validar que el título no esté vacío
-        if not transformed.get('titulo'):
-            spider.logger.error("Título vacío: no se guarda la noticia.")
-            raise Exception("Título vacío: no se guarda la noticia.")
-
-        # 7) Verificar si ya existe esa url en la BD
-        if 'url' in transformed and transformed['url']:
-            self.cur.execute("""
-                SELECT id FROM newspaper
-                WHERE url = %s
-            """, (transformed['url'],))
-            res = self.cur.fetchone()
-        else:
-            res = None
+        if self.transformer is not None and self.transformer.parallel:
+            # La transformación corre en otro proceso; el item sigue cuando vuelve el lote.
+            d = self.transformer.submit(item_to_dict(item))
+            d.addCallbacks(self.store_transformed, self.transform_failed,
+                           callbackArgs=(item, spider), errbackArgs=(spider,))
+            return d
+
+        return self.store_transformed(self.transform_item(item, spider), item, spider)
 
+    def store_transformed(self, transformed, item, spider):
         # Actualizar el item con los valores transformados
-        adapter = ItemAdapter(item)
         for key, value in transformed.items():
-            adapter[key] = value
-
-        # ... (código anterior) ...
-
-        if res: # Si la URL ya existe
-            spider.logger.info(f"NOTICIA YA EXISTE EN BD: {transformed['url']}")
-            return item
-        else: # Si la URL NO existe, intentar insertar
-            # ----- INICIO DEL BLOQUE PROBLEMÁTICO -----
-            try:
-                self.cur.execute("""
-                    INSERT INTO newspaper (
-                        data_id, titulo, descripcion, fecha, seccion, url, date_saved_iso
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    transformed.get('data_id'),
-                    transformed.get('titulo'),
-                    transformed.get('descripcion'),
-                    transformed.get('fecha'),
-                    transformed.get('seccion'),
-                    transformed.get('url'),
-                 
-                    transformed.get('date_saved')
-                ))
-                self.connection.commit() 
-                spider.logger.debug(f"RefinedZonePipeline: Item insertado: {transformed.get('url')}")
-            except psycopg2.Error as e:
-                 spider.logger.error(f"RefinedZonePipeline: Error psycopg2 al INSERTAR {transformed.get('url')}: {e}")
-          
-                 self.connection.rollback()
-
-            except Exception as e:
-                 spider.logger.error(f"RefinedZonePipeline: Error inesperado al INSERTAR {transformed.get('url')}: {e}", exc_info=True)
-            
-                 try:
-                     self.connection.rollback()
-                 except psycopg2.Error as rb_err:
-                     spider.logger.error(f"RefinedZonePipeline: Error durante rollback tras excepción: {rb_err}")
-
-            return item 
+            item[key] = value
 
+        return self.enqueue(item, transformed, spider)
 
+    def transform_item(self, item, spider):
+        try:
+            return transform_record(item_to_dict(item), self.stats)
+        except TransformError as e:
+            spider.logger.error(str(e))
+            raise
 
-    def close_spider(self, spider):
-        self.cur.close()
-        self.connection.close()
+    def transform_failed(self, failure, spider):
+        if failure.check(TransformError):
+            spider.logger.error(str(failure.value))
+        return failure
 
+    def write_rows(self, conn, rows):
+        return db.insert_newspaper_rows(conn, rows)
 
-    def clean_text(self, text):
-        if not text:
-            return text
-        text = re.sub("[\U00010000-\U0010ffff]", "", text, flags=re.UNICODE)
-        text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+    def row_url(self, row):
+        return row.get('url')
 
-    def remove_links(self, text):
-        if not text:
-            return text
+    def written(self, batch):
+        # La url entra al índice de deduplicación cuando también la guardó ConsumptionZonePipeline.
+        index = dedup.current_index()
+        if index is not None:
+            for row in batch:
+                index.confirm(row.get('url'), 'refined')
 
-        url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|' \
-                      r'(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        text = re.sub(url_pattern, '', text)
-        text = re.sub(r'www\.[^\s]+', '', text)
-        return text.strip()
 
     def extract_domain(self, url):
         try:
@@ -184,4 +97,3 @@ class RefinedZonePipeline:
             return domain
         except:
             return None
-
@@ -26,8 +26,10 @@ ROBOTSTXT_OBEY = True
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
+DOWNLOAD_DELAY = 0.25
 # The download delay setting will honor only one of:
 #CONCURRENT_REQUESTS_PER_DOMAIN = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 2
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -47,18 +49,62 @@ ROBOTSTXT_OBEY = True
 #SPIDER_MIDDLEWARES = {
 #    "newspaper_collector.middlewares.NewspaperCollectorSpiderMiddleware": 543,
 #}
+SPIDER_MIDDLEWARES = {
+   "newspaper_collector.middlewares.UrlDedupMiddleware": 550,
+}
+
+# Deduplicación de urls en memoria (filtro de Bloom + set exacto opcional)
+DEDUP_ENABLED = True
+# Número de urls para el que se dimensiona el filtro y tasa de falsos positivos objetivo
+DEDUP_CAPACITY = 200000
+DEDUP_ERROR_RATE = 0.001
+# False: solo filtro de Bloom (menos memoria, admite falsos positivos ~DEDUP_ERROR_RATE)
+DEDUP_EXACT_SET = True
+DEDUP_WARM_FROM_DB = True
+DEDUP_PERSIST_PATH = "datalake/STATE/url_dedup.idx"
+
+# Marcas de agua por fuente/sección del crawl incremental (-a full_crawl=1 para ignorarlas)
+CRAWL_STATE_PATH = "datalake/STATE/crawl_state.json"
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #DOWNLOADER_MIDDLEWARES = {
 #    "newspaper_collector.middlewares.NewspaperCollectorDownloaderMiddleware": 543,
 #}
+# AdaptiveThrottleMiddleware va después de RetryMiddleware (550) para ver los 429/503
+# antes de que se reintenten.
+DOWNLOADER_MIDDLEWARES = {
+   "newspaper_collector.middlewares.AdaptiveThrottleMiddleware": 560,
+   "scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware": None,
+   "newspaper_collector.httpcache.ListingCacheMiddleware": 900,
+}
+
+# Concurrencia y delay adaptativos por dominio (reemplaza a AutoThrottle). Cada dominio
+# empieza con CONCURRENT_REQUESTS_PER_DOMAIN peticiones en paralelo y DOWNLOAD_DELAY de
+# delay; mientras la latencia media quede bajo ADAPTIVE_THROTTLE_TARGET_LATENCY (segundos)
+# y los errores bajo ADAPTIVE_THROTTLE_MAX_ERROR_RATE se sube de a una petición hasta
+# ADAPTIVE_THROTTLE_MAX_CONCURRENCY; un 429/503 la divide a la mitad y duplica el delay
+# (hasta ADAPTIVE_THROTTLE_MAX_DELAY). El estado queda en las stats throttle/<dominio>/*.
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_TARGET_LATENCY = 2.0
+ADAPTIVE_THROTTLE_MIN_CONCURRENCY = 1
+ADAPTIVE_THROTTLE_MAX_CONCURRENCY = 8
+ADAPTIVE_THROTTLE_MAX_DELAY = 30.0
+ADAPTIVE_THROTTLE_MAX_ERROR_RATE = 0.05
+# Peso de cada respuesta nueva en las medias móviles de latencia y errores
+ADAPTIVE_THROTTLE_EWMA_ALPHA = 0.2
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 #EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 #}
+EXTENSIONS = {
+   "newspaper_collector.extensions.StatsFileExtension": 500,
+}
+# Archivo JSON donde StatsFileExtension guarda las stats al terminar el crawl
+# (run_schedule.py lo define por shard con -s STATS_FILE=...; vacío = no se guarda)
+STATS_FILE = None
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -68,6 +114,47 @@ ITEM_PIPELINES = {
    "newspaper_collector.pipelines.consumption_zone_pipeline.ConsumptionZonePipeline": 300,
 }
 
+# Clase de los items del spider: NewspaperRecord (attrs con __slots__) o
+# "newspaper_collector.items.NewspaperItem" (scrapy.Item)
+ITEM_CLASS = "newspaper_collector.items.NewspaperRecord"
+
+# Landing Zone: compresión ("gzip", "zstd" si está instalado zstandard, o "none"),
+# rotación de archivos por tamaño en disco / cantidad de items y tamaño de la cola
+# del hilo que escribe
+LANDING_ZONE_DIR = "datalake/LANDING_ZONE"
+LANDING_ZONE_COMPRESSION = "gzip"
+LANDING_ZONE_MAX_FILE_BYTES = 64 * 1024 * 1024
+LANDING_ZONE_MAX_FILE_ITEMS = 100000
+LANDING_ZONE_QUEUE_SIZE = 1000
+# Los archivos se guardan en source=<fuente>/date=<día de captura>/ y se registran en
+# LANDING_ZONE_DIR/_manifest.sqlite (python -m newspaper_collector.manifest index
+# indexa los archivos planos anteriores)
+LANDING_ZONE_MANIFEST = True
+
+# Transformación de RefinedZonePipeline en procesos aparte (para backfills grandes).
+# TRANSFORM_WORKERS <= 1 transforma en el hilo del reactor, como siempre; con más workers
+# los items se agrupan en lotes de TRANSFORM_BATCH_SIZE (o lo que haya tras
+# TRANSFORM_MAX_WAIT segundos) y los lotes de menos de TRANSFORM_INLINE_THRESHOLD items
+# se transforman en el mismo proceso.
+TRANSFORM_WORKERS = 0
+TRANSFORM_BATCH_SIZE = 100
+TRANSFORM_MAX_WAIT = 0.5
+TRANSFORM_INLINE_THRESHOLD = 20
+
+# Escritura por lotes de RefinedZonePipeline: tamaño del lote y segundos máximos
+# que un item puede esperar en el buffer antes de escribirse (1 = item por item)
+REFINED_ZONE_BATCH_SIZE = 200
+REFINED_ZONE_FLUSH_INTERVAL = 5.0
+# Lo mismo para ConsumptionZonePipeline (un INSERT ... ON CONFLICT por lote)
+CONSUMPTION_ZONE_BATCH_SIZE = 200
+CONSUMPTION_ZONE_FLUSH_INTERVAL = 5.0
+
+# Pool de conexiones compartido por los pipelines de BD (newspaper_collector/db.py)
+DB_POOL_MINCONN = 1
+DB_POOL_MAXCONN = 10
+# Ejecutar las escrituras a BD en el threadpool de Twisted en vez del hilo del reactor
+DB_WRITES_IN_THREAD = True
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
@@ -89,6 +176,17 @@ ITEM_PIPELINES = {
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
 
+# Caché de los listados (newspaper_collector/httpcache.py): cada página se revalida con
+# ETag/Last-Modified y un 304 no se vuelve a parsear en modo incremental. Los cuerpos se
+# guardan con gzip en .scrapy/httpcache y se borran los menos usados al pasar
+# HTTPCACHE_MAX_BYTES. HTTPCACHE_OFFLINE = True reproduce el crawl solo desde la caché.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_POLICY = "newspaper_collector.httpcache.ListingCachePolicy"
+HTTPCACHE_STORAGE = "newspaper_collector.httpcache.CompressedCacheStorage"
+HTTPCACHE_MAX_BYTES = 200 * 1024 * 1024
+HTTPCACHE_OFFLINE = False
+
 # Set settings whose default value is deprecated to a future-proof value
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
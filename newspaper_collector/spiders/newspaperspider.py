@@ -1,11 +1,17 @@
 # newspaper_spider.py
 
 import scrapy
-from newspaper_collector.items import NewspaperItem 
+from scrapy import signals
+from scrapy.utils.misc import load_object
+from newspaper_collector.items import NewspaperRecord
 import uuid
 from datetime import datetime
 import logging
 
+from newspaper_collector import dedup
+from newspaper_collector.crawl_state import CrawlState, PageProgress
+from newspaper_collector.spiders.parsers import build_registry
+
 from newspaper_collector.spiders.constants import ( 
     ALLOWED_DOMAINS,
     ELDEBER_SECTIONS, ELDEBER_PAGES_TO_SCRAPE,
@@ -14,13 +20,99 @@ from newspaper_collector.spiders.constants import (
     HEADERS 
 )
 
+# Secciones de cada fuente (Los Tiempos tiene un único listado).
+SOURCE_SECTIONS = {
+    'eldeber': tuple(ELDEBER_SECTIONS),
+    'lostiempos': (),
+    'ahoraelpueblo': tuple(AHORAELPUEBLO_SECTIONS),
+}
+
+
+def parse_sources(value):
+    """
+    'eldeber,ahoraelpueblo/seguridad' -> {'eldeber': None, 'ahoraelpueblo': {'seguridad'}}
+    (None = todas las secciones). Sin valor devuelve None: todas las fuentes.
+    """
+    if not value:
+        return None
+    shard = {}
+    for entry in str(value).split(','):
+        entry = entry.strip().lower()
+        if not entry:
+            continue
+        source, _, section = entry.partition('/')
+        if source not in SOURCE_SECTIONS:
+            raise ValueError(f"Fuente desconocida en sources: {source!r} (válidas: {', '.join(SOURCE_SECTIONS)})")
+        if section and section not in SOURCE_SECTIONS[source]:
+            raise ValueError(f"Sección desconocida para {source}: {section!r}")
+        if not section:
+            shard[source] = None
+        elif shard.get(source, set()) is not None:
+            shard.setdefault(source, set()).add(section)
+    return shard or None
+
+
+def shard_name(value):
+    """Nombre del shard para rutas de archivos: 'ahoraelpueblo/seguridad' -> 'ahoraelpueblo-seguridad'."""
+    if not value:
+        return None
+    return '_'.join(entry.strip().lower().replace('/', '-') for entry in str(value).split(',') if entry.strip())
+
+
 class NewspaperSpider(scrapy.Spider):
     name = "newspaper_spider"
     allowed_domains = ALLOWED_DOMAINS
+    # Clase de los items (setting ITEM_CLASS); NewspaperItem sigue funcionando.
+    item_class = NewspaperRecord
+
+    def __init__(self, full_crawl=None, sources=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Por defecto el crawl es incremental; -a full_crawl=1 recorre todas las páginas.
+        self.full_crawl = str(full_crawl).lower() in ('1', 'true', 'yes', 'si') if full_crawl is not None else False
+        # -a sources=eldeber,ahoraelpueblo/seguridad limita el crawl a esas fuentes o
+        # secciones (un shard de run_schedule.py); sin el argumento se recorren todas.
+        self.shard = parse_sources(sources)
+        self.shard_name = shard_name(sources)
+        self.crawl_state = None
+        self.parsers = build_registry()
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.crawl_state = CrawlState(crawler.settings.get('CRAWL_STATE_PATH'))
+        if crawler.settings.get('ITEM_CLASS'):
+            spider.item_class = load_object(crawler.settings.get('ITEM_CLASS'))
+        # crawler.stats recién existe cuando arranca el crawl.
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        return spider
+
+    def spider_opened(self, spider):
+        self.parsers = build_registry(self.crawler.stats)
+
+    def closed(self, reason):
+        # Las marcas de agua solo avanzan si el crawl terminó completo.
+        if reason == 'finished' and self.crawl_state is not None:
+            self.crawl_state.save()
+
+    def wants(self, source, section=None):
+        if self.shard is None:
+            return True
+        if source not in self.shard:
+            return False
+        sections = self.shard[source]
+        return sections is None or section in sections
+
+    async def start(self):
+        # Scrapy >= 2.13 pide las requests iniciales con start(); las versiones anteriores
+        # llaman directamente a start_requests().
+        for request in self.start_requests():
+            yield request
 
     def start_requests(self):
 
         for section, url_pattern in ELDEBER_SECTIONS.items():
+            if not self.wants('eldeber', section):
+                continue
             start_url = url_pattern.format(page=1)
             logging.info(f"Iniciando El Deber - Sección: {section}, URL: {start_url}")
             yield scrapy.Request(
@@ -35,17 +127,20 @@ class NewspaperSpider(scrapy.Spider):
                 errback=self.handle_error
             )
 
-        logging.info(f"Iniciando Los Tiempos - URL: {LOSTIEMPOS_START_URL}")
-        yield scrapy.Request(
-            url=LOSTIEMPOS_START_URL,
-            callback=self.parse,
-            meta={'page': 1, 'source': 'lostiempos'},
-            headers=HEADERS,
-            errback=self.handle_error
-        )
+        if self.wants('lostiempos'):
+            logging.info(f"Iniciando Los Tiempos - URL: {LOSTIEMPOS_START_URL}")
+            yield scrapy.Request(
+                url=LOSTIEMPOS_START_URL,
+                callback=self.parse,
+                meta={'page': 1, 'source': 'lostiempos'},
+                headers=HEADERS,
+                errback=self.handle_error
+            )
 
         start_value = 0 
         for section, url_pattern in AHORAELPUEBLO_SECTIONS.items():
+            if not self.wants('ahoraelpueblo', section):
+                continue
             start_url = url_pattern.format(start=start_value)
             logging.info(f"Iniciando Ahora El Pueblo - Sección: {section}, URL: {start_url}")
             yield scrapy.Request(
@@ -62,6 +157,20 @@ class NewspaperSpider(scrapy.Spider):
                 errback=self.handle_error
             )
 
+    def is_seen(self, url):
+        index = dedup.current_index()
+        return index is not None and url in index
+
+    def page_progress(self, source, section, page):
+        return PageProgress(self.crawl_state, CrawlState.key(source, section), page, self.is_seen)
+
+    def should_paginate(self, progress):
+        if self.full_crawl or not progress.exhausted:
+            return True
+        self.logger.info(f"Modo incremental: sin noticias nuevas en {progress.key}, página {progress.page}; se detiene la paginación.")
+        self.crawler.stats.inc_value('incremental/pagination_stopped')
+        return False
+
     def handle_error(self, failure):
         self.logger.error(f"Request failed: {failure.request.url} - {failure.value}")
 
@@ -71,6 +180,13 @@ class NewspaperSpider(scrapy.Spider):
             return 
 
         source = response.meta.get("source", "")
+        if response.meta.get('not_modified'):
+            self.crawler.stats.inc_value('httpcache/not_modified')
+            if not self.full_crawl:
+                # 304: el listado no cambió desde el último crawl (ni las páginas siguientes).
+                self.logger.info(f"Sin cambios (304) en {response.url}; no se parsea.")
+                return
+
         try:
             if source == 'eldeber':
                 yield from self.parse_eldeber(response)
@@ -92,29 +208,34 @@ class NewspaperSpider(scrapy.Spider):
 
         self.logger.info(f"Parseando El Deber - Sección: {section}, Página: {page}, URL: {response.url}")
 
-        noticias = response.xpath('//div[contains(@class, "titulo-teaser-2col")]/a/h2/ancestor::article')
+        parser = self.parsers['eldeber']
+        noticias = parser.article_nodes(response)
+        progress = self.page_progress(source, section, page)
         news_found_count = 0
         for noticia in noticias:
             try:
-                item = NewspaperItem()
-
-                titulo = noticia.xpath('.//div[contains(@class, "titulo-teaser-2col")]/a/h2/text()').get(default="").strip()
-                descripcion = " ".join(noticia.xpath('.//div[contains(@class, "entradilla-teaser-2col")]//text()').getall()).strip()
-                fecha = noticia.xpath('.//div[contains(@class, "fecha-teaser-2col")]/div/time/text()').get(default="").strip()
-                relative_url = noticia.xpath('.//div[contains(@class, "titulo-teaser-2col")]/a/@href').get(default="")
+                data = parser.extract(noticia)
+                titulo = data['titulo']
+                descripcion = data['descripcion']
+                fecha = data['fecha']
+                relative_url = data['url']
 
                 if not titulo or not relative_url: # Validar que se extrajo lo mínimo
                     self.logger.warning(f"Datos incompletos en noticia de {response.url}")
                     continue
 
-                item["data_id"] = str(uuid.uuid4())
-                item["source"] = source
-                item["titulo"] = titulo
-                item["descripcion"] = descripcion
-                item["fecha"] = fecha
-                item["seccion"] = section # Usamos la sección de la URL procesada
-                item["url"] = response.urljoin(relative_url)
-                item["date_saved"] = datetime.now().isoformat()
+                url = response.urljoin(relative_url)
+                item = self.item_class(
+                    data_id=str(uuid.uuid4()),
+                    source=source,
+                    titulo=titulo,
+                    descripcion=descripcion,
+                    fecha=fecha,
+                    seccion=section, # Usamos la sección de la URL procesada
+                    url=url,
+                    date_saved=datetime.now().isoformat(),
+                )
+                progress.saw(url, fecha)
 
                 yield item
                 news_found_count += 1
@@ -124,7 +245,7 @@ class NewspaperSpider(scrapy.Spider):
         self.logger.info(f"Encontradas {news_found_count} noticias en El Deber - Sección: {section}, Página: {page}")
 
         # --- Paginación El Deber ---
-        if page < ELDEBER_PAGES_TO_SCRAPE:
+        if page < ELDEBER_PAGES_TO_SCRAPE and self.should_paginate(progress):
             next_page = page + 1
             next_page_url = url_pattern.format(page=next_page)
             self.logger.info(f"Solicitando siguiente página El Deber - Sección: {section}, Página: {next_page}, URL: {next_page_url}")
@@ -146,30 +267,35 @@ class NewspaperSpider(scrapy.Spider):
         source = response.meta['source']
         self.logger.info(f"Parseando Los Tiempos - Página: {page}, URL: {response.url}")
 
-        noticias = response.xpath('//section[contains(@class, "pane-views-panes")]//div[contains(@class, "views-row")]')
+        parser = self.parsers['lostiempos']
+        noticias = parser.article_nodes(response)
+        progress = self.page_progress(source, None, page)
         news_found_count = 0
         for noticia in noticias:
              try:
-                item = NewspaperItem()
-
-                titulo = noticia.xpath('.//div[contains(@class, "views-field-title term")]/a/text()').get(default="").strip()
-                resumen = noticia.xpath('.//div[contains(@class, "views-field-field-noticia-sumario")]/span/text()').get(default="").strip()
-                fecha = noticia.xpath('.//span[contains(@class, "views-field-field-noticia-fecha")]/span/text()').get(default="").strip()
-                seccion = noticia.xpath('.//span[contains(@class, "views-field-seccion")]/span/a/text()').get(default="Ultimas Noticias").strip() 
-                url_noticia = noticia.xpath('.//div[contains(@class, "views-field-title term")]/a/@href').get(default="")
+                data = parser.extract(noticia)
+                titulo = data['titulo']
+                resumen = data['descripcion']
+                fecha = data['fecha']
+                seccion = data['seccion']
+                url_noticia = data['url']
 
                 if not titulo or not url_noticia:
                     self.logger.warning(f"Datos incompletos en noticia de {response.url}")
                     continue
 
-                item["data_id"] = str(uuid.uuid4())
-                item["source"] = source
-                item["titulo"] = titulo
-                item["descripcion"] = resumen
-                item["fecha"] = fecha
-                item["seccion"] = seccion
-                item["url"] = response.urljoin(url_noticia)
-                item["date_saved"] = datetime.now().isoformat()
+                url = response.urljoin(url_noticia)
+                item = self.item_class(
+                    data_id=str(uuid.uuid4()),
+                    source=source,
+                    titulo=titulo,
+                    descripcion=resumen,
+                    fecha=fecha,
+                    seccion=seccion,
+                    url=url,
+                    date_saved=datetime.now().isoformat(),
+                )
+                progress.saw(url, fecha)
 
                 yield item
                 news_found_count += 1
@@ -178,8 +304,8 @@ class NewspaperSpider(scrapy.Spider):
 
         self.logger.info(f"Encontradas {news_found_count} noticias en Los Tiempos - Página: {page}")
 
-        if page < LOSTIEMPOS_PAGES_TO_SCRAPE:
-            next_page_href = response.xpath('//li[contains(@class, "pager-next")]/a/@href').get()
+        if page < LOSTIEMPOS_PAGES_TO_SCRAPE and self.should_paginate(progress):
+            next_page_href = parser.page_value(response, 'next_page')
             if next_page_href:
                 next_page_url = response.urljoin(next_page_href)
                 self.logger.info(f"Solicitando siguiente página Los Tiempos - Página: {page + 1}, URL: {next_page_url}")
@@ -202,53 +328,36 @@ class NewspaperSpider(scrapy.Spider):
 
         self.logger.info(f"Parseando Ahora El Pueblo - Sección: {section}, Página conceptual: {page} (start={start_value}), URL: {response.url}")
 
-        noticias = response.xpath('//div[@class="article-list"]//div[@itemprop="blogPost"]')
-        if not noticias:
-             noticias = response.xpath('//*[@id="sp-component"]/div/div[2]/div[2]/div/div/div')
+        parser = self.parsers['ahoraelpueblo']
+        # Probar el listado con microdatos y, si no hay, el diseño posicional (lo resuelve el parser).
+        noticias = parser.article_nodes(response)
 
+        progress = self.page_progress(source, section, page)
         news_found_count = 0
         for noticia in noticias:
             try:
-                item = NewspaperItem()
-
-                titulo_elem = noticia.xpath('.//h2[@itemprop="name"]/a/text()') 
-                if not titulo_elem:
-                    titulo_elem = noticia.xpath('.//div[2]/div[1]/h2/a/text()') 
-
-                desc_elem = noticia.xpath('.//div[@itemprop="description"]//text()') 
-                if not desc_elem:
-                     desc_elem = noticia.xpath('.//div[contains(@class, "article-introtext")]//text()') 
-
-                fecha_elem = noticia.xpath('.//time[@itemprop="datePublished"]/@datetime') 
-                if not fecha_elem:
-                    fecha_elem = noticia.xpath('.//time/@datetime') 
-
-                seccion_elem = noticia.xpath('.//a[@itemprop="genre"]/text()') 
-                if not seccion_elem:
-                    seccion_elem = noticia.xpath('.//div[2]/div[2]/span[1]/a/text()') 
-
-                url_elem = noticia.xpath('.//h2[@itemprop="name"]/a/@href')
-                if not url_elem:
-                    url_elem = noticia.xpath('.//div[2]/div[1]/h2/a/@href')
-
-
-                titulo = titulo_elem.get(default="").strip()
-                relative_url = url_elem.get()
-                descripcion = " ".join(desc_elem.getall()).strip()
-                fecha = fecha_elem.get()
+                data = parser.extract(noticia)
+                titulo = data['titulo']
+                relative_url = data['url']
+                descripcion = data['descripcion']
+                fecha = data['fecha']
 
                 if not titulo or not relative_url:
                     self.logger.warning(f"Datos incompletos en noticia de {response.url}")
                     continue
 
-                item["data_id"] = str(uuid.uuid4())
-                item["source"] = source
-                item["titulo"] = titulo
-                item["descripcion"] = descripcion
-                item["fecha"] = fecha
-                item["seccion"] = section 
-                item["url"] = response.urljoin(relative_url)
-                item["date_saved"] = datetime.now().isoformat()
+                url = response.urljoin(relative_url)
+                item = self.item_class(
+                    data_id=str(uuid.uuid4()),
+                    source=source,
+                    titulo=titulo,
+                    descripcion=descripcion,
+                    fecha=fecha,
+                    seccion=section,
+                    url=url,
+                    date_saved=datetime.now().isoformat(),
+                )
+                progress.saw(url, fecha)
 
                 yield item
                 news_found_count += 1
@@ -258,7 +367,7 @@ class NewspaperSpider(scrapy.Spider):
 
         self.logger.info(f"Encontradas {news_found_count} noticias en Ahora El Pueblo - Sección: {section}, Página: {page}")
 
-        if page < AHORAELPUEBLO_PAGES_TO_SCRAPE:
+        if page < AHORAELPUEBLO_PAGES_TO_SCRAPE and self.should_paginate(progress):
             next_page = page + 1
             next_start_value = start_value + AHORAELPUEBLO_PAGE_INCREMENT
             next_page_url = url_pattern.format(start=next_start_value)
@@ -0,0 +1,166 @@
+# parsers.py
+#
+# Registro de selectores por fuente. Cada diario declara una sola vez sus XPath (con
+# variantes alternativas para cuando cambia el diseño del sitio), compiladas al importar
+# con lxml.etree.XPath. Las variantes se prueban en orden de preferencia; solo en los
+# campos exclusive (el selector de noticias, que decide qué diseño del sitio se está
+# viendo) se prueba primero la que ganó la última vez. Cada acierto se cuenta en las
+# stats como selectors/<fuente>/<campo>/<variante> para detectar cambios de diseño.
+
+from lxml import etree
+
+PARSERS = {}
+
+
+def register(cls):
+    PARSERS[cls.source] = cls
+    return cls
+
+
+def build_registry(stats=None):
+    """Un parser por fuente, con su propia memoria de variantes ganadoras."""
+    return {source: cls(stats) for source, cls in PARSERS.items()}
+
+
+class Field:
+    """
+    Campo con una o más variantes de XPath (nombre, expresión) en orden de preferencia.
+    many=True une todos los nodos de texto con espacios; si no, toma el primero.
+    exclusive=True indica que las variantes son diseños alternativos de la página entera
+    (a lo sumo una coincide), así que se puede empezar por la última ganadora; sin eso
+    son una cadena de respaldo y la principal se prueba siempre primero. Los campos de
+    cada noticia son relativos a su nodo y un XPath posicional puede coincidir también
+    en el diseño con microdatos, así que no se marcan como exclusive.
+    """
+
+    def __init__(self, *variants, many=False, strip=True, default="", exclusive=False):
+        self.variants = [
+            (name, expression, etree.XPath(expression, smart_strings=False))
+            for name, expression in variants
+        ]
+        self.many = many
+        self.strip = strip
+        self.default = default
+        self.exclusive = exclusive
+
+    def value(self, results):
+        if self.many:
+            return " ".join(results).strip()
+        if not results:
+            return self.default
+        return results[0].strip() if self.strip else results[0]
+
+
+def primary(expression):
+    return ('primary', expression)
+
+
+def fallback(expression, name='fallback'):
+    return (name, expression)
+
+
+class SourceParser:
+
+    source = None
+    # Nodos de cada noticia dentro del listado (Field cuyos resultados son elementos).
+    articles = None
+    # Campos de cada noticia, relativos al nodo de la noticia.
+    fields = {}
+    # Campos de la página completa (p. ej. el enlace a la página siguiente).
+    page_fields = {}
+
+    def __init__(self, stats=None):
+        self.stats = stats
+        # Índice de la variante que ganó la última vez, por campo (solo campos exclusive).
+        self.winners = {}
+
+    def evaluate(self, key, field, node):
+        variants = field.variants
+        first = self.winners.get(key, 0) if field.exclusive else 0
+        order = [first] + [i for i in range(len(variants)) if i != first] if first else range(len(variants))
+        for index in order:
+            name, _, xpath = variants[index]
+            results = xpath(node)
+            if results:
+                if field.exclusive:
+                    self.winners[key] = index
+                self.count(f'{key}/{name}')
+                return results
+        self.count(f'{key}/none')
+        return []
+
+    def count(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(f'selectors/{self.source}/{key}')
+
+    def article_nodes(self, response):
+        return self.evaluate('articles', self.articles, response.selector.root)
+
+    def extract(self, node):
+        """Devuelve un dict con el valor de cada campo de la noticia."""
+        return {key: field.value(self.evaluate(key, field, node)) for key, field in self.fields.items()}
+
+    def page_value(self, response, key):
+        field = self.page_fields[key]
+        return field.value(self.evaluate(key, field, response.selector.root))
+
+
+@register
+class ElDeberParser(SourceParser):
+    source = 'eldeber'
+    articles = Field(primary('//div[contains(@class, "titulo-teaser-2col")]/a/h2/ancestor::article'))
+    fields = {
+        'titulo': Field(primary('.//div[contains(@class, "titulo-teaser-2col")]/a/h2/text()')),
+        'descripcion': Field(primary('.//div[contains(@class, "entradilla-teaser-2col")]//text()'), many=True),
+        'fecha': Field(primary('.//div[contains(@class, "fecha-teaser-2col")]/div/time/text()')),
+        'url': Field(primary('.//div[contains(@class, "titulo-teaser-2col")]/a/@href'), strip=False),
+    }
+
+
+@register
+class LosTiemposParser(SourceParser):
+    source = 'lostiempos'
+    articles = Field(primary('//section[contains(@class, "pane-views-panes")]//div[contains(@class, "views-row")]'))
+    fields = {
+        'titulo': Field(primary('.//div[contains(@class, "views-field-title term")]/a/text()')),
+        'descripcion': Field(primary('.//div[contains(@class, "views-field-field-noticia-sumario")]/span/text()')),
+        'fecha': Field(primary('.//span[contains(@class, "views-field-field-noticia-fecha")]/span/text()')),
+        'seccion': Field(primary('.//span[contains(@class, "views-field-seccion")]/span/a/text()'),
+                         default="Ultimas Noticias"),
+        'url': Field(primary('.//div[contains(@class, "views-field-title term")]/a/@href'), strip=False),
+    }
+    page_fields = {
+        'next_page': Field(primary('//li[contains(@class, "pager-next")]/a/@href'), strip=False, default=None),
+    }
+
+
+@register
+class AhoraElPuebloParser(SourceParser):
+    source = 'ahoraelpueblo'
+    # El sitio alterna entre el listado con microdatos y uno sin ellos (posicional).
+    articles = Field(
+        primary('//div[@class="article-list"]//div[@itemprop="blogPost"]'),
+        fallback('//*[@id="sp-component"]/div/div[2]/div[2]/div/div/div', 'positional'),
+        exclusive=True,
+    )
+    fields = {
+        'titulo': Field(
+            primary('.//h2[@itemprop="name"]/a/text()'),
+            fallback('.//div[2]/div[1]/h2/a/text()', 'positional'),
+        ),
+        'descripcion': Field(
+            primary('.//div[@itemprop="description"]//text()'),
+            fallback('.//div[contains(@class, "article-introtext")]//text()', 'introtext'),
+            many=True,
+        ),
+        'fecha': Field(
+            primary('.//time[@itemprop="datePublished"]/@datetime'),
+            fallback('.//time/@datetime', 'time'),
+            strip=False, default=None,
+        ),
+        'url': Field(
+            primary('.//h2[@itemprop="name"]/a/@href'),
+            fallback('.//div[2]/div[1]/h2/a/@href', 'positional'),
+            strip=False, default=None,
+        ),
+    }
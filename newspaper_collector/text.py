@@ -0,0 +1,26 @@
+# text.py
+#
+# Limpieza de textos (descripciones) para la Refined Zone, con patrones compilados una
+# sola vez: una pasada de regex quita links, emojis y puntuación, y split/join colapsa
+# los espacios. Conserva letras con tilde y la ñ (\w es Unicode en Python 3).
+
+import re
+
+# Links primero (antes de borrar ':' y '/'), después todo lo que no sea letra, dígito o
+# espacio: puntuación, símbolos y emojis. '_' entra en \w, por eso va aparte.
+CLEAN_PATTERN = re.compile(r'https?://\S+|www\.\S+|[^\w\s]|_')
+
+
+def clean_text(text):
+    if not text:
+        return text
+    return ' '.join(CLEAN_PATTERN.sub('', text).split())
+
+
+def normalize_value(value):
+    """Minúsculas y sin espacios en los bordes; '' y 'null' pasan a None."""
+    if isinstance(value, str):
+        value = value.lower().strip()
+        if not value or value == 'null':
+            return None
+    return value
@@ -0,0 +1,190 @@
+# transform.py
+#
+# Transformación de la Refined Zone sobre dicts (minúsculas, limpieza de texto, fechas),
+# sin dependencias de Scrapy para poder correr en otros procesos. TransformPool manda
+# lotes a un ProcessPoolExecutor y devuelve los resultados al reactor como Deferreds.
+
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from twisted.internet import defer, threads
+
+from newspaper_collector import dates, text
+
+logger = logging.getLogger(__name__)
+
+
+class TransformError(Exception):
+    """El registro no se puede guardar (p. ej. título vacío)."""
+
+
+class StatsDelta(Counter):
+    """Junta stats en un proceso worker (misma interfaz que las stats de Scrapy) para sumarlas después."""
+
+    def inc_value(self, key, count=1, start=0):
+        self[key] += count
+
+
+def transform_record(record, stats=None):
+    """
+    Recibe un dict con los campos de NewspaperItem y devuelve uno nuevo con los valores
+    normalizados. Lanza TransformError si el título queda vacío.
+    """
+    # La fecha se interpreta sobre el texto original (antes de pasarlo a minúsculas) y
+    # el datetime queda en el item para que los pipelines siguientes no la vuelvan a parsear.
+    fecha_dt = dates.parse_fecha(record.get('fecha'), record.get('source'), stats)
+
+    # Copia, minúsculas y vacíos a None en una sola pasada
+    transformed = {key: text.normalize_value(value) for key, value in record.items()}
+
+    if 'descripcion' in transformed and transformed['descripcion']:
+        if isinstance(transformed['descripcion'], list):
+            desc = ' '.join(transformed['descripcion'])
+        else:
+            desc = transformed['descripcion']
+
+        transformed['descripcion'] = text.clean_text(desc)
+
+    if fecha_dt is not None:
+        transformed['fecha'] = fecha_dt.isoformat()
+    transformed['fecha_dt'] = fecha_dt
+
+    if 'date_saved' in transformed and transformed['date_saved']:
+        try:
+            dt = datetime.fromisoformat(transformed['date_saved'])
+            transformed['date_saved'] = dt.isoformat()
+        except (ValueError, TypeError):
+            transformed['date_saved'] = None
+    else:
+        transformed['date_saved'] = None
+
+    # Validar que el título no esté vacío
+    if not transformed.get('titulo'):
+        raise TransformError("Título vacío: no se guarda la noticia.")
+
+    return transformed
+
+
+def transform_batch(records):
+    """
+    Transforma un lote en orden. Devuelve ([(registro o None, error o None), ...], stats)
+    para que el proceso que llama sume las stats de fechas en las stats de Scrapy.
+    """
+    stats = StatsDelta()
+    results = []
+    for record in records:
+        try:
+            results.append((transform_record(record, stats), None))
+        except TransformError as e:
+            results.append((None, str(e)))
+    return results, dict(stats)
+
+
+class TransformPool:
+    """
+    Junta registros en lotes de batch_size (o los que haya tras max_wait segundos) y los
+    transforma en un ProcessPoolExecutor con `workers` procesos. Con workers <= 1, o con
+    lotes de menos de inline_threshold registros, transforma en el mismo proceso: para
+    pocos items mandar el lote a otro proceso cuesta más que hacerlo aquí.
+    """
+
+    def __init__(self, workers=0, batch_size=100, max_wait=0.5, inline_threshold=20, stats=None):
+        self.workers = workers
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self.inline_threshold = inline_threshold
+        self.stats = stats
+        self.buffer = []
+        self.timer = None
+        self.executor = None
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        return cls(
+            workers=settings.getint('TRANSFORM_WORKERS', 0),
+            batch_size=settings.getint('TRANSFORM_BATCH_SIZE', 100),
+            max_wait=settings.getfloat('TRANSFORM_MAX_WAIT', 0.5),
+            inline_threshold=settings.getint('TRANSFORM_INLINE_THRESHOLD', 20),
+            stats=stats,
+        )
+
+    @property
+    def parallel(self):
+        return self.workers > 1
+
+    def submit(self, record):
+        """Devuelve un Deferred con el registro transformado (o un Failure con TransformError)."""
+        from twisted.internet import reactor
+
+        d = defer.Deferred()
+        self.buffer.append((record, d))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = reactor.callLater(self.max_wait, self.flush)
+        return d
+
+    def flush(self):
+        if self.timer is not None and self.timer.active():
+            self.timer.cancel()
+        self.timer = None
+        batch, self.buffer = self.buffer, []
+        if not batch:
+            return
+        records = [record for record, _ in batch]
+        deferreds = [d for _, d in batch]
+        if not self.parallel or len(batch) < self.inline_threshold:
+            self.deliver(deferreds, transform_batch(records))
+            return
+        if self.stats is not None:
+            self.stats.inc_value('transform/batches_in_pool')
+        future = self.get_executor().submit(transform_batch, records)
+        future.add_done_callback(lambda f: self.call_in_reactor(self.done, f, deferreds))
+
+    @staticmethod
+    def call_in_reactor(function, *args):
+        from twisted.internet import reactor
+        reactor.callFromThread(function, *args)
+
+    def get_executor(self):
+        if self.executor is None:
+            # spawn: no se hace fork de un proceso con el reactor y sus hilos corriendo.
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"Transformación en {self.workers} procesos (lotes de {self.batch_size}).")
+        return self.executor
+
+    def done(self, future, deferreds):
+        try:
+            output = future.result()
+        except Exception as e:
+            logger.error(f"Error en el proceso de transformación ({len(deferreds)} items): {e}")
+            for d in deferreds:
+                d.errback(e)
+            return
+        self.deliver(deferreds, output)
+
+    def deliver(self, deferreds, output):
+        results, stats = output
+        if self.stats is not None:
+            for key, count in stats.items():
+                self.stats.inc_value(key, count)
+        for d, (record, error) in zip(deferreds, results):
+            if error is None:
+                d.callback(record)
+            else:
+                d.errback(TransformError(error))
+
+    def close(self):
+        """
+        Manda lo que quede en el buffer y apaga el pool. La espera a los workers corre en
+        un hilo aparte para no frenar el reactor; devuelve un Deferred que se dispara
+        cuando terminaron (o None si no había pool).
+        """
+        self.flush()
+        if self.executor is None:
+            return None
+        executor, self.executor = self.executor, None
+        return threads.deferToThread(executor.shutdown, wait=True)
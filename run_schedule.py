@@ -1,88 +1,285 @@
+import argparse
+import json
+import os
 import schedule
 import time
 import subprocess
+import sys
 from datetime import datetime
 import logging # Importar logging
 
+from newspaper_collector.spiders.newspaperspider import SOURCE_SECTIONS
+
 # Configurar logging básico para ver qué está haciendo el scheduler
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_etl_process():
-    """Ejecuta el spider de Scrapy y luego el script para poblar la Consumption Zone."""
-    logging.info(f"[{datetime.now()}] Iniciando proceso ETL completo...")
+# Stats y logs de cada shard: <RUNS_DIR>/<ejecución>/<shard>.json y .log
+RUNS_DIR = os.path.join("datalake", "STATE", "runs")
 
-    # 1. Ejecutar el Scrapy Spider
-    logging.info("Ejecutando spider (Scrapy)...")
-    try:
-        # Usamos check=True para que lance un error si Scrapy falla
-        # capture_output=True para capturar stdout/stderr y mostrarlos si hay error
-        result_scrapy = subprocess.run(
-            ["scrapy", "crawl", "newspaper_spider"],
-            check=True,
-            capture_output=True,
-            text=True,
-            encoding='utf-8' # Especificar encoding
-        )
-        logging.info("Spider (Scrapy) finalizado exitosamente.")
-        # Opcional: mostrar salida estándar de Scrapy si es útil
-        # logging.debug(f"Salida Scrapy:\n{result_scrapy.stdout}")
-
-    except subprocess.CalledProcessError as e:
-         logging.error(f"Error durante la ejecución del spider (Scrapy): {e}")
-         logging.error(f"Salida del error Scrapy:\n{e.stderr}")
-         # Decidir si continuar o no si el spider falla
-         # return # Podrías detener el proceso aquí si el spider es crítico
-
-    except FileNotFoundError:
-        logging.error("Error: El comando 'scrapy' no se encontró. ¿Está Scrapy instalado y en el PATH?")
-        return # Detener si scrapy no se encuentra
-    except Exception as e:
-         logging.error(f"Error inesperado ejecutando Scrapy: {e}")
-         return # Detener en caso de error inesperado
-
-
-    # 2. Ejecutar el script para poblar la Consumption Zone (SI USAS EL SCRIPT SEPARADO)
-    # Si implementaste la Consumption Zone como pipeline, puedes comentar/eliminar esta parte.
-    logging.info("Ejecutando script para poblar Consumption Zone...")
+# Stats que se muestran en el resumen de cada shard
+SUMMARY_STATS = (
+    'item_scraped_count',
+    'dedup/dropped',
+    'httpcache/not_modified',
+    'log_count/ERROR',
+)
+
+
+def build_shards(by="source"):
+    """
+    Argumentos -a sources=... de cada shard: uno por fuente, o uno por sección
+    (by="section"; Los Tiempos tiene un único listado y queda como un shard).
+    """
+    shards = []
+    for source, sections in SOURCE_SECTIONS.items():
+        if by == "section" and sections:
+            shards.extend(f"{source}/{section}" for section in sections)
+        else:
+            shards.append(source)
+    return shards
+
+
+def start_shard(shard, run_dir, full_crawl=False):
+    """Lanza `scrapy crawl` para un shard; la salida va a <run_dir>/<shard>.log."""
+    name = shard.replace('/', '-')
+    stats_path = os.path.join(run_dir, f"{name}.json")
+    command = [
+        "scrapy", "crawl", "newspaper_spider",
+        "-a", f"sources={shard}",
+        "-s", f"STATS_FILE={stats_path}",
+    ]
+    if full_crawl:
+        command += ["-a", "full_crawl=1"]
+    log_file = open(os.path.join(run_dir, f"{name}.log"), "w", encoding="utf-8")
+    process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT)
+    logging.info(f"Shard {shard} iniciado (pid {process.pid}).")
+    return {'shard': shard, 'process': process, 'log_file': log_file,
+            'stats_path': stats_path, 'started': time.monotonic()}
+
+
+def finish_shard(running):
+    running['log_file'].close()
+    result = {
+        'shard': running['shard'],
+        'returncode': running['process'].returncode,
+        'seconds': round(time.monotonic() - running['started'], 1),
+        'stats': {},
+    }
     try:
-        # Asegúrate de que 'python' ejecute la versión correcta y que el script esté en la ruta
-        result_populate = subprocess.run(
-            ["python", "populate_consumption.py"],
-             check=True,
-             capture_output=True,
-             text=True,
-             encoding='utf-8' # Especificar encoding
-        )
-        logging.info("Script de Consumption Zone finalizado exitosamente.")
-        # Opcional: mostrar salida estándar del script
-        # logging.debug(f"Salida Script Consumo:\n{result_populate.stdout}")
-
-    except subprocess.CalledProcessError as e:
-         logging.error(f"Error durante la ejecución del script populate_consumption.py: {e}")
-         logging.error(f"Salida del error Script Consumo:\n{e.stderr}")
-    except FileNotFoundError:
-         logging.error("Error: El comando 'python' o el script 'populate_consumption.py' no se encontró.")
-    except Exception as e:
-         logging.error(f"Error inesperado ejecutando populate_consumption.py: {e}")
+        with open(running['stats_path'], encoding='utf-8') as f:
+            result['stats'] = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Shard {running['shard']}: no se pudieron leer las stats ({e}).")
+    level = logging.INFO if result['returncode'] == 0 else logging.ERROR
+    logging.log(level, f"Shard {running['shard']} terminó con código {result['returncode']} "
+                       f"en {result['seconds']} s ({result['stats'].get('finish_reason')}).")
+    return result
+
+
+def run_shards(shards, parallel, run_dir, full_crawl=False):
+    """Corre los shards con a lo sumo `parallel` procesos a la vez; devuelve sus resultados."""
+    pending = list(shards)
+    running = []
+    results = []
+    while pending or running:
+        while pending and len(running) < parallel:
+            try:
+                running.append(start_shard(pending.pop(0), run_dir, full_crawl))
+            except FileNotFoundError:
+                logging.error("Error: El comando 'scrapy' no se encontró. ¿Está Scrapy instalado y en el PATH?")
+                return results
+        for shard in [r for r in running if r['process'].poll() is not None]:
+            running.remove(shard)
+            results.append(finish_shard(shard))
+        time.sleep(0.5)
+    return results
 
 
+def run_etl_process(parallel=None, by="source", full_crawl=False):
+    """
+    Ejecuta el crawl repartido en shards (un proceso de Scrapy por fuente o sección). La
+    Landing, Refined y Consumption Zone se llenan desde los pipelines de cada shard; un
+    shard que falla no frena a los demás.
+    """
+    logging.info(f"[{datetime.now()}] Iniciando proceso ETL completo...")
+    parallel = max(1, parallel or os.cpu_count() or 1)
+    shards = build_shards(by)
+    run_dir = new_run_dir()
+    logging.info(f"Ejecutando {len(shards)} shards ({by}) con hasta {parallel} en paralelo...")
+
+    results = run_shards(shards, parallel, run_dir, full_crawl)
+    write_summary(run_dir, results)
+
     logging.info(f"[{datetime.now()}] Proceso ETL completo finalizado.")
+    return results
+
+
+def new_run_dir():
+    run_dir = os.path.join(RUNS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+
+def write_summary(run_dir, results):
+    with open(os.path.join(run_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+    for result in results:
+        values = ", ".join(f"{key}={result['stats'].get(key, 0)}" for key in SUMMARY_STATS)
+        logging.info(f"  {result['shard']:32} código {result['returncode']}  {result['seconds']:7} s  {values}")
+    failed = [r['shard'] for r in results if r['returncode'] != 0]
+    if failed:
+        logging.error(f"Shards con error: {', '.join(failed)} (ver logs en {run_dir})")
+
+
+class InProcessScheduler:
+    """
+    Modo de larga duración (--in-process): un solo reactor de Twisted y un CrawlerRunner
+    que lanza los crawls sin arrancar un intérprete nuevo cada vez. Los logs salen en vivo
+    y el pool de BD (db.keep_alive) y el índice de deduplicación quedan calientes entre
+    ejecuciones, así que los intervalos cortos (--every) no pagan el arranque.
+    Los shards de una ejecución corren en el mismo proceso, hasta `parallel` a la vez.
+    """
+
+    def __init__(self, runner, parallel=None, by="source", full_crawl=False):
+        self.runner = runner
+        # Mismo valor por defecto que run_etl_process: un shard por CPU.
+        self.parallel = max(1, parallel or os.cpu_count() or 1)
+        self.by = by
+        self.full_crawl = full_crawl
+        self.current = None
+
+    def start_run(self):
+        """Tarea de `schedule`: si la ejecución anterior sigue corriendo, se salta esta."""
+        if self.current is not None:
+            logging.warning("La ejecución anterior sigue en curso; se salta esta.")
+            return None
+        self.current = self.run_once()
+        self.current.addBoth(self._finished)
+        return self.current
+
+    def _finished(self, result):
+        self.current = None
+        return result
+
+    def run_once(self):
+        from twisted.internet import defer
+
+        logging.info(f"[{datetime.now()}] Iniciando proceso ETL completo (en proceso)...")
+        shards = build_shards(self.by)
+        run_dir = new_run_dir()
+        semaphore = defer.DeferredSemaphore(self.parallel)
+        runs = [semaphore.run(self.crawl_shard, shard) for shard in shards]
+        d = defer.gatherResults(runs, consumeErrors=True)
+
+        def done(results):
+            write_summary(run_dir, results)
+            logging.info(f"[{datetime.now()}] Proceso ETL completo finalizado.")
+            return results
+
+        return d.addCallback(done)
+
+    def crawl_shard(self, shard):
+        from newspaper_collector.spiders.newspaperspider import NewspaperSpider
+
+        started = time.monotonic()
+        crawler = self.runner.create_crawler(NewspaperSpider)
+        kwargs = {'sources': shard}
+        if self.full_crawl:
+            kwargs['full_crawl'] = '1'
+        logging.info(f"Shard {shard} iniciado.")
+        d = self.runner.crawl(crawler, **kwargs)
+
+        def result(returncode):
+            try:
+                stats = dict(crawler.stats.get_stats())
+            except RuntimeError:
+                # El crawl falló antes de crear las stats.
+                stats = {}
+            return {'shard': shard, 'returncode': returncode,
+                    'seconds': round(time.monotonic() - started, 1), 'stats': stats}
+
+        def failed(failure):
+            logging.error(f"Shard {shard} falló: {failure.getErrorMessage()}")
+            return result(1)
+
+        return d.addCallbacks(lambda _: result(0), failed)
+
+
+def run_in_process(parallel=None, by="source", full_crawl=False, every=None, once=False):
+    from scrapy.utils.project import get_project_settings
+    from scrapy.utils.reactor import install_reactor
+
+    settings = get_project_settings()
+    install_reactor(settings['TWISTED_REACTOR'])
+
+    from scrapy.crawler import CrawlerRunner
+    from scrapy.utils.log import configure_logging
+    from twisted.internet import reactor, task
+
+    from newspaper_collector import db
+
+    # Los logs de Scrapy pasan por el handler de logging.basicConfig de arriba.
+    configure_logging(settings, install_root_handler=False)
+    db.keep_alive = True
+    scheduler = InProcessScheduler(CrawlerRunner(settings), parallel, by, full_crawl)
+    exit_code = []
+
+    if once:
+        def stop(results):
+            exit_code.append(0 if results and all(r['returncode'] == 0 for r in results) else 1)
+            reactor.stop()
+
+        reactor.callWhenRunning(lambda: scheduler.start_run().addBoth(stop))
+    else:
+        if every:
+            schedule.every(every).minutes.do(scheduler.start_run)
+            logging.info(f"Scheduler ETL (en proceso) iniciado: cada {every} minutos.")
+        else:
+            schedule.every(2).days.at("03:00").do(scheduler.start_run)
+            logging.info("Scheduler ETL (en proceso) iniciado: cada 2 días a las 03:00.")
+        task.LoopingCall(schedule.run_pending).start(1.0)
+
+    reactor.run()
+    db.keep_alive = False
+    db.release_pool()
+    return exit_code[0] if exit_code else 0
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Scheduler del ETL de noticias.")
+    arg_parser.add_argument('--parallel', type=int, help="Shards a la vez (por defecto, uno por CPU).")
+    arg_parser.add_argument('--by', choices=('source', 'section'), default='source',
+                            help="Repartir el crawl por fuente o por sección.")
+    arg_parser.add_argument('--full-crawl', action='store_true', help="Ignorar las marcas del crawl incremental.")
+    arg_parser.add_argument('--once', action='store_true', help="Ejecutar una vez ahora y salir.")
+    arg_parser.add_argument('--in-process', action='store_true',
+                            help="Correr los crawls en este proceso con CrawlerRunner (pool de BD y deduplicación calientes).")
+    arg_parser.add_argument('--every', type=int, metavar='MINUTOS',
+                            help="Con --in-process: ejecutar cada N minutos en vez de cada 2 días a las 03:00.")
+    args = arg_parser.parse_args(argv)
+    if args.every is not None and not args.in_process:
+        arg_parser.error("--every solo se puede usar con --in-process.")
+    if args.every is not None and args.once:
+        arg_parser.error("--every no se puede combinar con --once.")
+
+    if args.in_process:
+        return run_in_process(args.parallel, args.by, args.full_crawl, args.every, args.once)
 
+    if args.once:
+        results = run_etl_process(args.parallel, args.by, args.full_crawl)
+        return 0 if results and all(r['returncode'] == 0 for r in results) else 1
 
-# --- Programación de la Tarea ---
-# Comenta/elimina cualquier línea de prueba (ej. every(10).seconds)
-# schedule.every(10).seconds.do(run_etl_process)
+    # --- Programación de la Tarea ---
+    # Cada 2 días A UNA HORA ESPECÍFICA (ej. 03:00 AM)
+    schedule.every(2).days.at("03:00").do(run_etl_process, args.parallel, args.by, args.full_crawl)
 
-# Descomenta y usa UNA de las siguientes líneas para la ejecución cada 2 días:
-# Opción 1: Cada 2 días (la hora exacta dependerá de cuándo se inicie el scheduler)
-# schedule.every(2).days.do(run_etl_process)
+    logging.info("Scheduler ETL iniciado. Programado para ejecutarse cada 2 días a las 03:00. Presiona Ctrl+C para detener.")
 
-# Opción 2: Cada 2 días A UNA HORA ESPECÍFICA (ej. 03:00 AM) - Recomendado
-schedule.every(2).days.at("03:00").do(run_etl_process)
+    # Bucle principal para mantener el scheduler corriendo
+    while True:
+        schedule.run_pending() # Comprueba si hay tareas pendientes de ejecutar
+        time.sleep(60) # Espera 60 segundos antes de volver a comprobar (no necesita ser cada segundo)
 
-logging.info("Scheduler ETL iniciado. Programado para ejecutarse cada 2 días a las 03:00. Presiona Ctrl+C para detener.")
 
-# Bucle principal para mantener el scheduler corriendo
-while True:
-    schedule.run_pending() # Comprueba si hay tareas pendientes de ejecutar
-    time.sleep(60) # Espera 60 segundos antes de volver a comprobar (no necesita ser cada segundo)
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# tests/conftest.py
+
+import pytest
+
+from benchmarks.sqlite_backend import ERRORS, SQLitePool
+from newspaper_collector import db
+
+
+@pytest.fixture
+def sqlite_pool(monkeypatch):
+    """BD SQLite en memoria instalada como pool del proceso, con el esquema ya creado."""
+    monkeypatch.setattr(db, '_pool', None)
+    monkeypatch.setattr(db, 'DB_ERRORS', db.DB_ERRORS)
+    db_pool = db.install_pool(SQLitePool(), ERRORS)
+    yield db_pool
+    db_pool.closeall()
+
+
+def fetch(sql, params=None):
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+    return rows
@@ -0,0 +1,92 @@
+# tests/test_backfill.py
+
+import argparse
+from datetime import date, time
+
+from conftest import fetch
+from newspaper_collector import db
+from newspaper_collector.backfill import Checkpoint, checkpoint_filters
+
+HORA = time(10, 0)
+
+
+def consumption(titulo, fecha, seccion, url):
+    return (titulo, fecha, HORA, seccion, 'eldeber', url)
+
+
+def newspaper(titulo, url):
+    return {'titulo': titulo, 'url': url, 'seccion': 'pais'}
+
+
+def load(consumption_rows=(), newspaper_rows=(), replace=False):
+    with db.connection() as conn:
+        written = (db.copy_consumption_rows(conn, list(consumption_rows), replace) if consumption_rows else 0,
+                   db.copy_newspaper_rows(conn, list(newspaper_rows), replace) if newspaper_rows else 0)
+        conn.commit()
+    return written
+
+
+def rollup():
+    return fetch("SELECT fecha_noticia, fuente, seccion, n FROM consumption_rollup ORDER BY 1, 2, 3")
+
+
+def recount():
+    return fetch("""
+        SELECT fecha_noticia, fuente, seccion, count(*) FROM consumption_analytics
+        WHERE fecha_noticia IS NOT NULL AND hora_noticia IS NOT NULL
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    """)
+
+
+def test_default_load_skips_existing_urls(sqlite_pool):
+    load([consumption('a', date(2024, 1, 1), 'pais', 'u1')], [newspaper('a', 'u1')])
+
+    assert load([consumption('b', date(2024, 1, 2), 'mundo', 'u1')], [newspaper('b', 'u1')]) == (0, 0)
+    assert fetch("SELECT titulo FROM consumption_analytics") == [('a',)]
+    assert fetch("SELECT titulo FROM newspaper") == [('a',)]
+    assert rollup() == [('2024-01-01', 'eldeber', 'pais', 1)]
+
+
+def test_replace_moves_rollup_counts_and_deletes_empty_keys(sqlite_pool):
+    load([consumption('a', date(2024, 1, 1), 'pais', 'u1'),
+          consumption('b', date(2024, 1, 1), 'pais', 'u2'),
+          consumption('c', date(2024, 1, 5), 'opinion', 'u3')])
+
+    written = load([consumption('a2', date(2024, 1, 2), 'mundo', 'u1'),
+                    consumption('c2', date(2024, 1, 2), 'mundo', 'u3'),
+                    consumption('d', date(2024, 1, 1), 'pais', 'u4')], replace=True)
+
+    assert written == (3, 0)
+    # (2024-01-05, opinion) quedó en cero y se borró; (2024-01-01, pais) perdió u1 y ganó u4.
+    assert rollup() == [('2024-01-01', 'eldeber', 'pais', 2), ('2024-01-02', 'eldeber', 'mundo', 2)]
+    assert rollup() == recount()
+
+
+def test_replace_keeps_the_last_occurrence_of_a_url(sqlite_pool):
+    load([consumption('a', date(2024, 1, 1), 'pais', 'u1')], [newspaper('a', 'u1')])
+    (old_id,), = fetch("SELECT id FROM newspaper WHERE url = 'u1'")
+
+    written = load([consumption('b', date(2024, 1, 2), 'mundo', 'u1'),
+                    consumption('c', date(2024, 1, 3), 'mundo', 'u1')],
+                   [newspaper('b', 'u1'), newspaper('c', 'u1')], replace=True)
+
+    assert written == (1, 1)
+    assert fetch("SELECT titulo, fecha_noticia FROM consumption_analytics") == [('c', '2024-01-03')]
+    (new_id, titulo), = fetch("SELECT id, titulo FROM newspaper")
+    assert titulo == 'c'
+    # Id nuevo: export_parquet exporta por id y tiene que volver a exportar la fila.
+    assert new_id > old_id
+    assert rollup() == [('2024-01-03', 'eldeber', 'mundo', 1)]
+
+
+def test_checkpoint_of_a_plain_load_is_not_reused_by_upsert(tmp_path):
+    options = dict(source='eldeber', desde=None, hasta=None, fecha_desde=None, fecha_hasta=None, solo=None)
+    path = str(tmp_path / 'checkpoint.json')
+    plain = Checkpoint(path, checkpoint_filters(argparse.Namespace(upsert=False, **options)))
+    plain.advance('a.jsonl', 100, 10, done=True)
+    plain.save()
+
+    upsert_filters = checkpoint_filters(argparse.Namespace(upsert=True, **options))
+    assert upsert_filters['upsert'] is True
+    assert Checkpoint(path, upsert_filters).position('a.jsonl', 100) == 0
+    assert Checkpoint(path, plain.filters).position('a.jsonl', 100) is None
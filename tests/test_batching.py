@@ -0,0 +1,98 @@
+# tests/test_batching.py
+
+import logging
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from conftest import fetch
+from newspaper_collector import db, dedup
+from newspaper_collector.pipelines.consumption_zone_pipeline import ConsumptionZonePipeline
+
+
+class Stats:
+    def __init__(self):
+        self.values = Counter()
+
+    def inc_value(self, key, count=1):
+        self.values[key] += count
+
+
+class Spider:
+    logger = logging.getLogger('test')
+
+
+# Un valor que SQLite no sabe guardar: la fila falla tanto en el lote como sola.
+INVALID = object()
+
+
+def row(url, titulo='titulo'):
+    return (titulo, None, None, 'pais', 'eldeber', url)
+
+
+def item(url, titulo='titulo'):
+    return {'url': url, 'titulo': titulo, 'seccion': 'pais', 'fecha_dt': datetime(2025, 4, 9, 18, 45)}
+
+
+@pytest.fixture
+def index():
+    dedup.reset_index()
+    yield dedup.get_index(capacity=100)
+    dedup.reset_index()
+
+
+def test_write_batch_retries_row_by_row_and_isolates_the_bad_row(sqlite_pool):
+    errors = []
+    rows = [row('u1'), row('u2', INVALID), row('u3')]
+
+    inserted, failed = db.write_batch(db.upsert_consumption_rows, rows,
+                                      on_row_error=lambda r, e: errors.append(r))
+
+    assert (inserted, failed) == (2, 1)
+    assert errors == [rows[1]]
+    assert fetch("SELECT url FROM consumption_analytics ORDER BY url") == [('u1',), ('u3',)]
+
+
+def test_write_batch_counts_existing_urls_as_not_inserted(sqlite_pool):
+    db.write_batch(db.upsert_consumption_rows, [row('u1')])
+
+    assert db.write_batch(db.upsert_consumption_rows, [row('u1'), row('u2')]) == (1, 0)
+
+
+def test_pipeline_stats_and_written_only_for_clean_batches(sqlite_pool, index):
+    db.write_batch(db.upsert_consumption_rows, [row('u1')])
+    stats = Stats()
+    pipeline = ConsumptionZonePipeline(batch_size=3, flush_interval=0, stats=stats)
+    pipeline.open_spider(Spider)
+
+    for url in ('u1', 'u2', 'u3'):
+        pipeline.process_item(item(url), Spider)
+    assert stats.values == {'consumption_zone/inserted': 2, 'consumption_zone/skipped': 1}
+    # Lote sin fallos: las tres urls (nuevas o ya existentes) quedan confirmadas en esta zona.
+    assert set(index.partial) == {'u1', 'u2', 'u3'}
+
+    for url, titulo in (('u4', 'titulo'), ('u5', INVALID)):
+        pipeline.process_item(item(url, titulo), Spider)
+    pipeline.close_spider(Spider)
+    assert stats.values['consumption_zone/inserted'] == 3
+    assert stats.values['consumption_zone/failed'] == 1
+    # Lote con una fila fallida: no se confirma ninguna url del lote.
+    assert set(index.partial) == {'u1', 'u2', 'u3'}
+
+
+def test_newspaper_staging_insert_keeps_first_occurrence_and_skips_existing(sqlite_pool):
+    db.write_batch(db.insert_newspaper_rows, [{'url': 'u1', 'titulo': 'viejo'}])
+    rows = [{'url': 'u1', 'titulo': 'otro'}, {'url': 'u2', 'titulo': 'primero'},
+            {'url': 'u2', 'titulo': 'segundo'}, {'url': None, 'titulo': 'sin url'}]
+
+    assert db.write_batch(db.insert_newspaper_rows, rows) == (2, 0)
+    assert fetch("SELECT url, titulo FROM newspaper ORDER BY id") == [
+        ('u1', 'viejo'), ('u2', 'primero'), (None, 'sin url')]
+
+
+def test_newspaper_bad_row_is_isolated_on_retry(sqlite_pool):
+    rows = [{'url': 'u1', 'titulo': 'a'}, {'url': 'u2', 'titulo': INVALID}, {'url': 'u3', 'titulo': 'c'}]
+
+    assert db.write_batch(db.insert_newspaper_rows, rows) == (2, 1)
+    assert fetch("SELECT url FROM newspaper ORDER BY id") == [('u1',), ('u3',)]
@@ -0,0 +1,25 @@
+# tests/test_dates.py
+
+from datetime import datetime
+
+from newspaper_collector.dates import parse_fecha
+
+
+class Stats:
+    def __init__(self):
+        self.values = {}
+
+    def inc_value(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+
+
+def test_ambiguous_date_is_day_first():
+    assert parse_fecha('03/04/2024') == datetime(2024, 4, 3)
+
+
+def test_ambiguous_date_in_dateutil_fallback_is_day_first():
+    # Separadores que el parser rápido no reconoce: lo resuelve dateutil con dayfirst=True.
+    stats = Stats()
+    assert parse_fecha('03-04-2024 10:30', stats=stats) == datetime(2024, 4, 3, 10, 30)
+    assert stats.values.get('dates/fallback') == 1
+    assert parse_fecha('03.04.2024') == datetime(2024, 4, 3)
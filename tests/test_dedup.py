@@ -0,0 +1,114 @@
+# tests/test_dedup.py
+
+import gzip
+
+import pytest
+
+from newspaper_collector import db, dedup
+from newspaper_collector.dedup import UrlDedupIndex
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    dedup.reset_index()
+    yield
+    dedup.reset_index()
+
+
+def test_lookup_normalizes_and_exact_set_confirms_bloom_hits():
+    index = UrlDedupIndex(capacity=100, error_rate=0.01)
+    index.add(' HTTPS://Example.com/Noticia ')
+
+    assert 'https://example.com/noticia' in index
+    assert 'https://example.com/otra' not in index
+    assert None not in index
+    assert len(index) == 1
+    # Un acierto del filtro que el set exacto no tiene no cuenta como visto.
+    index.bloom.add('https://example.com/falso-positivo')
+    assert 'https://example.com/falso-positivo' not in index
+
+
+def test_bloom_only_index_has_no_exact_set():
+    index = UrlDedupIndex(capacity=100, error_rate=0.01, exact=False)
+    index.add('https://example.com/a')
+
+    assert index.exact is None
+    assert 'https://example.com/a' in index
+
+
+def test_confirm_needs_both_zones():
+    index = UrlDedupIndex(capacity=100)
+    url = 'https://example.com/a'
+
+    index.confirm(url, 'consumption')
+    index.confirm(url, 'consumption')
+    assert url not in index
+    index.confirm(url, 'refined')
+    assert url in index
+    assert index.partial == {}
+
+
+def test_partial_is_dropped_when_the_last_spider_closes():
+    index = UrlDedupIndex(capacity=100)
+    index.opened()
+    index.opened()
+    index.confirm('https://example.com/a', 'consumption')
+
+    assert index.closed() == 0
+    assert 'https://example.com/a' in index.partial
+    assert index.closed() == 1
+    assert index.partial == {}
+    index.confirm('https://example.com/a', 'refined')
+    assert 'https://example.com/a' not in index
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'url_dedup.idx')
+    index = UrlDedupIndex(capacity=100)
+    index.add('https://example.com/a')
+    index.add('https://example.com/b')
+    index.watermark = '2025-04-09T15:47:07+00:00'
+    index.save(path)
+
+    with gzip.open(path, 'rb') as f:
+        assert f.read(len(dedup.FILE_MAGIC)) == b'NCDEDUP2'
+    loaded = UrlDedupIndex.load(path)
+    assert len(loaded) == 2
+    assert 'https://example.com/a' in loaded and 'https://example.com/c' not in loaded
+    assert loaded.exact == index.exact
+    assert loaded.watermark == index.watermark
+    assert loaded.partial == {}
+
+
+def test_version_1_file_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'url_dedup.idx')
+    index = UrlDedupIndex(capacity=100)
+    index.add('https://example.com/a')
+    index.save(path)
+    with gzip.open(path, 'rb') as f:
+        data = f.read()
+    with gzip.open(path, 'wb') as f:
+        f.write(b'NCDEDUP1' + data[len(dedup.FILE_MAGIC):])
+
+    with pytest.raises(ValueError):
+        UrlDedupIndex.load(path)
+    rebuilt = dedup.get_index(capacity=100, path=path)
+    assert len(rebuilt) == 0
+    assert rebuilt.watermark is None
+
+
+def test_load_from_db_only_takes_urls_in_both_zones(sqlite_pool):
+    with db.connection() as conn:
+        db.upsert_consumption_rows(conn, [
+            ('a', None, None, 'pais', 'eldeber', 'https://example.com/a'),
+            ('b', None, None, 'pais', 'eldeber', 'https://example.com/b'),
+        ])
+        db.insert_newspaper_rows(conn, [{'url': 'https://example.com/a', 'titulo': 'a'}])
+        conn.commit()
+
+    index = UrlDedupIndex(capacity=100)
+    with db.connection() as conn:
+        assert index.load_from_db(conn) == 1
+    assert 'https://example.com/a' in index
+    assert 'https://example.com/b' not in index
+    assert index.watermark is not None
@@ -0,0 +1,63 @@
+# tests/test_parsers.py
+
+from collections import Counter
+
+from lxml import html
+
+from newspaper_collector.spiders.parsers import AhoraElPuebloParser
+
+
+class Stats:
+    def __init__(self):
+        self.values = Counter()
+
+    def inc_value(self, key):
+        self.values[key] += 1
+
+
+def node(markup):
+    return html.fragment_fromstring(markup, create_parent='div')
+
+
+CON_MICRODATOS = '<time itemprop="datePublished" datetime="2025-04-01T10:00:00"></time>' \
+                 '<time datetime="2025-03-31T09:00:00"></time>'
+SIN_MICRODATOS = '<time datetime="2025-04-02T11:00:00"></time>'
+
+
+def test_fallback_chain_tries_primary_first():
+    stats = Stats()
+    parser = AhoraElPuebloParser(stats)
+    field = parser.fields['fecha']
+
+    fechas = [
+        field.value(parser.evaluate('fecha', field, node(markup)))
+        for markup in (CON_MICRODATOS, SIN_MICRODATOS, CON_MICRODATOS)
+    ]
+
+    # Después de usar el respaldo, la tercera noticia vuelve a tomar datePublished.
+    assert fechas == ['2025-04-01T10:00:00', '2025-04-02T11:00:00', '2025-04-01T10:00:00']
+    assert stats.values['selectors/ahoraelpueblo/fecha/primary'] == 2
+    assert stats.values['selectors/ahoraelpueblo/fecha/time'] == 1
+    assert 'fecha' not in parser.winners
+
+
+def test_item_field_prefers_primary_after_a_positional_page():
+    parser = AhoraElPuebloParser()
+    field = parser.fields['titulo']
+    posicional = node('<div></div><div><div><h2><a href="/a">Posicional</a></h2></div></div>')
+    ambos = node('<h2 itemprop="name"><a href="/b">Microdatos</a></h2><div></div>'
+                 '<div><div><h2><a href="/b">Posicional</a></h2></div></div>')
+
+    assert field.value(parser.evaluate('titulo', field, posicional)) == 'Posicional'
+    # Si coinciden las dos variantes gana la principal, como antes del registro.
+    assert field.value(parser.evaluate('titulo', field, ambos)) == 'Microdatos'
+    assert 'titulo' not in parser.winners
+
+
+def test_articles_remember_the_layout():
+    parser = AhoraElPuebloParser()
+    page = html.fromstring('<html><body><div id="sp-component"><div><div></div><div><div></div><div>'
+                           '<div><div><div>noticia</div></div></div></div></div></div></div></body></html>')
+
+    assert len(parser.evaluate('articles', parser.articles, page)) == 1
+    assert parser.winners['articles'] == 1
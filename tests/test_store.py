@@ -0,0 +1,97 @@
+# tests/test_store.py
+
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+import pytest
+
+# Los módulos del dashboard se importan como en `streamlit run viz.py` (desde su carpeta).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dashboard'))
+import queries  # noqa: E402
+import store  # noqa: E402
+
+WATERMARK = pd.Timestamp('2025-04-09 12:00:00')
+
+
+def db_frame(rows, watermark):
+    return pd.DataFrame({
+        'fecha_noticia': pd.to_datetime([r[0] for r in rows]),
+        'fuente': [r[1] for r in rows],
+        'seccion': [r[2] for r in rows],
+        'n': [r[3] for r in rows],
+        'watermark': watermark,
+    })
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Respuestas de la BD por consulta; cada lectura consume la siguiente."""
+    answers = {queries.ROLLUP_SQL: [], queries.DELTA_SQL: []}
+    monkeypatch.setattr(queries, 'read_frame', lambda conn, sql, params=None: answers[sql].pop(0))
+    return answers
+
+
+def test_delta_is_merged_and_invalidates_only_matching_aggregates(db):
+    db[queries.ROLLUP_SQL].append(db_frame([('2025-04-01', 'eldeber', 'pais', 2),
+                                            ('2025-04-01', 'lostiempos', 'mundo', 1)], WATERMARK))
+    rollup = store.RollupStore(refresh_every=0)
+    rollup.refresh(None)
+
+    eldeber = rollup.aggregates(['eldeber'])
+    lostiempos = rollup.aggregates(['lostiempos'])
+    assert rollup.aggregates(['eldeber']) is eldeber
+    assert (eldeber['total'], lostiempos['total']) == (2, 1)
+
+    db[queries.DELTA_SQL].append(db_frame([('2025-04-01', 'eldeber', 'pais', 3),
+                                           ('2025-04-02', 'eldeber', 'opinion', 1)],
+                                          WATERMARK + pd.Timedelta(minutes=5)))
+    rollup.refresh(None)
+
+    stats = rollup.stats()
+    assert (stats['loads'], stats['deltas'], stats['invalidated']) == (1, 1, 1)
+    assert stats['watermark'] == WATERMARK + pd.Timedelta(minutes=5)
+    assert stats['rollup_rows'] == 3
+    assert 0 < stats['full_reload_in'] <= store.FULL_RELOAD_SECONDS
+    # El agregado de lostiempos no se tocó; el de eldeber se recalcula con el delta.
+    assert rollup.aggregates(['lostiempos']) is lostiempos
+    nuevo = rollup.aggregates(['eldeber'])
+    assert nuevo['total'] == 6
+    assert dict(nuevo['top_secciones']) == {'pais': 5, 'opinion': 1}
+    assert rollup.aggregates(['eldeber'], date(2025, 4, 2), date(2025, 4, 2))['total'] == 1
+
+
+def test_empty_delta_only_moves_the_watermark(db):
+    db[queries.ROLLUP_SQL].append(db_frame([('2025-04-01', 'eldeber', 'pais', 2)], WATERMARK))
+    rollup = store.RollupStore(refresh_every=0)
+    rollup.refresh(None)
+    cached = rollup.aggregates()
+
+    later = WATERMARK + pd.Timedelta(minutes=1)
+    db[queries.DELTA_SQL].append(db_frame([('2025-04-01', 'eldeber', 'pais', 0)], later))
+    rollup.refresh(None)
+
+    assert rollup.watermark == later
+    assert rollup.aggregates() is cached
+    assert rollup.stats()['deltas'] == 0
+
+
+def test_aggregate_computed_across_a_delta_is_not_cached(db, monkeypatch):
+    db[queries.ROLLUP_SQL].append(db_frame([('2025-04-01', 'eldeber', 'pais', 2)], WATERMARK))
+    rollup = store.RollupStore(refresh_every=0)
+    rollup.refresh(None)
+    compute = store.RollupStore.compute
+
+    def compute_during_delta(frame, *key):
+        # Otra sesión aplica un delta mientras esta calcula sobre el frame anterior.
+        db[queries.DELTA_SQL].append(db_frame([('2025-04-01', 'eldeber', 'pais', 1)],
+                                              WATERMARK + pd.Timedelta(minutes=1)))
+        rollup.apply_delta(None)
+        return compute(frame, *key)
+
+    monkeypatch.setattr(rollup, 'compute', compute_during_delta)
+    assert rollup.aggregates()['total'] == 2
+    assert rollup.cache == {}
+    monkeypatch.setattr(rollup, 'compute', compute)
+    assert rollup.aggregates()['total'] == 3